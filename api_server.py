@@ -1,35 +1,77 @@
 # api_server.py
+import asyncio
+import json
+import os
+import time
 import uuid
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 # Import the LangGraph app and the Q&A function from your project
-from src.agent import app as research_agent_app
-from src.rag_qa import answer_query
+from src.agent import get_app
+from src.rag_qa import answer_queries, answer_query_result, answer_query_stream, answer_cache_stats, embedding_stats
+from src.jobs import JobManager, JobStore, Emit
+from src.pdf_cache import get_default_cache
+from src.http_client import get_client
+from src.search import SOURCES
+from src.session_store import SessionStore
+from src import tracing
+from src.config import warm_up
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Compile the graph and create the shared clients in the background, so
+    # the server accepts requests right away and the first one doesn't pay for it.
+    warm_up()
+    yield
+
 
 # Initialize the FastAPI app
 app = FastAPI(
     title="AI Research Assistant API",
     description="An API for finding, processing, and querying research papers.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
-# --- In-Memory Storage for Session Data ---
-# In a production system, you would use a proper database like Redis or a persistent DB.
-# For this project, a simple dictionary is sufficient to hold session state.
-session_data: Dict[str, Any] = {}
+# --- Session Storage ---
+# Sessions are persisted in SQLite (paper IDs and reading plan only), so they
+# survive restarts and are shared by every worker on the host. Live sessions
+# are rebuilt on first use; old ones expire (SESSION_TTL) or are evicted LRU.
+sessions = SessionStore()
+
+# --- Background Research Jobs ---
+# Research runs take minutes, so they run on a bounded worker pool instead of
+# inside the request. Identical in-flight queries share one job. Job status,
+# progress and results are mirrored to SQLite, so any worker can answer
+# `/jobs/...` for a job another worker is running.
+jobs = JobManager(max_workers=int(os.getenv("RESEARCH_WORKERS", "2")), store=JobStore())
 
 # --- Pydantic Models for Request & Response Data ---
 # These models define the expected data shapes for our API endpoints.
 
 class ResearchRequest(BaseModel):
     query: str
-    source: str = "arxiv"
+    source: str = "arxiv"  # "arxiv", "semantic" or "all"
+    max_results: int = 5
 
 class ResearchResponse(BaseModel):
-    session_id: str
-    reading_plan: List[Dict[str, Any]]
+    job_id: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    params: Dict[str, Any]
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: List[Dict[str, Any]]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
 
 class QARequest(BaseModel):
     session_id: str
@@ -37,49 +79,123 @@ class QARequest(BaseModel):
 
 class QAResponse(BaseModel):
     answer: str
+    usage: Dict[str, Any] = {}
+
+class BatchQARequest(BaseModel):
+    session_id: str
+    questions: List[str]
+    k: int = 5
 
 
 # --- API Endpoints ---
 
-@app.post("/start-research", response_model=ResearchResponse)
-def start_research(request: ResearchRequest):
-    """
-    Starts a new research session by running the LangGraph agent.
-    This process can take a while as it fetches, downloads, and processes PDFs.
-    """
-    # Generate a unique ID for this new session
+def _progress_summary(update: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a node's state update to JSON-friendly counts for progress events."""
+    summary = {}
+    for key, value in (update or {}).items():
+        if isinstance(value, list):
+            summary[key] = len(value)
+        elif isinstance(value, (str, int, float, bool)) or value is None:
+            summary[key] = value
+        else:
+            summary[key] = True
+    return summary
+
+
+def _run_research(query: str, source: str, emit: Emit, max_results: int = 5) -> Dict[str, Any]:
+    """Runs the LangGraph agent, emitting one progress event per finished node."""
     session_id = str(uuid.uuid4())
-    
     print(f"Starting new research session: {session_id}")
-    
-    # Define the initial state for the LangGraph agent
-    initial_state = {"query": request.query, "source": request.source}
-    
-    # Invoke the agent to run the full workflow
-    final_state = research_agent_app.invoke(initial_state)
-    
+
+    final_state: Dict[str, Any] = {"query": query, "source": source, "max_results": max_results}
+    registered = False
+    started = time.perf_counter()
+    with tracing.span("research", session_id=session_id, source=source):
+        for step in get_app().stream(dict(final_state), stream_mode="updates"):
+            for node, update in step.items():
+                final_state.update(update or {})
+                emit(node, {"elapsed": round(time.perf_counter() - started, 3), **_progress_summary(update)})
+            # Register the session as soon as the abstracts are indexed and the
+            # plan exists, so questions can be asked while full text backfills.
+            if not registered and final_state.get("rag_collection") and final_state.get("reading_plan"):
+                sessions.put(session_id, final_state["rag_collection"], final_state["reading_plan"])
+                registered = True
+                emit("session_ready", {"elapsed": round(time.perf_counter() - started, 3), "session_id": session_id,
+                                       "reading_plan": final_state["reading_plan"]})
+
     rag_collection = final_state.get("rag_collection")
     reading_plan = final_state.get("reading_plan")
-    
     if not rag_collection or not reading_plan:
-        raise HTTPException(status_code=500, detail="Agent workflow failed to produce results.")
-        
-    # Store the results in our "database"
-    session_data[session_id] = {
-        "rag_collection": rag_collection,
-        "reading_plan": reading_plan,
-    }
-    
+        raise RuntimeError("Agent workflow failed to produce results.")
+
+    sessions.put(session_id, rag_collection, reading_plan)
     return {"session_id": session_id, "reading_plan": reading_plan}
 
 
+@app.post("/start-research", response_model=ResearchResponse, status_code=202)
+async def start_research(request: ResearchRequest):
+    """
+    Queues a new research session and returns its job ID right away.
+    Poll `/jobs/{job_id}` or follow `/jobs/{job_id}/events` for progress and the result.
+    """
+    if request.source not in SOURCES:
+        raise HTTPException(status_code=422, detail=f"source must be one of {sorted(SOURCES)}.")
+    key = (" ".join(request.query.lower().split()), request.source, request.max_results)
+    job = jobs.submit(
+        key,
+        {"query": request.query, "source": request.source, "max_results": request.max_results},
+        lambda emit: _run_research(request.query, request.source, emit, request.max_results),
+    )
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job(job_id: str):
+    """
+    Returns a research job's status, per-node progress and, once finished, its result.
+    """
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Streams a research job's status and per-node progress as Server-Sent Events.
+    The stream ends with a `result` event once the job finishes.
+    """
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def event_stream():
+        nonlocal job
+        sent = 0
+        while True:
+            # Jobs run by another worker are re-read from the store each time.
+            job = jobs.get(job_id) or job
+            events = job.events_since(sent)
+            for event in events:
+                yield f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+            sent += len(events)
+            if job.done and sent == len(job.events):
+                break
+            await asyncio.sleep(0.25)
+        payload = {"status": job.status, "result": job.result, "error": job.error}
+        yield f"event: result\ndata: {json.dumps(payload, default=str)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @app.post("/ask-question", response_model=QAResponse)
 def ask_question(request: QARequest):
     """
     Asks a question within an existing research session.
     """
     # Retrieve the session data using the provided session_id
-    session = session_data.get(request.session_id)
+    session = sessions.get(request.session_id)
     
     if not session:
         raise HTTPException(status_code=404, detail="Session not found.")
@@ -89,6 +205,88 @@ def ask_question(request: QARequest):
     print(f"Answering question for session {request.session_id}: '{request.question}'")
     
     # Use the RAG collection from the session to answer the question
-    answer = answer_query(rag_collection, request.question)
+    result = answer_query_result(rag_collection, request.question)
     
-    return {"answer": answer}
\ No newline at end of file
+    return {"answer": result["answer"], "usage": result["usage"]}
+
+
+@app.post("/ask-question/stream")
+def ask_question_stream(request: QARequest):
+    """
+    Streaming variant of `/ask-question`. Returns Server-Sent Events: a `sources`
+    event once retrieval is done, `token` events as the answer is generated, and a
+    final `done` event with the full answer.
+    """
+    session = sessions.get(request.session_id)
+
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found.")
+
+    rag_collection = session["rag_collection"]
+
+    print(f"Streaming answer for session {request.session_id}: '{request.question}'")
+
+    def event_stream():
+        for event in answer_query_stream(rag_collection, request.question):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post("/ask-questions")
+def ask_questions(request: BatchQARequest):
+    """
+    Answers many questions in one session. All questions are embedded and looked
+    up together, answers are generated concurrently, and results are streamed as
+    JSON lines in completion order, each with its `index`, `question`, `answer`,
+    `sources`, `usage` and `latency_ms`. A question that fails gets an `error`
+    line instead, and the rest keep streaming.
+    """
+    session = sessions.get(request.session_id)
+
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found.")
+
+    rag_collection = session["rag_collection"]
+
+    print(f"Answering {len(request.questions)} questions for session {request.session_id}")
+
+    def result_stream():
+        for result in answer_queries(rag_collection, request.questions, k=request.k):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+
+@app.get("/cache-stats")
+def cache_stats():
+    """
+    Reports answer-cache counters (exact/semantic hits, misses, evictions) and hit rate.
+    """
+    return {"answer_cache": answer_cache_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus metrics: span durations and token/byte/page/retry counters per
+    workflow step, plus answer-, PDF- and embedding-cache, HTTP client and session-store counters.
+    """
+    gauges: Dict[str, float] = {}
+    for prefix, stats in (
+        ("answer_cache", answer_cache_stats()),
+        ("pdf_cache", get_default_cache().stats),
+        ("embedding", embedding_stats()),
+        ("http", get_client().stats()),
+        ("sessions", {**sessions.stats, "stored": len(sessions)}),
+    ):
+        gauges.update({f"{prefix}_{key}": value for key, value in stats.items() if isinstance(value, (int, float))})
+    return PlainTextResponse(tracing.tracer.prometheus_text(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/traces")
+def traces():
+    """
+    Recently finished spans as OpenTelemetry (OTLP/JSON) resource spans.
+    """
+    return tracing.tracer.export_otel()
@@ -0,0 +1,213 @@
+# benchmarks/fakes.py
+"""Offline stand-ins for arXiv, Semantic Scholar, PDF hosting and Gemini.
+
+All servers are plain `http.server` instances on localhost threads, backed by
+the PDFs in `temp_pdfs/`. Every fake takes a latency (seconds) that is slept
+before responding, so runs can model slow networks or slow models while staying
+fully deterministic.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+from src.embeddings import Embedder, HashEmbedder
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "temp_pdfs")
+
+_TOPICS = ["graph neural networks", "quantum error correction", "reinforcement learning", "protein folding",
+           "diffusion models", "federated learning", "adversarial robustness"]
+
+
+def corpus_ids(corpus_dir: str = CORPUS_DIR) -> List[str]:
+    return sorted(f[:-4] for f in os.listdir(corpus_dir) if f.endswith(".pdf"))
+
+
+def synthetic_paper(paper_id: str, i: int) -> Dict[str, str]:
+    topic = _TOPICS[i % len(_TOPICS)]
+    return {
+        "id": paper_id,
+        "title": f"A study of {topic} ({paper_id})",
+        "summary": f"We study {topic}. This paper {paper_id} proposes a method, evaluates it on standard "
+                   f"benchmarks and discusses limitations of prior work on {topic}.",
+        "authors": [f"Author {i}A", f"Author {i}B"],
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def log_message(self, *args):  # keep benchmark output clean
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeServer:
+    """Runs one handler class on an ephemeral localhost port in a daemon thread."""
+
+    def __init__(self, handler: type):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def arxiv_server(pdf_base_url: str, latency: float = 0.0, corpus_dir: str = CORPUS_DIR) -> FakeServer:
+    """Atom feed server; each entry's id points at the PDF server."""
+    papers = [synthetic_paper(pid, i) for i, pid in enumerate(corpus_ids(corpus_dir))]
+
+    class Handler(_Handler):
+        def do_GET(self):
+            time.sleep(latency)
+            qs = parse_qs(urlparse(self.path).query)
+            start = int(qs.get("start", ["0"])[0])
+            count = int(qs.get("max_results", ["5"])[0])
+            entries = []
+            for p in papers[start:start + count]:
+                authors = "".join(f"<author><name>{escape(a)}</name></author>" for a in p["authors"])
+                entries.append(
+                    f"<entry><id>{pdf_base_url}/abs/{p['id']}</id><title>{escape(p['title'])}</title>"
+                    f"<summary>{escape(p['summary'])}</summary>{authors}</entry>"
+                )
+            body = ('<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+                    + "".join(entries) + "</feed>").encode("utf-8")
+            self._send(200, body, "application/atom+xml")
+
+    return FakeServer(Handler)
+
+
+def semantic_scholar_server(pdf_base_url: str, latency: float = 0.0, corpus_dir: str = CORPUS_DIR) -> FakeServer:
+    """Graph API `/paper/search` lookalike returning JSON."""
+    papers = [synthetic_paper(pid, i) for i, pid in enumerate(corpus_ids(corpus_dir))]
+
+    class Handler(_Handler):
+        def do_GET(self):
+            time.sleep(latency)
+            qs = parse_qs(urlparse(self.path).query)
+            offset = int(qs.get("offset", ["0"])[0])
+            limit = int(qs.get("limit", ["5"])[0])
+            data = [
+                {"paperId": p["id"], "title": p["title"], "abstract": p["summary"],
+                 "authors": [{"name": a} for a in p["authors"]], "url": f"{pdf_base_url}/abs/{p['id']}"}
+                for p in papers[offset:offset + limit]
+            ]
+            body = json.dumps({"total": len(papers), "offset": offset, "data": data}).encode("utf-8")
+            self._send(200, body, "application/json")
+
+    return FakeServer(Handler)
+
+
+def pdf_server(latency: float = 0.0, corpus_dir: str = CORPUS_DIR) -> FakeServer:
+    """Serves `<corpus_dir>/<id>.pdf` for any path whose last segment is `<id>` or `<id>.pdf`."""
+
+    class Handler(_Handler):
+        def do_GET(self):
+            time.sleep(latency)
+            name = urlparse(self.path).path.rstrip("/").split("/")[-1]
+            name = name[:-4] if name.endswith(".pdf") else name
+            path = os.path.join(corpus_dir, f"{name}.pdf")
+            if not re.fullmatch(r"[\w.\-]+", name) or not os.path.isfile(path):
+                self._send(404, b"not found", "text/plain")
+                return
+            with open(path, "rb") as f:
+                self._send(200, f.read(), "application/pdf")
+
+    return FakeServer(Handler)
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+
+
+class FakeGenerativeModel:
+    """Deterministic `genai.GenerativeModel` replacement with configurable latency.
+
+    Reading-plan prompts get the listed paper (or group) numbers back in order, JSON
+    prompts get an empty JSON object, and everything else gets a short answer
+    echoing the question. Streaming splits the reply into word tokens with the
+    latency spread across them.
+    """
+
+    latency = 0.0
+    calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, model_name: str = "fake", **kwargs):
+        self.model_name = model_name
+
+    def _reply(self, prompt: str) -> str:
+        numbers = re.findall(r"^(?:Paper|Group) (\d+)", prompt, re.MULTILINE)
+        if numbers and "reading plan" in prompt:
+            return json.dumps([int(n) for n in numbers])
+        if "JSON" in prompt:
+            return "{}"
+        question = re.search(r"--- QUESTION ---\n(.*?)\n", prompt, re.DOTALL)
+        return f"Based on the context, the answer to '{question.group(1) if question else 'the question'}' is covered by the sources."
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        with FakeGenerativeModel._lock:
+            FakeGenerativeModel.calls += 1
+        reply = self._reply(str(prompt))
+        if not stream:
+            time.sleep(self.latency)
+            return _Chunk(reply)
+        return self._stream(reply)
+
+    def _stream(self, reply: str) -> Iterator[_Chunk]:
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.latency / len(words))
+            yield _Chunk(word if i == 0 else " " + word)
+
+
+class SlowHashEmbedder(HashEmbedder):
+    """`HashEmbedder` that sleeps `latency` seconds per batch, like a remote API."""
+
+    def __init__(self, latency: float = 0.0, dim: int = 256):
+        super().__init__(dim=dim)
+        self.latency = latency
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return super().embed_batch(texts)
+
+
+def install_fake_llm(latency: float = 0.0) -> type:
+    """Patch `google.generativeai.GenerativeModel` with `FakeGenerativeModel`."""
+    import google.generativeai as genai
+
+    FakeGenerativeModel.latency = latency
+    genai.GenerativeModel = FakeGenerativeModel
+    return FakeGenerativeModel
+
+
+def install_fake_embedder(latency: float = 0.0, embedder: Optional[Embedder] = None) -> Embedder:
+    """Swap the RAG embedding backend for a local deterministic one."""
+    from src import rag_qa
+
+    backend = embedder or SlowHashEmbedder(latency)
+    rag_qa.embedding_function().embedder = backend
+    return backend
@@ -0,0 +1,89 @@
+# benchmarks/import_time.py
+"""Cold-start benchmark: how long importing the entry points takes.
+
+Each module is imported in a fresh interpreter (`--runs` times) so nothing is
+shared between samples, and `-X importtime` names the slowest imports it
+pulls in. Prints a JSON report:
+
+    python -m benchmarks.import_time --runs 5 --max-seconds 1.5
+
+With `--max-seconds`, exits non-zero when any module's median import time is
+over the limit, so it can guard against startup regressions in CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+MODULES = ["src.config", "src.agent", "src.rag_qa", "src.pdf_pipeline", "api_server"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_TIMER = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def _env() -> Dict[str, str]:
+    # Without a key the lazy modules must still import; point state at a scratch dir.
+    env = dict(os.environ)
+    env.pop("GOOGLE_API_KEY", None)
+    env.setdefault("CHROMA_DB_DIR", os.path.join(tempfile.gettempdir(), "bench_chroma"))
+    env.setdefault("SESSION_DB_PATH", ":memory:")
+    env["PYTHONWARNINGS"] = "ignore"
+    return env
+
+
+def time_import(module: str, runs: int) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _TIMER.format(module=module)], cwd=ROOT, env=_env(),
+                             capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def slowest_imports(module: str, top: int) -> List[Dict[str, Any]]:
+    """The top-level imports (direct dependencies) of `module` with the largest cumulative time."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, env=_env(),
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, int(cumulative), name.strip()))
+    direct = [r for r in rows if r[0] == 1]
+    return [{"module": name, "seconds": us / 1e6} for _, us, name in sorted(direct, key=lambda r: -r[1])[:top]]
+
+
+def main(argv=None) -> bool:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="How many of the slowest imports to list per module.")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail if a median import takes longer.")
+    parser.add_argument("--modules", nargs="*", default=MODULES)
+    args = parser.parse_args(argv)
+
+    report: Dict[str, Any] = {"config": vars(args), "modules": {}}
+    ok = True
+    for module in args.modules:
+        samples = time_import(module, args.runs)
+        median = statistics.median(samples)
+        ok = ok and (args.max_seconds is None or median <= args.max_seconds)
+        report["modules"][module] = {
+            "median_seconds": median,
+            "min_seconds": min(samples),
+            "slowest_imports": slowest_imports(module, args.top),
+        }
+    print(json.dumps(report, indent=2))
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
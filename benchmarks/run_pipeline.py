@@ -0,0 +1,194 @@
+# benchmarks/run_pipeline.py
+"""End-to-end benchmark of the research graph and Q&A against offline fakes.
+
+Runs the full `src.agent` workflow (fetch, process, plan, build_rag) and then
+`answer_query` against local fake arXiv / Semantic Scholar / PDF servers and a
+deterministic fake Gemini + embedder, and prints a JSON report:
+
+    python -m benchmarks.run_pipeline --papers 20 --questions 50 --llm-latency 0.2
+
+Caches and the Chroma store live in a fresh temporary directory per run, so
+the first pass is always cold; `--passes 2` adds a warm pass over the same
+caches to measure repeat sessions. `--corpus-chunks N` first indexes N
+synthetic chunks, standing in for the corpus earlier sessions left behind, so
+peak memory can be compared as the corpus grows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+QUESTIONS = [
+    "What datasets are used?",
+    "Summarize the methods.",
+    "What are the main limitations?",
+    "Which baselines are compared?",
+    "What is the main contribution?",
+    "How is the model evaluated?",
+]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": statistics.fmean(ordered)}
+
+
+def run_graph(app, state: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the graph, timing each node from its tracing span (nodes may run in parallel)."""
+    from src import tracing
+
+    final_state = dict(state)
+    started = time.perf_counter()
+    with tracing.span("benchmark.pass") as root:
+        for step in app.stream(dict(state), stream_mode="updates"):
+            for update in step.values():
+                final_state.update(update or {})
+    total = time.perf_counter() - started
+    nodes: Dict[str, float] = {}
+    for s in tracing.tracer.finished_spans(getattr(root, "trace_id", None)):
+        if s.name.startswith("node."):
+            nodes[s.name[5:]] = nodes.get(s.name[5:], 0.0) + s.duration
+    return {"state": final_state, "node_seconds": nodes, "total_seconds": total}
+
+
+def run_questions(answer_query, collection, n: int, concurrency: int) -> Dict[str, Any]:
+    questions = [QUESTIONS[i % len(QUESTIONS)] + (f" (variant {i // len(QUESTIONS)})" if i >= len(QUESTIONS) else "")
+                 for i in range(n)]
+
+    def ask(q: str) -> float:
+        t = time.perf_counter()
+        answer_query(collection, q)
+        return time.perf_counter() - t
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(ask, questions))
+    wall = time.perf_counter() - started
+    return {"questions": n, "concurrency": concurrency, "wall_seconds": wall,
+            "qps": n / wall if wall else 0.0, "latency_seconds": percentiles(latencies)}
+
+
+def seed_corpus(n_chunks: int, per_paper: int = 50) -> None:
+    """Index `n_chunks` synthetic chunks (of ~1 KB each) into the corpus collection."""
+    from src.rag_qa import build_rag
+
+    rng = random.Random(0)
+    vocabulary = [f"term{i}" for i in range(20000)]
+    for start in range(0, n_chunks, per_paper):
+        pid = f"seed{start // per_paper}"
+        docs = [" ".join(rng.choices(vocabulary, k=120)) for _ in range(min(per_paper, n_chunks - start))]
+        build_rag(documents=docs, metadatas=[{"paper_id": pid, "title": pid.upper()} for _ in docs])
+
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--papers", type=int, default=10)
+    parser.add_argument("--source", choices=["arxiv", "semantic", "all"], default="arxiv")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--passes", type=int, default=1, help="2+ re-runs the graph over warm caches")
+    parser.add_argument("--http-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--corpus-chunks", type=int, default=0, help="index this many synthetic chunks first")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the Python heap peak (slower)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="ara-bench-")
+    os.environ.update({
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "benchmark"),
+        "CHROMA_DB_DIR": os.path.join(workdir, "chroma"),
+        "PDF_CACHE_DIR": os.path.join(workdir, "pdfs"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        "LLM_RESULT_CACHE_PATH": os.path.join(workdir, "llm_results.sqlite3"),
+        "DEDUP_INDEX_PATH": os.path.join(workdir, "fingerprints.sqlite3"),
+        "SPARSE_INDEX_PATH": os.path.join(workdir, "sparse_index.sqlite3"),
+        "VECTOR_DB_DIR": os.path.join(workdir, "vectors"),
+        "PDF_HOST_MIN_INTERVAL": "0",
+    })
+
+    from benchmarks import fakes
+
+    # The pipeline reports progress with print(); keep stdout for the JSON report.
+    with contextlib.redirect_stdout(sys.stderr), \
+            fakes.pdf_server(args.http_latency) as pdfs, \
+            fakes.arxiv_server(pdfs.url, args.http_latency) as arxiv, \
+            fakes.semantic_scholar_server(pdfs.url, args.http_latency) as s2:
+        os.environ["ARXIV_API_URL"] = arxiv.url
+        os.environ["SEMANTIC_SCHOLAR_API_URL"] = s2.url
+
+        if args.tracemalloc:
+            tracemalloc.start()
+        import_started = time.perf_counter()
+        from src.agent import app
+        from src.rag_qa import answer_query
+        import_seconds = time.perf_counter() - import_started
+        llm = fakes.install_fake_llm(args.llm_latency)
+        fakes.install_fake_embedder(args.embed_latency)
+        if args.corpus_chunks:
+            seed_corpus(args.corpus_chunks)
+
+        passes = []
+        for i in range(args.passes):
+            run = run_graph(app, {"query": "benchmark", "source": args.source, "max_results": args.papers})
+            state = run.pop("state")
+            processed = state.get("processed_papers") or []
+            chunks = sum(p.get("chunk_count", 0) for p in processed)
+            node = run["node_seconds"]
+            run.update({
+                "pass": i + 1,
+                "papers_fetched": len(state.get("papers") or []),
+                "papers_processed": len(processed),
+                "chunks": chunks,
+                "papers_per_min": 60 * len(processed) / node["process"] if node.get("process") else 0.0,
+                # process indexes each paper as it finishes, so this covers parse + embed.
+                "chunks_per_second": chunks / node["process"] if node.get("process") else 0.0,
+            })
+            if state.get("rag_collection") is not None:
+                run["qa"] = run_questions(answer_query, state["rag_collection"], args.questions, args.concurrency)
+            passes.append(run)
+
+    report = {
+        "config": vars(args),
+        "import_seconds": import_seconds,
+        "passes": passes,
+        "llm_calls": llm.calls,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children_max_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+    if args.tracemalloc:
+        report["python_heap_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
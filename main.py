@@ -1,24 +1,49 @@
 # main.py
 import argparse
-from src.agent import app # Import the compiled graph
-from src.rag_qa import answer_query
+import json
+import sys
+from src.agent import ResearchRun
+from src.config import warm_up
+from src.rag_qa import answer_queries, answer_query_stream
+
+
+def read_questions(path):
+    """Questions from a JSONL file: one {"question": ...} object (or JSON string) per line."""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                questions.append(item["question"] if isinstance(item, dict) else str(item))
+    return questions
+
 
 def main():
     parser = argparse.ArgumentParser(description="AI Research Assistant Agent")
     parser.add_argument("query", help="Topic to search for")
-    parser.add_argument("--source", choices=["arxiv", "semantic"], default="arxiv",
-                        help="Which source to fetch papers from.")
+    parser.add_argument("--source", choices=["arxiv", "semantic", "all"], default="arxiv",
+                        help="Which source to fetch papers from ('all' searches every source and deduplicates).")
+    parser.add_argument("--max-results", type=int, default=5,
+                        help="How many papers to fetch (pages through the sources as needed).")
+    parser.add_argument("--questions", metavar="FILE",
+                        help="Answer the questions in a JSONL file in one batch instead of prompting interactively.")
+    parser.add_argument("--output", metavar="FILE",
+                        help="Where to write the JSONL answers of --questions (default: stdout).")
     args = parser.parse_args()
+    questions = read_questions(args.questions) if args.questions else None
+    # Compile the graph and create the Chroma/Gemini clients in the background.
+    warm_up()
 
     # Define the initial state to start the graph
-    initial_state = {"query": args.query, "source": args.source}
+    initial_state = {"query": args.query, "source": args.source, "max_results": args.max_results}
     
-    # Invoke the graph. It will run through all the steps.
-    final_state = app.invoke(initial_state)
+    # Run the graph in the background and wait only until abstracts are
+    # indexed and the plan exists; full text keeps being indexed meanwhile.
+    run = ResearchRun(initial_state)
+    run.ready.wait()
 
-    # After the graph finishes, we can use the final state
-    rag_collection = final_state.get("rag_collection")
-    reading_plan = final_state.get("reading_plan")
+    rag_collection = run.state.get("rag_collection")
+    reading_plan = run.state.get("reading_plan")
 
     if not rag_collection or not reading_plan:
         print("\nWorkflow ended prematurely. No results to display.")
@@ -30,8 +55,24 @@ def main():
         print(f"{idx}. {paper.get('title', 'Untitled')}")
     print("="*50)
 
+    if questions is not None:
+        # Batch mode: wait for the full text, then write one JSON line per answer as it completes.
+        run.finished.wait()
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            for result in answer_queries(rag_collection, questions):
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        return
 
-    print("\nDatabase ready. Enter questions about these papers (type 'exit' to quit):")
+    if run.finished.is_set():
+        print("\nDatabase ready. Enter questions about these papers (type 'exit' to quit):")
+    else:
+        print("\nAbstracts indexed; full text is still being added in the background.")
+        print("Enter questions about these papers (type 'exit' to quit):")
     while True:
         q = input("Q: ").strip()
         if q.lower() in ('exit', 'quit'):
@@ -39,9 +80,18 @@ def main():
         if not q:
             continue
         
-        # Use the RAG collection from the final state to answer questions
-        ans = answer_query(rag_collection, q)
-        print(f"A: {ans}\n")
+        # Use the RAG collection from the final state to answer questions,
+        # printing tokens as they arrive.
+        print("A: ", end="", flush=True)
+        tiers = {}
+        for event in answer_query_stream(rag_collection, q):
+            if event["type"] == "token":
+                print(event["text"], end="", flush=True)
+            elif event["type"] == "done":
+                tiers = event["usage"].get("tiers", {})
+        if tiers and "full_text" not in tiers:
+            print("\n(answered from abstracts only; full text not indexed yet)", end="")
+        print("\n")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
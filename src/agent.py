@@ -1,133 +1,235 @@
 import os
-from typing import List, Dict, Any, TypedDict
-from langgraph.graph import StateGraph, END
+import threading
+from typing import List, Dict, Any, Optional, TypedDict
 
-from .retrieval import fetch_arxiv, fetch_semantic_scholar, PDFLoaderTool
+from .search import SOURCES, iter_search_papers
 from .planner import plan_reading_with_llm
-from .rag_qa import build_rag
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import requests
-import time
+from .rag_qa import ABSTRACT_TIER, build_rag, has_full_text, open_session
+from .dedup import DEDUP, Deduplicator
+from .ingest import StreamingIndexer, cached_chunks, paper_record
+from .pdf_pipeline import process_papers
+from .pdf_cache import paper_key
+from .tracing import current_span, traced
+
+ABSTRACT_INDEX_BATCH = int(os.getenv("ABSTRACT_INDEX_BATCH", "32"))
 
 # Define the State that our agent will use.
 class AgentState(TypedDict):
     query: str
     source: str
+    max_results: int
     papers: List[Dict[str, Any]]
+    # Compact per-paper records (see `ingest.paper_record`); chunk text is
+    # streamed to the index, not kept in the state.
     processed_papers: List[Dict[str, Any]]
     rag_collection: Any
     reading_plan: List[Dict[str, Any]]
 
 # Define the Nodes.
+@traced("node.fetch")
 def fetch_papers_node(state: AgentState) -> Dict[str, Any]:
     """Fetches the initial list of papers."""
     print("--- 1. FETCHING PAPERS ---")
     query = state["query"]
     source = state["source"]
-    print(f"Searching {source.capitalize()} for '{query}'...")
-    if source == "arxiv":
-        papers = fetch_arxiv(query)
-    else:
-        papers = fetch_semantic_scholar(query)
-    
+    sources = SOURCES.get(source, (source,))
+    print(f"Searching {', '.join(s.capitalize() for s in sources)} for '{query}'...")
+    max_results = state.get("max_results", 5)
+    # Titles + abstracts are indexed in batches as results stream in, so
+    # questions can be answered (and embedding overlaps the search) while the
+    # full text is still being downloaded and parsed.
+    papers: List[Dict[str, Any]] = []
+    abstracts: List[Dict[str, Any]] = []
+    for paper in iter_search_papers(query, max_results, sources=sources):
+        papers.append(paper)
+        if paper.get('summary'):
+            abstracts.append(paper)
+        if len(abstracts) >= ABSTRACT_INDEX_BATCH:
+            _index_abstracts(abstracts)
+            abstracts = []
+    _index_abstracts(abstracts)
+
     if papers:
         print(f"Found {len(papers)} papers.")
-        
-    return {"papers": papers}
+    current_span().set(source=source, papers=len(papers))
+    if not papers:
+        return {"papers": papers}
+
+    # The session covers every fetched paper, so full-text chunks show up in
+    # it as soon as they are backfilled.
+    session = open_session([paper_key(p.get('url', '')) for p in papers])
+    return {"papers": papers, "rag_collection": session}
+
+
+def _index_abstracts(papers: List[Dict[str, Any]]) -> None:
+    if papers:
+        build_rag(
+            documents=[f"{p.get('title', '')}\n\n{p['summary']}" for p in papers],
+            metadatas=[_paper_metadata(p) for p in papers],
+            tier=ABSTRACT_TIER,
+        )
+
+
+def _paper_metadata(paper: Dict[str, Any]) -> Dict[str, Any]:
+    return {'paper_id': paper_key(paper.get('url', '')), 'title': paper.get('title', ''), 'authors': ", ".join(paper.get('authors', [])), 'url': paper.get('url', '')}
+
 
+@traced("node.process")
 def process_pdfs_node(state: AgentState) -> Dict[str, Any]:
-    """Downloads PDFs, extracts text, and chunks it."""
+    """Downloads PDFs, extracts text and chunks it, streaming each paper into the index as soon as it is ready."""
     print("\n--- 2. PROCESSING FULL TEXT ---")
-    papers = state["papers"]
-    PDF_DIR = "./temp_pdfs"
-    os.makedirs(PDF_DIR, exist_ok=True)
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    processed_papers = []
-    for paper in papers:
-        try:
-            pdf_url = paper['url'].replace('/abs/', '/pdf/') + '.pdf' if 'arxiv.org' in paper['url'] else paper['url']
-            pdf_filename = f"{paper['url'].split('/')[-1]}.pdf"
-            pdf_path = os.path.join(PDF_DIR, pdf_filename)
-            response = requests.get(pdf_url)
-            response.raise_for_status()
-            with open(pdf_path, 'wb') as f: f.write(response.content)
-            loader = PDFLoaderTool(file_path=pdf_path)
-            pages = loader._run(query="")
-            full_text = "\n".join(pages)
-            if full_text:
-                chunks = text_splitter.split_text(full_text)
-                paper_meta = {'title': paper.get('title', ''), 'authors': paper.get('authors', []), 'url': paper.get('url', ''), 'summary': paper.get('summary', ''), 'chunks': chunks}
-                processed_papers.append(paper_meta)
-            time.sleep(1)
-        except Exception as e:
-            print(f"  Failed to process paper {paper.get('title', 'Untitled')}: {e}")
-    return {"processed_papers": processed_papers}
+    # Indexing runs on a background thread fed through a bounded queue, so
+    # embedding overlaps with the downloads and parsing of the remaining
+    # papers while only a few papers' chunks are held in memory at a time.
+    indexer = StreamingIndexer()
+    # Near-duplicate papers (another URL or arXiv version of a paper already
+    # in the corpus) are swapped for the original in the session, not embedded.
+    # Only an original with full text counts: every fetched paper already has
+    # its abstract indexed, even if its PDF failed or is still queued.
+    session = state.get("rag_collection")
+    dedup = Deduplicator(is_indexed=has_full_text) if DEDUP else None
+
+    def index_paper(paper: Dict[str, Any]) -> Dict[str, Any]:
+        paper_id = paper_key(paper.get('url', ''))
+        if dedup is not None:
+            dedup.dedup_paper(paper, paper_id)
+            if paper.get("duplicate_of") and session is not None:
+                session.replace_paper(paper_id, paper["duplicate_of"])
+        record = paper_record(paper, paper_id)
+        indexer.submit(record, _paper_metadata(paper), paper["chunks"], paper.get("chunk_meta"))
+        return record
 
+    try:
+        records = process_papers(state["papers"], on_result=index_paper)
+    finally:
+        stats = indexer.close()
+    current_span().set(papers=len(records), chunks_indexed=stats["chunks"], index_batches=stats["batches"])
+    if dedup is not None:
+        current_span().set(duplicate_papers=dedup.stats["duplicate_papers"], duplicate_chunks=dedup.stats["duplicate_chunks"])
+        if dedup.stats["duplicate_papers"] or dedup.stats["duplicate_chunks"]:
+            print(f"  Deduplication skipped {dedup.stats['duplicate_papers']} papers and "
+                  f"{dedup.stats['duplicate_chunks']} of {dedup.stats['chunks']} chunks.")
+    return {"processed_papers": records}
 
+
+@traced("node.plan")
 def plan_reading_node(state: AgentState) -> Dict[str, Any]:
-    """Generates the reading plan using the new LLM planner."""
+    """Generates the reading plan from the fetched titles and abstracts, alongside PDF processing."""
     print("\n--- 3. CREATING READING PLAN ---")
-    plan = plan_reading_with_llm(state["processed_papers"])
+    plan = plan_reading_with_llm(state["papers"])
     return {"reading_plan": plan}
 
+@traced("node.build_rag")
 def build_rag_node(state: AgentState) -> Dict[str, Any]:
-    """Builds the RAG database from the processed paper chunks."""
+    """Joins planning and full-text processing.
+
+    Full-text chunks were already backfilled into the index by
+    `process_pdfs_node`, so this only catches anything that failed to index
+    there. The session view itself was created from the abstracts in
+    `fetch_papers_node`.
+    """
     print("\n--- 4. BUILDING RAG DATABASE ---")
-    all_chunks = []
-    all_metadatas = []
-    for paper in state["processed_papers"]:
-        for chunk in paper["chunks"]:
-            all_chunks.append(chunk)
-            all_metadatas.append({'title': paper.get('title', ''), 'authors': ", ".join(paper.get('authors', [])), 'url': paper.get('url', '')})
-    if not all_chunks:
-        return {"rag_collection": None}
-    collection = build_rag(documents=all_chunks, metadatas=all_metadatas)
-    print(f"Database built with {len(all_chunks)} text chunks.")
-    return {"rag_collection": collection}
-
-
-def decide_to_process(state: AgentState) -> str:
-    """Determines whether to process PDFs or end."""
+    records = state.get("processed_papers") or []
+    if not records:
+        print("Could not process any full text; answers will draw on abstracts only.")
+        return {}
+    retry = [r for r in records if r.get("chunk_count") and not r.get("indexed") and not r.get("duplicate_of")]
+    if retry:
+        # Reload the chunks of papers that failed to index from the PDF text cache.
+        indexer = StreamingIndexer()
+        try:
+            for record in retry:
+                cached = cached_chunks(record)
+                if cached is not None:
+                    indexer.submit(record, _paper_metadata(record), *cached)
+        finally:
+            indexer.close()
+    chunks = sum(r.get("chunk_count", 0) for r in records if r.get("indexed"))
+    current_span().set(chunks=chunks, retried=len(retry))
+    print(f"Session index covers {chunks} full-text chunks.")
+    return {}
+
+
+def decide_after_fetch(state: AgentState):
+    """Ends the workflow when nothing was found; otherwise plans and processes in parallel."""
     if not state.get("papers"):
         print("No papers found. Ending workflow.")
         return "end"
     else:
-        return "process"
+        return ["plan", "process"]
 
-def decide_to_plan(state: AgentState) -> str:
-    """Determines whether to create a plan or end."""
-    if not state.get("processed_papers"):
-        print("Could not process any papers. Ending workflow.")
-        return "end"
-    else:
-        return "plan"
-
-workflow = StateGraph(AgentState)
-
-workflow.add_node("fetch", fetch_papers_node)
-workflow.add_node("process", process_pdfs_node)
-workflow.add_node("plan", plan_reading_node)
-workflow.add_node("build_rag", build_rag_node)
-
-workflow.set_entry_point("fetch")
-
-workflow.add_conditional_edges(
-    "fetch",
-    decide_to_process,
-    {
-        "process": "process",
-        "end": END,
-    },
-)
-workflow.add_conditional_edges(
-    "process",
-    decide_to_plan,
-    {
-        "plan": "plan",
-        "end": END,
-    },
-)
-workflow.add_edge("plan", "build_rag")
-workflow.add_edge("build_rag", END)
-
-app = workflow.compile()
\ No newline at end of file
+def build_workflow():
+    """The research StateGraph (uncompiled)."""
+    from langgraph.graph import END, StateGraph
+
+    workflow = StateGraph(AgentState)
+
+    workflow.add_node("fetch", fetch_papers_node)
+    workflow.add_node("process", process_pdfs_node)
+    workflow.add_node("plan", plan_reading_node)
+    workflow.add_node("build_rag", build_rag_node)
+
+    workflow.set_entry_point("fetch")
+
+    # fetch fans out to plan (titles + abstracts only) and process (PDFs, indexed
+    # paper by paper); build_rag waits for both.
+    workflow.add_conditional_edges(
+        "fetch",
+        decide_after_fetch,
+        ["plan", "process", END],
+    )
+    workflow.add_edge(["plan", "process"], "build_rag")
+    workflow.add_edge("build_rag", END)
+    return workflow
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def get_app():
+    """The compiled workflow, built on first use (importing langgraph takes about a second)."""
+    global _app
+    with _app_lock:
+        if _app is None:
+            _app = build_workflow().compile()
+        return _app
+
+
+def __getattr__(name: str):
+    # `from src.agent import app` keeps working, compiling the graph on first access.
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class ResearchRun:
+    """Runs the workflow on a background thread.
+
+    `ready` is set as soon as the abstract index and the reading plan exist,
+    which is long before the full text is processed; callers can start
+    answering questions then while full-text chunks keep being backfilled.
+    `finished` is set when the whole workflow is done (or failed, see `error`).
+    """
+
+    def __init__(self, initial_state: Dict[str, Any]):
+        self.state: Dict[str, Any] = dict(initial_state)
+        self.error: Optional[BaseException] = None
+        self.ready = threading.Event()
+        self.finished = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="research-run", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            for step in get_app().stream(dict(self.state), stream_mode="updates"):
+                for update in step.values():
+                    self.state.update(update or {})
+                if self.state.get("rag_collection") and self.state.get("reading_plan"):
+                    self.ready.set()
+        except Exception as e:
+            self.error = e
+            print(f"Research workflow failed: {e}")
+        finally:
+            self.ready.set()
+            self.finished.set()
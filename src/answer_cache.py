@@ -0,0 +1,133 @@
+# src/answer_cache.py
+"""Semantic cache for RAG answers.
+
+Answers are keyed on the session's paper-set fingerprint plus the normalised
+question. An exact key match is served directly; otherwise the cache compares
+the question embedding against cached questions for the same fingerprint and
+serves the best one at or above `threshold` cosine similarity. Entries expire
+after `ttl` seconds, the least recently used entry is evicted beyond
+`max_entries`, and `invalidate_papers` drops every entry that drew on a paper
+whose chunks changed.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .hybrid import cosine
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+_space = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    return _space.sub(" ", question.strip().lower()).rstrip(" ?!.")
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "exact_hits": 0, "semantic_hits": 0, "misses": 0,
+            "evictions": 0, "expirations": 0, "invalidations": 0,
+        }
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry["created"] > self.ttl
+
+    def lookup(self, fingerprint: str, question: str, vector: Optional[List[float]] = None) -> Optional[Dict[str, Any]]:
+        """Return the cached entry ({"answer", "sources", "usage", ...}) for this question, or None."""
+        key = (fingerprint, normalize_question(question))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry
+
+            best_key, best_score = None, self.threshold
+            if vector is not None:
+                for other_key, other in self._entries.items():
+                    if other_key[0] != fingerprint or other["vector"] is None or self._expired(other, now):
+                        continue
+                    score = cosine(vector, other["vector"])
+                    if score >= best_score:
+                        best_key, best_score = other_key, score
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+                self.stats["semantic_hits"] += 1
+                return self._entries[best_key]
+
+            self.stats["misses"] += 1
+            return None
+
+    def store(
+        self,
+        fingerprint: str,
+        question: str,
+        answer: str,
+        *,
+        vector: Optional[List[float]] = None,
+        sources: Optional[List[Dict[str, Any]]] = None,
+        usage: Optional[Dict[str, Any]] = None,
+        paper_ids: Iterable[str] = (),
+    ) -> None:
+        key = (fingerprint, normalize_question(question))
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "sources": sources or [],
+                "usage": usage or {},
+                "vector": list(vector) if vector is not None else None,
+                "paper_ids": frozenset(paper_ids),
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate_papers(self, paper_ids: Iterable[str]) -> int:
+        """Drop every entry whose answer drew on any of `paper_ids`."""
+        changed = set(paper_ids)
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e["paper_ids"] & changed]
+            for k in stale:
+                del self._entries[k]
+            self.stats["invalidations"] += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus derived hit rate, for metrics endpoints."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,109 @@
+# src/config.py
+"""Shared configuration and lazily created clients.
+
+Importing this module is cheap. `.env` is loaded once here, and the heavy
+clients (the configured `google.generativeai` module, Gemini models and the
+vector store client) are created on first use and shared by every module, so a
+missing `GOOGLE_API_KEY` only fails the calls that need it and `--help` or a
+Streamlit rerun doesn't pay for imports it never uses.
+
+`warm_up()` creates the clients on a background thread, letting the CLI and
+the API server overlap that cost with argument parsing and the first search.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).resolve().parents[1] / ".env", override=True)
+
+MODEL_NAME = "gemini-1.5-flash-latest"
+
+_lock = threading.RLock()
+_genai: Any = None
+_chroma: Any = None
+_vectors: Any = None
+_models: Dict[str, Tuple[Any, Any]] = {}
+
+
+def google_api_key() -> str:
+    key = os.getenv("GOOGLE_API_KEY")
+    if not key:
+        raise RuntimeError("GOOGLE_API_KEY is not set; add it to .env or the environment.")
+    return key
+
+
+def genai():
+    """The `google.generativeai` module, configured with the API key on first use."""
+    global _genai
+    with _lock:
+        if _genai is None:
+            import google.generativeai as module
+
+            module.configure(api_key=google_api_key())
+            _genai = module
+        return _genai
+
+
+def generative_model(name: str = MODEL_NAME):
+    """One `GenerativeModel` per model name, shared across calls and threads.
+
+    A model is rebuilt if `genai.GenerativeModel` has been replaced since it
+    was created (the benchmark fakes and tests patch it).
+    """
+    with _lock:
+        factory = genai().GenerativeModel
+        cached = _models.get(name)
+        if cached is None or cached[0] is not factory:
+            _models[name] = (factory, factory(name))
+        return _models[name][1]
+
+
+def chroma_client():
+    """The process-wide persistent Chroma client (`CHROMA_DB_DIR`, default ./chroma_db)."""
+    global _chroma
+    with _lock:
+        if _chroma is None:
+            from chromadb import PersistentClient
+
+            _chroma = PersistentClient(path=os.getenv("CHROMA_DB_DIR", "./chroma_db"))
+        return _chroma
+
+
+def vector_client():
+    """The vector store client selected by `VECTOR_BACKEND`: Chroma (default) or the local mmap store."""
+    global _vectors
+    with _lock:
+        if _vectors is None:
+            from . import vector_store
+
+            if vector_store.VECTOR_BACKEND == "local":
+                _vectors = vector_store.LocalVectorClient(vector_store.VECTOR_DB_DIR)
+            else:
+                _vectors = chroma_client()
+        return _vectors
+
+
+def warm_up(*, graph: bool = True) -> threading.Thread:
+    """Create the shared clients (and compile the workflow) on a background thread."""
+
+    def run() -> None:
+        try:
+            if graph:
+                from .agent import get_app
+
+                get_app()
+            vector_client()
+            genai()
+        except Exception as e:
+            print(f"  Warm-up stopped early: {e}")
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
@@ -0,0 +1,120 @@
+# src/context.py
+"""Token-budgeted context packing for the RAG prompt.
+
+`pack_context` takes ranked retrieval hits and builds the prompt's context
+block under a token budget:
+
+  * duplicate chunks are dropped: exact copies, and near-identical passages
+    (SimHash within `DEDUP_CHUNK_DISTANCE` bits), e.g. the same paragraph
+    in two versions of a paper;
+  * chunks are admitted greedily in relevance order while they fit;
+  * admitted chunks from the same paper are grouped under one header, put
+    back in document order, and adjacent chunks are merged by trimming the
+    overlap `RecursiveCharacterTextSplitter` repeated between them.
+
+Token counts are estimated at ~4 characters per token, which is close enough
+for budgeting and costs nothing to compute.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional
+
+from .dedup import DEDUP_CHUNK_DISTANCE, hamming, simhash
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CHUNK_OVERLAP = 100
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _ordinal(hit: Dict[str, Any]) -> Optional[int]:
+    """Chunk ordinal from a `paper:ordinal:hash` chunk ID, if there is one."""
+    parts = (hit.get("id") or "").rsplit(":", 2)
+    return int(parts[1]) if len(parts) == 3 and parts[1].isdigit() else None
+
+
+def overlap_length(prev: str, nxt: str, max_overlap: int = CHUNK_OVERLAP) -> int:
+    """Length of the longest suffix of `prev` that is also a prefix of `nxt`."""
+    for n in range(min(max_overlap, len(prev), len(nxt)), 0, -1):
+        if prev.endswith(nxt[:n]):
+            return n
+    return 0
+
+
+def _paper_key(meta: Dict[str, Any]) -> str:
+    return meta.get("paper_id") or meta.get("url") or meta.get("title", "")
+
+
+def _header(meta: Dict[str, Any]) -> str:
+    return f"Source: {meta.get('title', '')}\nAuthors: {meta.get('authors', 'N/A')}\nContent:\n"
+
+
+def pack_context(hits: List[Dict[str, Any]], budget_tokens: int = CONTEXT_TOKEN_BUDGET) -> Dict[str, Any]:
+    """Pack ranked `hits` into a context block of at most `budget_tokens` (estimated).
+
+    Returns {"text", "tokens", "chunks", "papers", "dropped", "tiers"}, where
+    `tiers` counts the packed chunks per index tier (abstract / full_text).
+    """
+    seen_texts = set()
+    seen_hashes: List[int] = []
+    selected: Dict[str, List[Dict[str, Any]]] = {}
+    used = 0
+    dropped = 0
+    for hit in hits:
+        text = hit["document"]
+        h = simhash(text) if text not in seen_texts else None
+        if h is None or any(hamming(h, other) <= DEDUP_CHUNK_DISTANCE for other in seen_hashes):
+            dropped += 1
+            continue
+        seen_texts.add(text)
+        seen_hashes.append(h)
+        key = _paper_key(hit["metadata"])
+        cost = estimate_tokens(text) + 1
+        if key not in selected:
+            cost += estimate_tokens(_header(hit["metadata"])) + 1
+        else:
+            ordinal = _ordinal(hit)
+            for other in selected[key]:
+                other_ordinal = _ordinal(other)
+                if ordinal is not None and other_ordinal is not None and abs(ordinal - other_ordinal) == 1:
+                    first, second = (other, hit) if other_ordinal < ordinal else (hit, other)
+                    cost -= estimate_tokens(second["document"][:overlap_length(first["document"], second["document"])])
+        if used + cost > budget_tokens:
+            dropped += 1
+            continue
+        used += cost
+        selected.setdefault(key, []).append(hit)
+
+    blocks = []
+    chunks = 0
+    tiers: Dict[str, int] = {}
+    for group in selected.values():
+        group.sort(key=lambda h: (_ordinal(h) is None, _ordinal(h) or 0))
+        passages: List[str] = []
+        prev: Optional[Dict[str, Any]] = None
+        for hit in group:
+            text = hit["document"]
+            if prev is not None and _ordinal(prev) is not None and _ordinal(hit) == _ordinal(prev) + 1:
+                passages[-1] += text[overlap_length(passages[-1], text):]
+            else:
+                passages.append(text)
+            prev = hit
+            chunks += 1
+            tier = hit["metadata"].get("tier", "full_text")
+            tiers[tier] = tiers.get(tier, 0) + 1
+        blocks.append(_header(group[0]["metadata"]) + "\n...\n".join(passages))
+
+    text = "\n\n".join(blocks)
+    return {
+        "text": text,
+        "tokens": estimate_tokens(text),
+        "chunks": chunks,
+        "papers": len(blocks),
+        "dropped": dropped,
+        "tiers": tiers,
+    }
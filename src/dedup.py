@@ -0,0 +1,235 @@
+# src/dedup.py
+"""Near-duplicate detection for papers and chunks, run before embedding.
+
+The same paper often arrives more than once: from arXiv and Semantic Scholar
+under different URLs, or as different arXiv versions (`v1` vs `v3`). Search
+already merges results with the same DOI, arXiv ID or title. This stage catches
+the copies that slip through, once their text is known:
+
+  * Papers: a MinHash signature over the paper's word shingles is looked up
+    (with LSH banding) in a persistent `FingerprintIndex`. A paper whose
+    estimated Jaccard similarity to a known, indexed paper is at least
+    `DEDUP_PAPER_THRESHOLD` is collapsed into that paper, so none of its chunks
+    are embedded.
+  * Chunks: a chunk whose 64-bit SimHash is within `DEDUP_CHUNK_DISTANCE` bits
+    of an earlier chunk of the same paper is dropped. Only the paper's own
+    chunks are compared, so what the corpus holds for a paper never depends
+    on which other papers were processed with it; near-identical passages of
+    different papers are collapsed when the prompt context is packed
+    (`context.pack_context`), so they don't crowd distinct papers out.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEDUP = os.getenv("DEDUP", "1") != "0"
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", "./fingerprints.sqlite3")
+DEDUP_PAPER_THRESHOLD = float(os.getenv("DEDUP_PAPER_THRESHOLD", "0.7"))
+DEDUP_CHUNK_DISTANCE = int(os.getenv("DEDUP_CHUNK_DISTANCE", "3"))
+
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+BANDS = 32  # of NUM_PERM // BANDS rows each; candidates from ~0.4 Jaccard up
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_rng = np.random.default_rng(20240611)
+_A = _rng.integers(1, 2 ** 32, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2 ** 32, NUM_PERM, dtype=np.uint64)
+_WORD = re.compile(r"\w+")
+
+
+def _shingles(text: str, size: int) -> List[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash signature (NUM_PERM uint32 values) of `text`'s word shingles, or None for empty text."""
+    hashes = np.unique(np.array([zlib.crc32(s.encode("utf-8")) for s in _shingles(text, SHINGLE_WORDS)], dtype=np.uint64))
+    if not len(hashes):
+        return None
+    return (((_A[:, None] * hashes[None, :]) + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.mean(a == b))
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of `text`'s word shingles."""
+    shingles = _shingles(text, SHINGLE_WORDS)
+    if not shingles:
+        return 0
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    weights = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(weights).tobytes(), "big")
+
+
+class FingerprintIndex:
+    """Persistent SQLite map of paper ID -> MinHash signature, with LSH band buckets for lookup."""
+
+    def __init__(self, path: str = DEDUP_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS papers (paper_id TEXT PRIMARY KEY, signature BLOB);"
+            "CREATE TABLE IF NOT EXISTS bands (band INTEGER, bucket TEXT, paper_id TEXT,"
+            " PRIMARY KEY (band, bucket, paper_id));"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _buckets(signature: np.ndarray) -> List[Tuple[int, str]]:
+        rows = NUM_PERM // BANDS
+        return [(b, hashlib.sha1(signature[b * rows:(b + 1) * rows].tobytes()).hexdigest()[:16]) for b in range(BANDS)]
+
+    def candidates(self, signature: np.ndarray, exclude: str = "") -> List[Tuple[str, float]]:
+        """Known papers sharing an LSH bucket with `signature`, most similar first."""
+        with self._lock:
+            ids = set()
+            for band, bucket in self._buckets(signature):
+                ids.update(r[0] for r in self._conn.execute(
+                    "SELECT paper_id FROM bands WHERE band=? AND bucket=?", (band, bucket)))
+            ids.discard(exclude)
+            found = [
+                (pid, similarity(signature, np.frombuffer(blob, dtype=np.uint32)))
+                for pid in ids
+                for blob, in self._conn.execute("SELECT signature FROM papers WHERE paper_id=?", (pid,))
+            ]
+        return sorted(found, key=lambda c: -c[1])
+
+    def add(self, paper_id: str, signature: np.ndarray) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM bands WHERE paper_id=?", (paper_id,))
+            self._conn.execute("INSERT OR REPLACE INTO papers VALUES (?, ?)", (paper_id, signature.tobytes()))
+            self._conn.executemany("INSERT OR IGNORE INTO bands VALUES (?, ?, ?)",
+                                   [(band, bucket, paper_id) for band, bucket in self._buckets(signature)])
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+
+_default_index: Optional[FingerprintIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_fingerprint_index() -> FingerprintIndex:
+    """Process-wide fingerprint index (in memory when `DEDUP_INDEX_PATH` is empty)."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = FingerprintIndex(DEDUP_INDEX_PATH or ":memory:")
+        return _default_index
+
+
+def _block_spans(blocks: int) -> List[Tuple[int, int]]:
+    """(shift, mask) of `blocks` near-equal bit ranges covering a 64-bit hash."""
+    blocks = max(1, min(64, blocks))
+    bounds = [64 * b // blocks for b in range(blocks + 1)]
+    return [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+
+
+class Deduplicator:
+    """Collapses near-duplicate papers and drops each paper's repeated chunks, for one workflow run.
+
+    `is_indexed(paper_id)` tells whether a paper found in the persistent index
+    from an earlier run still has chunks in the corpus; papers seen earlier in
+    this run are trusted without asking.
+    """
+
+    def __init__(
+        self,
+        index: Optional[FingerprintIndex] = None,
+        *,
+        paper_threshold: float = DEDUP_PAPER_THRESHOLD,
+        chunk_distance: int = DEDUP_CHUNK_DISTANCE,
+        is_indexed: Optional[Callable[[str], bool]] = None,
+    ):
+        self.index = index if index is not None else get_fingerprint_index()
+        self.paper_threshold = paper_threshold
+        self.chunk_distance = chunk_distance
+        self.is_indexed = is_indexed
+        self.stats: Dict[str, int] = {"papers": 0, "duplicate_papers": 0, "chunks": 0, "duplicate_chunks": 0}
+        self._lock = threading.Lock()
+        self._run_papers: set = set()
+
+    def canonical(self, paper_id: str, text: str) -> Optional[Tuple[str, float]]:
+        """The already-known paper `text` duplicates, with its similarity; registers `paper_id` otherwise."""
+        signature = minhash(text)
+        if signature is None:
+            return None
+        for pid, score in self.index.candidates(signature, exclude=paper_id):
+            if score < self.paper_threshold:
+                break
+            if pid in self._run_papers or self.is_indexed is None or self.is_indexed(pid):
+                return pid, score
+        self.index.add(paper_id, signature)
+        self._run_papers.add(paper_id)
+        return None
+
+    def repeated_chunks(self, chunks: List[str]) -> List[int]:
+        """Positions of chunks within `chunk_distance` bits (SimHash) of an earlier chunk in `chunks`."""
+        # Kept hashes bucketed by each of chunk_distance + 1 bit blocks: two
+        # hashes within chunk_distance bits of each other share at least one
+        # block exactly, so only same-bucket hashes need comparing.
+        spans = _block_spans(self.chunk_distance + 1)
+        tables: List[Dict[int, List[int]]] = [{} for _ in spans]
+        repeated = []
+        for pos, chunk in enumerate(chunks):
+            h = simhash(chunk)
+            blocks = [(h >> shift) & mask for shift, mask in spans]
+            if any(hamming(h, other) <= self.chunk_distance
+                   for table, block in zip(tables, blocks) for other in table.get(block, ())):
+                repeated.append(pos)
+                continue
+            for table, block in zip(tables, blocks):
+                table.setdefault(block, []).append(h)
+        return repeated
+
+    def dedup_paper(self, paper: Dict[str, Any], paper_id: str) -> Dict[str, Any]:
+        """Drop `paper`'s repeated chunks in place, or empty them and set "duplicate_of" if the paper is a copy.
+
+        The original positions of dropped chunks are listed in "dropped_chunks"
+        (chunk IDs keep using the original positions, see `ingest`).
+        """
+        chunks = list(paper.get("chunks") or [])
+        chunk_meta = list(paper.get("chunk_meta") or [{} for _ in chunks])
+        with self._lock:
+            self.stats["papers"] += 1
+            self.stats["chunks"] += len(chunks)
+            match = self.canonical(paper_id, "\n".join(chunks))
+            if match is not None:
+                self.stats["duplicate_papers"] += 1
+                self.stats["duplicate_chunks"] += len(chunks)
+                paper.update(chunks=[], chunk_meta=[], duplicate_of=match[0])
+                print(f"  Skipping near-duplicate '{paper.get('title', 'Untitled')}' "
+                      f"(matches {match[0]}, similarity {match[1]:.2f}).")
+                return paper
+        dropped = self.repeated_chunks(chunks)
+        with self._lock:
+            self.stats["duplicate_chunks"] += len(dropped)
+        keep = sorted(set(range(len(chunks))) - set(dropped))
+        paper.update(chunks=[chunks[i] for i in keep], chunk_meta=[chunk_meta[i] for i in keep])
+        if dropped:
+            paper["dropped_chunks"] = dropped
+        return paper
@@ -0,0 +1,200 @@
+# src/embeddings.py
+"""Batched, cached embedding layer used for Chroma ingestion and queries.
+
+`BatchedEmbeddingFunction` is a Chroma `EmbeddingFunction` that wraps any
+`Embedder` backend. It deduplicates its input, serves known vectors from a
+persistent `EmbeddingCache` keyed by (model, task_type, sha256(text)), and
+embeds the remaining texts in fixed-size batches, a few batches at a time, with
+exponential backoff on failure.
+
+Backends:
+  GeminiEmbedder  one `genai.embed_content` call per batch
+  HashEmbedder    deterministic local hashing embedder for tests and benchmarks
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from chromadb import EmbeddingFunction
+
+from .tracing import NOOP_SPAN, span
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "gemini")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+
+
+class Embedder:
+    """Backend interface: embed a batch of texts in one request."""
+
+    model: str = ""
+    task_type: str = ""
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class GeminiEmbedder(Embedder):
+    def __init__(self, model: str = "models/embedding-001", task_type: str = "retrieval_document"):
+        self.model = model
+        self.task_type = task_type
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        from .config import genai
+
+        resp = genai().embed_content(model=self.model, content=texts, task_type=self.task_type)
+        return resp["embedding"]
+
+
+class HashEmbedder(Embedder):
+    """Feature-hashed bag of words, L2-normalised. Deterministic and offline."""
+
+    _token = re.compile(r"\w+")
+
+    def __init__(self, dim: int = 256, task_type: str = "retrieval_document"):
+        self.dim = dim
+        self.model = f"local/hash-{dim}"
+        self.task_type = task_type
+
+    def embed_one(self, text: str) -> List[float]:
+        vec = [0.0] * self.dim
+        for token in self._token.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_one(t) for t in texts]
+
+
+class EmbeddingCache:
+    """Persistent SQLite map of (model, task_type, sha256(text)) -> float32 vector."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT, task_type TEXT, text_hash TEXT, vector BLOB,"
+            " PRIMARY KEY (model, task_type, text_hash))"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, task_type: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for i in range(0, len(hashes), 500):
+                part = list(hashes[i:i + 500])
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model=? AND task_type=?"
+                    f" AND text_hash IN ({','.join('?' * len(part))})",
+                    [model, task_type, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = array("f", blob).tolist()
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, model: str, task_type: str, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                [(model, task_type, h, array("f", v).tobytes()) for h, v in items.items()],
+            )
+            self._conn.commit()
+
+
+class BatchedEmbeddingFunction(EmbeddingFunction):
+    def __init__(
+        self,
+        embedder: Embedder,
+        *,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_concurrency: int = EMBED_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        backoff: float = 1.0,
+    ):
+        self.embedder = embedder
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def name() -> str:
+        return "batched"
+
+    def _embed_with_retry(self, texts: List[str], trace: Any = NOOP_SPAN) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._lock:
+                    self.requests += 1
+                    trace.add("requests")
+                vectors = self.embedder.embed_batch(texts)
+                if len(vectors) != len(texts):
+                    raise ValueError(f"embedder returned {len(vectors)} vectors for {len(texts)} texts")
+                return vectors
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                    trace.add("retries")
+                delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+                print(f"  Embedding batch failed ({e}); retrying in {delay:.1f}s...")
+                time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        hashes = [EmbeddingCache.text_hash(t) for t in input]
+        unique: Dict[str, str] = dict(zip(hashes, input))
+        model, task_type = self.embedder.model, self.embedder.task_type
+
+        with span("embedding.batch", model=model, texts=len(input)) as trace:
+            vectors = self.cache.get_many(model, task_type, list(unique)) if self.cache else {}
+            missing = [h for h in unique if h not in vectors]
+            trace.set(cache_hits=len(vectors), texts_embedded=len(missing))
+            batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+            if batches:
+                with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(batches)))) as pool:
+                    results = pool.map(lambda b: self._embed_with_retry([unique[h] for h in b], trace), batches)
+                    for batch, batch_vectors in zip(batches, results):
+                        new = dict(zip(batch, batch_vectors))
+                        vectors.update(new)
+                        if self.cache:
+                            self.cache.put_many(model, task_type, new)
+        return [vectors[h] for h in hashes]
+
+
+def make_embedding_function(backend: str = EMBEDDING_BACKEND, *, cache_path: Optional[str] = EMBEDDING_CACHE_PATH) -> BatchedEmbeddingFunction:
+    """Build the configured embedding function ("gemini" or "hash")."""
+    embedder: Embedder = HashEmbedder() if backend == "hash" else GeminiEmbedder()
+    cache = EmbeddingCache(cache_path) if cache_path else None
+    return BatchedEmbeddingFunction(embedder, cache=cache)
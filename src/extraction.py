@@ -0,0 +1,220 @@
+# src/extraction.py
+"""PDF text extraction engines and section-aware chunking.
+
+An engine turns a page range of a PDF into one string per page. `pypdf` is
+always available; `pymupdf` is used when installed (it is several times
+faster) and `PDF_EXTRACTOR` picks one explicitly. Because engines work on page
+ranges, `pdf_pipeline` can spread a long paper over its process pool and
+stitch the pages back together before chunking.
+
+`chunk_pages` strips per-page boilerplate (page numbers, the arXiv margin
+stamp, running headers and footers), splits the text at recognised section
+headings (Abstract, Introduction, Methods, ... ) and drops the sections that
+are not worth embedding (References, Acknowledgements) before chunking each
+section on its own. Text before the first heading is kept as "body", and a
+paper whose sectioning would drop most of its text (e.g. a misread
+"References" heading early on) is chunked without sections instead. Every
+chunk records the page it starts on and its section, and all chunks are
+substrings of the cleaned page text so the PDF cache can still store them as
+offsets.
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+PDF_EXTRACTOR = os.getenv("PDF_EXTRACTOR", "auto")
+# Papers longer than this are parsed as several page ranges in parallel.
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "12"))
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+CHUNK_PARAMS = {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+DROPPED_SECTIONS = {"references", "bibliography", "acknowledgements"}
+# Below this share of the text kept after dropping sections, the headings are
+# not trusted and the paper is chunked as one "body" section.
+MIN_SECTIONED_SHARE = 0.5
+
+_HEADING = re.compile(
+    r"^(?:(?:\d+(?:\.\d+)*|[IVX]+|[A-H])\.?\s+)?"
+    r"(abstract|introduction|related work|background|preliminaries|methods?|methodology|approach|"
+    r"experiments?|experimental setup|evaluation|results|discussion|conclusions?|"
+    r"limitations|future work|acknowledge?ments?|references|bibliography|appendix|appendices)"
+    r"\s*:?$",
+    re.IGNORECASE,
+)
+# IEEE-style run-in abstracts: "Abstract—We study ..." on the same line.
+_INLINE_ABSTRACT = re.compile(r"^\s*abstract\s*(?:—|–|-|:|\.)\s*(?=\S)", re.IGNORECASE)
+_PAGE_NUMBER = re.compile(r"^(?:page\s+)?\d{1,4}(?:\s+of\s+\d{1,4})?$", re.IGNORECASE)
+_ARXIV_STAMP = re.compile(r"^arXiv:\d{4}\.\d{4,5}(?:v\d+)?\s+\[[^\]]+\]")
+_DIGITS = re.compile(r"\d+")
+
+
+class PypdfEngine:
+    name = "pypdf"
+
+    def page_count(self, path: str) -> int:
+        from pypdf import PdfReader
+        return len(PdfReader(path).pages)
+
+    def extract(self, path: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        from pypdf import PdfReader
+        pages = PdfReader(path).pages
+        return [pages[n].extract_text() or "" for n in range(start, len(pages) if stop is None else stop)]
+
+
+class PyMuPDFEngine:
+    name = "pymupdf"
+
+    def page_count(self, path: str) -> int:
+        import fitz
+        with fitz.open(path) as doc:
+            return doc.page_count
+
+    def extract(self, path: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        import fitz
+        with fitz.open(path) as doc:
+            stop = doc.page_count if stop is None else stop
+            return [doc[n].get_text() for n in range(start, stop)]
+
+
+ENGINES = {"pypdf": PypdfEngine, "pymupdf": PyMuPDFEngine}
+
+
+def get_engine(name: Optional[str] = None):
+    """The extraction engine called `name` (default `PDF_EXTRACTOR`; "auto" prefers pymupdf)."""
+    name = (name or PDF_EXTRACTOR).lower()
+    if name == "auto":
+        try:
+            import fitz  # noqa: F401
+            name = "pymupdf"
+        except ImportError:
+            name = "pypdf"
+    if name not in ENGINES:
+        raise ValueError(f"Unknown PDF extractor {name!r}; expected one of {sorted(ENGINES)}")
+    return ENGINES[name]()
+
+
+def page_ranges(path: str, pages_per_task: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Split a PDF into page ranges for parallel parsing; [] when it fits in one task."""
+    pages_per_task = pages_per_task or PAGES_PER_TASK
+    count = get_engine().page_count(path)
+    if count <= pages_per_task:
+        return []
+    return [(start, min(start + pages_per_task, count)) for start in range(0, count, pages_per_task)]
+
+
+def extract_page_range(path: str, start: int, stop: int) -> Dict[str, Any]:
+    """Extract pages [start, stop) of a PDF. Runs inside the process pool."""
+    began = time.perf_counter()
+    pages = get_engine().extract(path, start, stop)
+    return {"pages": pages, "seconds": time.perf_counter() - began}
+
+
+def extract_document(path: str) -> Dict[str, Any]:
+    """Extract and chunk a whole PDF. Runs inside the process pool."""
+    began = time.perf_counter()
+    pages = get_engine().extract(path)
+    result = chunk_pages(pages)
+    result["seconds"] = time.perf_counter() - began
+    return result
+
+
+def _line_key(line: str) -> str:
+    return _DIGITS.sub("#", line.strip().lower())
+
+
+def clean_pages(pages: List[str]) -> List[str]:
+    """Drop page numbers, arXiv stamps and lines repeated at the top/bottom of most pages."""
+    split = [page.splitlines() for page in pages]
+    repeated = set()
+    if len(pages) >= 3:
+        edges = Counter()
+        for lines in split:
+            edges.update({_line_key(l) for l in lines[:2] + lines[-2:] if l.strip()})
+        repeated = {key for key, n in edges.items() if n >= len(pages) / 2}
+    cleaned = []
+    for lines in split:
+        kept = [
+            l for l in lines
+            if not _PAGE_NUMBER.match(l.strip())
+            and not _ARXIV_STAMP.match(l.strip())
+            and _line_key(l) not in repeated
+        ]
+        cleaned.append("\n".join(kept))
+    return cleaned
+
+
+def _section_name(heading: str) -> str:
+    name = _HEADING.match(heading.strip()).group(1).lower()
+    if name.startswith("acknowledg"):
+        return "acknowledgements"
+    return {"method": "methods", "experiment": "experiments", "conclusion": "conclusions",
+            "appendices": "appendix"}.get(name, name)
+
+
+def split_sections(full_text: str) -> List[Tuple[str, int, int]]:
+    """(section, start, end) spans of `full_text`, split at recognised headings.
+
+    Text before the first heading (title block, run-in text) is kept as
+    "body"; a run-in "Abstract—..." line starts an "abstract" section.
+    """
+    headings = []
+    pos = 0
+    for line in full_text.split("\n"):
+        inline = _INLINE_ABSTRACT.match(line)
+        if len(line) < 60 and _HEADING.match(line.strip()):
+            headings.append((_section_name(line), pos, pos + len(line)))
+        elif inline:
+            headings.append(("abstract", pos, pos + inline.end()))
+        pos += len(line) + 1
+    spans = []
+    if not headings or full_text[:headings[0][1]].strip():
+        spans.append(("body", 0, headings[0][1] if headings else len(full_text)))
+    for n, (name, _, body_start) in enumerate(headings):
+        end = headings[n + 1][1] if n + 1 < len(headings) else len(full_text)
+        spans.append((name, body_start, end))
+    return spans
+
+
+def chunk_pages(pages: List[str], chunk_params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Clean `pages` and chunk them section by section.
+
+    Returns {"pages", "chunks", "chunk_meta"}: the cleaned pages, the chunks
+    and, per chunk, {"page": 1-based page it starts on, "section": name}.
+    """
+    pages = clean_pages(pages)
+    full_text = "\n".join(pages)
+    page_starts = []
+    pos = 0
+    for page in pages:
+        page_starts.append(pos)
+        pos += len(page) + 1
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(**(chunk_params or CHUNK_PARAMS))
+    chunks: List[str] = []
+    chunk_meta: List[Dict[str, Any]] = []
+    sections = split_sections(full_text)
+    sizes = [len(full_text[start:end].strip()) for _, start, end in sections]
+    kept = sum(n for (name, _, _), n in zip(sections, sizes) if name not in DROPPED_SECTIONS)
+    if kept < MIN_SECTIONED_SHARE * sum(sizes):
+        sections = [("body", 0, len(full_text))]
+    for section, start, end in sections:
+        if section in DROPPED_SECTIONS:
+            continue
+        body = full_text[start:end]
+        cursor = 0
+        for chunk in splitter.split_text(body):
+            offset = body.find(chunk, cursor)
+            offset = cursor if offset < 0 else offset
+            cursor = offset + 1
+            chunks.append(chunk)
+            chunk_meta.append({"page": bisect.bisect_right(page_starts, start + offset), "section": section})
+    return {"pages": pages, "chunks": chunks, "chunk_meta": chunk_meta}
@@ -0,0 +1,215 @@
+# src/http_client.py
+"""Shared HTTP client for search APIs and PDF downloads.
+
+One `requests.Session` with a pooled, keep-alive `HTTPAdapter` is shared by
+every caller, so repeated requests to arXiv or Semantic Scholar reuse their
+TCP/TLS connections. On top of that the client adds:
+
+  * connect/read timeouts on every request, so a hung server cannot stall a
+    session;
+  * a per-host concurrency limit;
+  * retries with exponential backoff and jitter on connection errors,
+    timeouts, 429 and 5xx responses, honouring `Retry-After` when present;
+  * conditional requests: with `revalidate=True` the last response for a URL
+    is kept together with its `ETag` / `Last-Modified` validators, and a
+    `304 Not Modified` answer is served from that copy.
+
+`stats()` reports request, retry, 304 and connection-reuse counters.
+"""
+
+from __future__ import annotations
+
+import email.utils
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlencode, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .tracing import current_span
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_PER_HOST_CONCURRENCY = int(os.getenv("HTTP_PER_HOST_CONCURRENCY", "4"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_MAX_BACKOFF = float(os.getenv("HTTP_MAX_BACKOFF", "60"))
+HTTP_REVALIDATE_ENTRIES = int(os.getenv("HTTP_REVALIDATE_ENTRIES", "256"))
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+USER_AGENT = "ai-research-assistant/1.0"
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a `Retry-After` header (delta-seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class HttpClient:
+    def __init__(
+        self,
+        *,
+        pool_size: int = HTTP_POOL_SIZE,
+        per_host_concurrency: int = HTTP_PER_HOST_CONCURRENCY,
+        timeout: Tuple[float, float] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff: float = 0.5,
+        max_backoff: float = HTTP_MAX_BACKOFF,
+        revalidate_entries: int = HTTP_REVALIDATE_ENTRIES,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.per_host_concurrency = per_host_concurrency
+        self.revalidate_entries = revalidate_entries
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        # Retries are handled here (to honour Retry-After and count them), not by urllib3.
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._validated: "OrderedDict[str, requests.Response]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "requests": 0, "retries": 0, "retry_after_waits": 0,
+            "not_modified": 0, "timeouts": 0, "errors": 0,
+        }
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[key] += n
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host_concurrency)
+            return slot
+
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        if response is not None:
+            wait = retry_after_seconds(response.headers.get("Retry-After"))
+            if wait is not None:
+                self._count("retry_after_waits")
+                return min(wait, self.max_backoff)
+        return min(self.max_backoff, self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    def get(
+        self,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[Tuple[float, float]] = None,
+        stream: bool = False,
+        revalidate: bool = False,
+    ) -> requests.Response:
+        """GET `url` with pooling, timeouts and retries; raises for non-2xx/304 statuses.
+
+        With `revalidate=True` (not for streamed responses) the previous
+        response for the same URL is revalidated with If-None-Match /
+        If-Modified-Since and returned unchanged on a 304.
+        """
+        key = f"{url}?{urlencode(sorted((params or {}).items()), doseq=True)}"
+        headers = dict(headers or {})
+        cached = None
+        if revalidate and not stream:
+            with self._lock:
+                cached = self._validated.get(key)
+            if cached is not None:
+                if cached.headers.get("ETag"):
+                    headers["If-None-Match"] = cached.headers["ETag"]
+                if cached.headers.get("Last-Modified"):
+                    headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+        slot = self._slot(urlparse(url).netloc)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            error: Optional[Exception] = None
+            self._count("requests")
+            try:
+                with slot:
+                    response = self.session.get(url, params=params, headers=headers,
+                                                timeout=timeout or self.timeout, stream=stream)
+            except requests.Timeout as e:
+                self._count("timeouts")
+                error = e
+            except requests.ConnectionError as e:
+                self._count("errors")
+                error = e
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                break
+            if attempt == self.max_retries:
+                if error is not None:
+                    raise error
+                break
+            if response is not None:
+                response.close()
+            self._count("retries")
+            current_span().add("retries")
+            delay = self._delay(attempt, response)
+            reason = error or f"HTTP {response.status_code}"
+            print(f"  Request to {urlparse(url).netloc} failed ({reason}); retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+        if response.status_code == 304 and cached is not None:
+            self._count("not_modified")
+            with self._lock:
+                self._validated.move_to_end(key)
+            return cached
+        response.raise_for_status()
+        if revalidate and not stream and (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+            with self._lock:
+                self._validated[key] = response
+                self._validated.move_to_end(key)
+                while len(self._validated) > self.revalidate_entries:
+                    self._validated.popitem(last=False)
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        """Counters plus connections opened / reused across the live connection pools."""
+        with self._lock:
+            stats = dict(self.counters)
+        opened = served = 0
+        pools = self._adapter.poolmanager.pools
+        for pool_key in list(pools.keys()):
+            pool = pools.get(pool_key)
+            if pool is not None:
+                opened += pool.num_connections
+                served += pool.num_requests
+        stats["connections_opened"] = opened
+        stats["connections_reused"] = max(0, served - opened)
+        return stats
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_default_client: Optional[HttpClient] = None
+_default_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Process-wide shared client."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
@@ -0,0 +1,155 @@
+# src/hybrid.py
+"""Sparse retrieval and fusion helpers for hybrid RAG search.
+
+`BM25Index` is a SQLite FTS5 index of chunk tokens kept next to the vector store
+so exact terms (model names, dataset names, symbols) that dense embeddings blur
+together can still be matched. `reciprocal_rank_fusion` merges the sparse and
+dense rankings, and `mmr` / `CrossEncoderReranker` are optional reranking
+stages applied to the fused candidates.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+_token = re.compile(r"\w+(?:[-.]\w+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what which "
+    "with how do does did we our their they these those can into than then there using use used".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens; compounds like `resnet-50` also yield their parts."""
+    tokens: List[str] = []
+    for tok in _token.findall(text.lower()):
+        if tok in _STOPWORDS:
+            continue
+        tokens.append(tok)
+        if "-" in tok or "." in tok:
+            tokens.extend(p for p in re.split(r"[-.]", tok) if p and p not in _STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts (SQLite FTS5), with per-paper filtering at query time.
+
+    Only each chunk's tokens, ID and paper ID are stored, in SQLite (in memory
+    by default, or in the file at `path`), so a persistent index costs a
+    bounded page cache however large the corpus grows. Chunk texts and
+    metadata are not kept: look hits up in the vector store.
+    """
+
+    def __init__(self, path: str = ":memory:", name: str = "chunks"):
+        self.path = path
+        self._table = "bm25_" + re.sub(r"\W", "_", name)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        # Tokens are pre-split by `tokenize`, so FTS5 only has to keep
+        # compounds like `resnet-50` whole.
+        self._conn.executescript(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self._table} USING fts5(tokens, tokenize=\"unicode61 tokenchars '-.'\");"
+            f"CREATE TABLE IF NOT EXISTS {self._table}_docs (id TEXT PRIMARY KEY, paper_id TEXT);"
+            f"CREATE INDEX IF NOT EXISTS {self._table}_paper ON {self._table}_docs (paper_id);"
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self._table}_docs").fetchone()[0]
+
+    def has_paper(self, paper_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT 1 FROM {self._table}_docs WHERE paper_id=? LIMIT 1", (paper_id,)).fetchone() is not None
+
+    def add(self, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> None:
+        with self._lock:
+            for doc_id, text, meta in zip(ids, documents, metadatas):
+                cur = self._conn.execute(f"INSERT OR IGNORE INTO {self._table}_docs VALUES (?, ?)",
+                                         (doc_id, meta.get("paper_id", "")))
+                if cur.rowcount:
+                    self._conn.execute(f"INSERT INTO {self._table} (rowid, tokens) VALUES (?, ?)",
+                                       (cur.lastrowid, " ".join(tokenize(text))))
+            self._conn.commit()
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                row = self._conn.execute(f"SELECT rowid FROM {self._table}_docs WHERE id=?", (doc_id,)).fetchone()
+                if row is not None:
+                    self._conn.execute(f"DELETE FROM {self._table} WHERE rowid=?", row)
+                    self._conn.execute(f"DELETE FROM {self._table}_docs WHERE rowid=?", row)
+            self._conn.commit()
+
+    def search(self, query: str, k: int, paper_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+        match = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+        sql = (f"SELECT d.id, -bm25({self._table}) AS score FROM {self._table}"
+               f" JOIN {self._table}_docs d ON d.rowid = {self._table}.rowid WHERE {self._table} MATCH ?")
+        params: List[Any] = [match]
+        if paper_ids is not None:
+            paper_ids = list(paper_ids)
+            if not paper_ids:
+                return []
+            sql += f" AND d.paper_id IN ({','.join('?' * len(paper_ids))})"
+            params += paper_ids
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY score DESC LIMIT ?", params + [k]).fetchall()
+        return [(doc_id, float(score)) for doc_id, score in rows]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: score(d) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: -kv[1])
+
+
+def cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    """Cosine similarity of two vectors (0.0 if either is all zeros)."""
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def mmr(query_vector: Sequence[float], candidates: Sequence[Tuple[str, Sequence[float]]], k: int, lambda_: float = 0.7) -> List[str]:
+    """Maximal marginal relevance: trade relevance to the query against redundancy."""
+    relevance = {doc_id: cosine(query_vector, vec) for doc_id, vec in candidates}
+    vectors = dict(candidates)
+    selected: List[str] = []
+    remaining = [doc_id for doc_id, _ in candidates]
+    while remaining and len(selected) < k:
+        def score(doc_id: str) -> float:
+            redundancy = max((cosine(vectors[doc_id], vectors[s]) for s in selected), default=0.0)
+            return lambda_ * relevance[doc_id] - (1 - lambda_) * redundancy
+        best = max(remaining, key=score)
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+class CrossEncoderReranker:
+    """Optional CPU cross-encoder stage (needs `sentence-transformers`)."""
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def rerank(self, query: str, candidates: Sequence[Tuple[str, str]], k: int) -> List[str]:
+        scores = self.model.predict([(query, text) for _, text in candidates])
+        ranked = sorted(zip(candidates, scores), key=lambda cs: -float(cs[1]))
+        return [doc_id for (doc_id, _), _ in ranked[:k]]
@@ -0,0 +1,151 @@
+# src/ingest.py
+"""Streaming, bounded-memory indexing of processed papers.
+
+Papers are handed to a `StreamingIndexer` as soon as they are processed. At
+most `INGEST_MAX_PENDING` papers wait in its queue (the producer blocks beyond
+that), and a background thread indexes whole papers with `build_rag` in
+batches of about `INGEST_BATCH_CHUNKS` chunks. Per-chunk metadata is expanded
+from the paper's shared metadata only when its batch is indexed.
+
+Once a paper is queued the caller keeps just its `paper_record` (IDs and
+counts, no text), so the workflow state stays small and peak memory does not
+grow with the number of papers. Chunks can be reloaded from the PDF text
+cache with `cached_chunks` if indexing has to be retried.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import queue
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .extraction import CHUNK_PARAMS
+from .pdf_cache import PDFCache, get_default_cache
+from .rag_qa import build_rag, chunk_id
+
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "256"))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "8"))
+
+
+def paper_record(paper: Dict[str, Any], paper_id: str) -> Dict[str, Any]:
+    """Compact workflow-state record of a processed paper: its ID, metadata and chunk counts."""
+    record = {
+        "paper_id": paper_id,
+        "title": paper.get("title", ""),
+        "authors": paper.get("authors", []),
+        "url": paper.get("url", ""),
+        "chunk_count": len(paper.get("chunks") or []),
+        "indexed": False,
+    }
+    for key in ("duplicate_of", "dropped_chunks"):
+        if paper.get(key):
+            record[key] = paper[key]
+    return record
+
+
+def chunk_metadatas(metadata: Dict[str, Any], chunk_meta: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Each chunk's metadata: the paper's, plus the chunk's own page and section."""
+    for meta in chunk_meta:
+        yield dict(metadata, **{k: v for k, v in meta.items() if v is not None})
+
+
+def kept_positions(record: Dict[str, Any], count: int) -> List[int]:
+    """Original chunk positions of a recorded paper's `count` kept chunks (skipping "dropped_chunks").
+
+    Chunk IDs use these positions, so dropping a repeated chunk never
+    renumbers (and re-embeds) the chunks after it.
+    """
+    dropped = set(record.get("dropped_chunks") or ())
+    positions: List[int] = []
+    pos = 0
+    while len(positions) < count:
+        if pos not in dropped:
+            positions.append(pos)
+        pos += 1
+    return positions
+
+
+def cached_chunks(record: Dict[str, Any], cache: Optional[PDFCache] = None) -> Optional[Tuple[List[str], List[Dict[str, Any]]]]:
+    """Reload a recorded paper's kept chunks and their metadata from the PDF text cache."""
+    text = (cache or get_default_cache()).get_text(record["paper_id"], CHUNK_PARAMS)
+    if text is None:
+        return None
+    chunks = text["chunks"]
+    chunk_meta = text.get("chunk_meta") or [{} for _ in chunks]
+    dropped = set(record.get("dropped_chunks") or ())
+    keep = [i for i in range(len(chunks)) if i not in dropped]
+    return [chunks[i] for i in keep], [chunk_meta[i] for i in keep]
+
+
+class StreamingIndexer:
+    """Indexes queued papers on a background thread, several papers per `build_rag` call."""
+
+    def __init__(
+        self,
+        *,
+        batch_chunks: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        collection_name: str = "papers",
+    ):
+        self.batch_chunks = batch_chunks or INGEST_BATCH_CHUNKS
+        self.collection_name = collection_name
+        self.stats: Dict[str, int] = {"papers": 0, "chunks": 0, "batches": 0, "failures": 0}
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_pending or INGEST_MAX_PENDING)
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run,),
+                                        name="rag-index", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: Dict[str, Any], metadata: Dict[str, Any], chunks: List[str],
+               chunk_meta: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Queue a paper for indexing, blocking while the queue is full.
+
+        `record["indexed"]` is set to True once the paper's chunks are in the index.
+        """
+        if chunks:
+            self._queue.put((record, metadata, chunks, chunk_meta or [{} for _ in chunks]))
+
+    def close(self) -> Dict[str, int]:
+        """Index whatever is still queued, stop the thread and return the counters."""
+        self._queue.put(None)
+        self._thread.join()
+        return self.stats
+
+    def _run(self) -> None:
+        batch: List[tuple] = []
+        size = 0
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch.append(item)
+            size += len(item[2])
+            # Flush full batches, and partial ones when nothing else is waiting,
+            # so a trickle of papers is still indexed promptly.
+            if size >= self.batch_chunks or self._queue.empty():
+                self._flush(batch)
+                batch, size = [], 0
+        self._flush(batch)
+
+    def _flush(self, batch: List[tuple]) -> None:
+        if not batch:
+            return
+        documents = [chunk for _, _, chunks, _ in batch for chunk in chunks]
+        metadatas = [m for _, metadata, _, chunk_meta in batch for m in chunk_metadatas(metadata, chunk_meta)]
+        ids = [
+            chunk_id(metadata["paper_id"], pos, chunk)
+            for record, metadata, chunks, _ in batch
+            for pos, chunk in zip(kept_positions(record, len(chunks)), chunks)
+        ]
+        try:
+            build_rag(documents=documents, metadatas=metadatas, ids=ids, collection_name=self.collection_name)
+        except Exception as e:
+            self.stats["failures"] += len(batch)
+            print(f"  Failed to index {len(batch)} papers: {e}")
+            return
+        for record, _, _, _ in batch:
+            record["indexed"] = True
+        self.stats["papers"] += len(batch)
+        self.stats["chunks"] += len(documents)
+        self.stats["batches"] += 1
@@ -0,0 +1,213 @@
+# src/jobs.py
+"""Background job runner for long research workflows.
+
+`JobManager` runs jobs on a bounded thread pool and records an append-only list
+of progress events per job, so HTTP handlers can return a job ID immediately and
+clients can poll status or follow the events. Submitting a job whose key matches
+one that is still queued or running returns the existing job instead of
+starting a second execution.
+
+With a `JobStore`, every job's status, events and result are also written to
+SQLite (by default the API's session database), so any uvicorn worker on the
+host can report on a job that another worker is running. Deduplication of
+in-flight keys stays per process.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.getenv("SESSION_DB_PATH", "./sessions.sqlite3"))
+
+Emit = Callable[[str, Dict[str, Any]], None]
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class Job:
+    def __init__(self, key: Hashable, params: Dict[str, Any], store: Optional["JobStore"] = None):
+        self.id = str(uuid.uuid4())
+        self.key = key
+        self.params = params
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self.store = store
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def emit(self, event: str, data: Dict[str, Any]) -> None:
+        """Record an event; a "status" event also sets the job's status, together with it."""
+        with self._lock:
+            if event == "status":
+                self.status = data["status"]
+            entry = {"seq": len(self.events), "event": event, "time": time.time(), "data": data}
+            self.events.append(entry)
+            if self.store is not None:
+                self.store.save(self, entry)
+
+    def events_since(self, seq: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self.events[seq:]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": [e for e in self.events_since(0) if e["event"] == "progress"],
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """SQLite record of jobs and their events, readable from every worker process."""
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY, params TEXT, status TEXT, created_at REAL, started_at REAL,"
+            " finished_at REAL, result TEXT, error TEXT);"
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            " job_id TEXT, seq INTEGER, event TEXT, time REAL, data TEXT, PRIMARY KEY (job_id, seq));"
+            "CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);"
+        )
+        self._conn.commit()
+
+    def save(self, job: Job, event: Optional[Dict[str, Any]] = None) -> None:
+        """Write `job`'s current state, and `event` if given, in one transaction.
+
+        A status event's status is stored with it, so readers never see the
+        final event of a job that is not yet done (or the reverse).
+        """
+        status = event["data"]["status"] if event is not None and event["event"] == "status" else job.status
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job.id, json.dumps(job.params, default=str), status, job.created_at, job.started_at,
+                     job.finished_at, json.dumps(job.result, default=str), job.error),
+                )
+                if event is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO job_events VALUES (?, ?, ?, ?, ?)",
+                        (job.id, event["seq"], event["event"], event["time"], json.dumps(event["data"], default=str)),
+                    )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def load(self, job_id: str) -> Optional[Job]:
+        """A snapshot of a stored job (possibly run by another process), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT params, status, created_at, started_at, finished_at, result, error FROM jobs WHERE job_id=?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            events = self._conn.execute(
+                "SELECT seq, event, time, data FROM job_events WHERE job_id=? ORDER BY seq", (job_id,)
+            ).fetchall()
+        job = Job(None, json.loads(row[0]))
+        job.id = job_id
+        job.status, job.created_at, job.started_at, job.finished_at = row[1:5]
+        job.result, job.error = json.loads(row[5]), row[6]
+        job.events = [{"seq": seq, "event": event, "time": t, "data": json.loads(data)} for seq, event, t, data in events]
+        return job
+
+    def prune(self, keep: int) -> int:
+        """Delete the oldest finished jobs beyond the newest `keep`."""
+        with self._lock:
+            old = [r[0] for r in self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN (?, ?) AND job_id NOT IN"
+                " (SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT ?)",
+                (SUCCEEDED, FAILED, keep))]
+            for job_id in old:
+                self._conn.execute("DELETE FROM jobs WHERE job_id=?", (job_id,))
+                self._conn.execute("DELETE FROM job_events WHERE job_id=?", (job_id,))
+            self._conn.commit()
+        return len(old)
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 2, history_limit: int = 1000, store: Optional[JobStore] = None):
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="research-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._inflight: Dict[Hashable, Job] = {}
+        self._history_limit = history_limit
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, params: Dict[str, Any], fn: Callable[[Emit], Dict[str, Any]]) -> Job:
+        """Queue `fn(emit)` under `key`, or return the in-flight job with the same key."""
+        with self._lock:
+            existing = self._inflight.get(key)
+            if existing is not None:
+                return existing
+            job = Job(key, params, self.store)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            while len(self._jobs) > self._history_limit:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.done:
+                    break
+                del self._jobs[oldest_id]
+        job.emit("status", {"status": QUEUED})
+        if self.store is not None:
+            self.store.prune(self._history_limit)
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job with this ID; jobs run by other processes come back as a fresh snapshot from the store."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Emit], Dict[str, Any]]) -> None:
+        job.started_at = time.time()
+        final = FAILED
+        try:
+            job.emit("status", {"status": RUNNING})
+            job.result = fn(lambda node, data: job.emit("progress", {"node": node, **data}))
+            final = SUCCEEDED
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+            # The terminal status is set in memory before the event is stored,
+            # so a failing store write cannot leave the job "running".
+            try:
+                job.emit("status", {"status": final, "error": job.error})
+            except Exception as e:
+                print(f"  Could not record the final status of job {job.id}: {e}")
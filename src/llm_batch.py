@@ -0,0 +1,226 @@
+# src/llm_batch.py
+"""Batched, concurrent structured-output Gemini calls for per-paper tasks.
+
+`run_batched` is the engine behind `summarizer.summarize_papers` and
+`extractor.extract_insights_batch`. It:
+
+  * serves unchanged papers from a persistent `ResultCache` keyed by
+    (task, prompt version, paper ID) and a hash of the input,
+  * packs the remaining papers several to a prompt (up to `LLM_BATCH_SIZE`
+    papers and `LLM_BATCH_MAX_CHARS` characters) and asks for a JSON array
+    with one object per paper,
+  * constrains the output with `response_mime_type="application/json"` and a
+    response schema, so replies are parsed with `json.loads` directly,
+  * runs up to `LLM_CONCURRENCY` prompts at a time on the shared
+    `GenerativeModel` from `config.generative_model`.
+
+Papers missing from a packed reply are retried on their own. A paper that
+still gets no result (or whose prompt failed) gets an empty `fallback_result`
+with an "error" message instead of failing the whole batch; it is not cached.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .config import generative_model
+from .pdf_cache import paper_key
+from .tracing import span
+
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "5"))
+LLM_BATCH_MAX_CHARS = int(os.getenv("LLM_BATCH_MAX_CHARS", "12000"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_RESULT_CACHE_PATH = os.getenv("LLM_RESULT_CACHE_PATH", "./llm_results.sqlite3")
+
+
+def paper_id(item: Dict[str, Any]) -> str:
+    """Cache identity of a paper (or a summary of one): its URL key, else its title."""
+    if item.get("url"):
+        return paper_key(item["url"])
+    return "title-" + hashlib.sha256((item.get("title") or "").encode("utf-8")).hexdigest()[:32]
+
+
+class ResultCache:
+    """Persistent SQLite map of (task, prompt_version, paper_id) -> JSON result.
+
+    Each row also stores a hash of the prompt input, so a paper whose abstract
+    (or summary) changed is reprocessed even though its ID did not.
+    """
+
+    def __init__(self, path: str = LLM_RESULT_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " task TEXT, prompt_version TEXT, paper_id TEXT, input_hash TEXT, result TEXT,"
+            " PRIMARY KEY (task, prompt_version, paper_id))"
+        )
+        self._conn.commit()
+
+    def get(self, task: str, version: str, pid: str, input_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT input_hash, result FROM results WHERE task=? AND prompt_version=? AND paper_id=?",
+                (task, version, pid),
+            ).fetchone()
+            if row is None or row[0] != input_hash:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[1])
+
+    def put(self, task: str, version: str, pid: str, input_hash: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (task, version, pid, input_hash, json.dumps(result)),
+            )
+            self._conn.commit()
+
+
+_default_cache: Optional[ResultCache] = None
+_default_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Process-wide result cache, or None when `LLM_RESULT_CACHE_PATH` is empty."""
+    global _default_cache
+    if not LLM_RESULT_CACHE_PATH:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache(LLM_RESULT_CACHE_PATH)
+        return _default_cache
+
+
+def array_schema(item_schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Response schema for a JSON array of `item_schema` objects, each tagged with its paper number."""
+    return {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {"index": {"type": "integer"}, **item_schema["properties"]},
+            "required": ["index", *item_schema.get("required", [])],
+        },
+    }
+
+
+def fallback_result(item_schema: Dict[str, Any], error: str) -> Dict[str, Any]:
+    """An empty result for `item_schema` (empty strings and lists), tagged with `error`."""
+    empty = {"string": "", "array": [], "object": {}, "integer": 0, "number": 0.0, "boolean": False}
+    result = {name: empty.get(prop.get("type"), None) for name, prop in item_schema["properties"].items()}
+    result["error"] = error
+    return result
+
+
+def pack(texts: Sequence[str], batch_size: int, max_chars: int) -> List[List[int]]:
+    """Group item positions into prompts of at most `batch_size` items and about `max_chars` characters."""
+    groups: List[List[int]] = []
+    size = 0
+    for i, text in enumerate(texts):
+        if groups and len(groups[-1]) < batch_size and size + len(text) <= max_chars:
+            groups[-1].append(i)
+            size += len(text)
+        else:
+            groups.append([i])
+            size = len(text)
+    return groups
+
+
+def run_batched(
+    items: Sequence[Dict[str, Any]],
+    *,
+    task: str,
+    prompt_version: str,
+    instructions: str,
+    render: Callable[[Dict[str, Any]], str],
+    item_schema: Dict[str, Any],
+    model_name: str,
+    max_output_tokens: Optional[int] = None,
+    cache: Optional[ResultCache] = None,
+    batch_size: int = LLM_BATCH_SIZE,
+    max_chars: int = LLM_BATCH_MAX_CHARS,
+    concurrency: int = LLM_CONCURRENCY,
+) -> List[Dict[str, Any]]:
+    """Run `task` over `items` and return one result dict per item, in order.
+
+    Items whose request fails get a `fallback_result`; the rest are kept.
+    `render` turns an item into its prompt text; `item_schema` is the JSON
+    schema of one result object; `max_output_tokens` is per item.
+    """
+    texts = [render(item) for item in items]
+    hashes = [hashlib.sha256(t.encode("utf-8")).hexdigest() for t in texts]
+    ids = [paper_id(item) for item in items]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    if cache is not None:
+        for i in range(len(items)):
+            results[i] = cache.get(task, prompt_version, ids[i], hashes[i])
+    todo = [i for i, r in enumerate(results) if r is None]
+
+    def request(group: List[int]) -> Dict[int, Dict[str, Any]]:
+        papers = "\n\n".join(f"Paper {n}:\n{texts[i]}" for n, i in enumerate(group, 1))
+        prompt = (
+            f"{instructions}\n\nReturn a JSON array with one object per paper, in the same order, "
+            f"and set \"index\" to the paper's number.\n\n{papers}"
+        )
+        config: Dict[str, Any] = {
+            "response_mime_type": "application/json",
+            "response_schema": array_schema(item_schema),
+        }
+        if max_output_tokens:
+            config["max_output_tokens"] = max_output_tokens * len(group)
+        with span(f"llm.{task}", model=model_name, papers=len(group)) as s:
+            response = generative_model(model_name).generate_content(prompt, generation_config=config)
+            s.record_usage(getattr(response, "usage_metadata", None))
+        try:
+            reply = json.loads(response.text)
+        except ValueError:
+            reply = []
+        found = {}
+        for obj in reply if isinstance(reply, list) else []:
+            n = obj.pop("index", None) if isinstance(obj, dict) else None
+            if isinstance(n, int) and 1 <= n <= len(group):
+                found[group[n - 1]] = obj
+        return found
+
+    def run(group: List[int]) -> Dict[int, Any]:
+        """Results for `group`; papers without one map to the error message instead."""
+        try:
+            found: Dict[int, Any] = request(group)
+        except Exception as e:
+            return {i: f"LLM {task} request failed: {e}" for i in group}
+        for i in group:
+            if i not in found and len(group) > 1:
+                try:
+                    found.update(request([i]))
+                except Exception as e:
+                    found[i] = f"LLM {task} request failed: {e}"
+            if i not in found:
+                found[i] = f"LLM response had no {task} result"
+        return found
+
+    groups = pack([texts[i] for i in todo], batch_size, max_chars)
+    groups = [[todo[j] for j in group] for group in groups]
+    if groups:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(groups)))) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, run, group) for group in groups]
+            for future in futures:
+                for i, result in future.result().items():
+                    if isinstance(result, str):
+                        print(f"  {result} for {items[i].get('title', 'Untitled')!r}; using an empty result.")
+                        results[i] = fallback_result(item_schema, result)
+                        continue
+                    results[i] = result
+                    if cache is not None:
+                        cache.put(task, prompt_version, ids[i], hashes[i], result)
+    return [dict(r) for r in results]
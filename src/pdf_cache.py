@@ -0,0 +1,205 @@
+# src/pdf_cache.py
+"""Persistent, content-addressed cache for downloaded PDFs and their extracted text.
+
+Entries are keyed by arXiv ID + version when the URL is an arXiv link (so the
+existing `temp_pdfs/<id>.pdf` files are picked up as-is) and by a hash of the
+URL otherwise. Each key can have two files:
+
+  <key>.pdf          the raw PDF bytes
+  <key>.text.json.gz the cleaned page text plus chunk boundaries and each
+                     chunk's page/section (gzip'd JSON)
+
+Chunks are stored as offsets into the joined page text rather than as copies,
+so the text record is roughly the size of the extracted text itself. All writes
+go through a temp file + `os.replace`, and the directory is kept under
+`max_bytes` by evicting the least recently used files (access bumps mtime).
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "./temp_pdfs")
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+TEXT_FORMAT_VERSION = 3
+
+_ARXIV_ID = re.compile(r"arxiv\.org/(?:abs|pdf)/(.+?)(?:\.pdf)?/?$")
+
+
+def paper_key(url: str) -> str:
+    """Stable cache key for a paper URL: the arXiv ID/version, or a URL hash."""
+    m = _ARXIV_ID.search(url or "")
+    if m:
+        return m.group(1).replace("/", "_")
+    return "url-" + hashlib.sha256((url or "").encode("utf-8")).hexdigest()[:32]
+
+
+def _encode_chunks(full_text: str, chunks: List[str]) -> List[Union[List[int], str]]:
+    """Store each chunk as [start, end] into `full_text` when it is a substring."""
+    encoded: List[Union[List[int], str]] = []
+    pos = 0
+    for chunk in chunks:
+        start = full_text.find(chunk, pos)
+        if start < 0:
+            start = full_text.find(chunk)
+        if start < 0:
+            encoded.append(chunk)
+            continue
+        encoded.append([start, start + len(chunk)])
+        pos = start + 1
+    return encoded
+
+
+def _decode_chunks(full_text: str, encoded: List[Union[List[int], str]]) -> List[str]:
+    return [c if isinstance(c, str) else full_text[c[0]:c[1]] for c in encoded]
+
+
+class PDFCache:
+    """Size-bounded LRU cache of PDFs and extracted text on local disk."""
+
+    def __init__(self, root: str = PDF_CACHE_DIR, max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stats: Dict[str, int] = {
+            "pdf_hits": 0, "pdf_misses": 0, "text_hits": 0, "text_misses": 0, "evictions": 0,
+        }
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.root, f"{key}{suffix}")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _touch(self, path: str) -> bool:
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self.evict(keep=path)
+
+    # --- raw PDFs ---
+
+    def get_pdf(self, key: str) -> Optional[str]:
+        """Return the local path of a cached PDF, or None on a miss."""
+        path = self._path(key, ".pdf")
+        if self._touch(path):
+            self._count("pdf_hits")
+            return path
+        self._count("pdf_misses")
+        return None
+
+    def put_pdf(self, key: str, data: bytes) -> str:
+        path = self._path(key, ".pdf")
+        self._write_atomic(path, data)
+        return path
+
+    # --- extracted text ---
+
+    def get_text(self, key: str, chunk_params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return {"pages", "chunks"} (plus "chunk_meta" if stored) for `key` if cached with the same chunking params."""
+        path = self._path(key, ".text.json.gz")
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            record = None
+        if not record or record.get("v") != TEXT_FORMAT_VERSION or record.get("params") != chunk_params:
+            self._count("text_misses")
+            return None
+        self._touch(path)
+        self._count("text_hits")
+        full_text = "\n".join(record["pages"])
+        text = {"pages": record["pages"], "chunks": _decode_chunks(full_text, record["chunks"])}
+        if "meta" in record:
+            text["chunk_meta"] = [{"page": page, "section": section} for page, section in record["meta"]]
+        return text
+
+    def put_text(
+        self,
+        key: str,
+        pages: List[str],
+        chunks: List[str],
+        chunk_params: Dict[str, Any],
+        chunk_meta: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        full_text = "\n".join(pages)
+        record = {
+            "v": TEXT_FORMAT_VERSION,
+            "params": chunk_params,
+            "pages": pages,
+            "chunks": _encode_chunks(full_text, chunks),
+        }
+        if chunk_meta is not None:
+            record["meta"] = [[m.get("page"), m.get("section")] for m in chunk_meta]
+        data = gzip.compress(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+        self._write_atomic(self._path(key, ".text.json.gz"), data)
+
+    # --- eviction ---
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Delete least recently used files until the cache fits in `max_bytes`."""
+        try:
+            entries = [e for e in os.scandir(self.root) if e.is_file() and not e.name.startswith(".tmp-")]
+        except FileNotFoundError:
+            return 0
+        files = []
+        for e in entries:
+            try:
+                st = e.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if keep and os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            with self._lock:
+                self.stats["evictions"] += removed
+        return removed
+
+
+_default_cache: Optional[PDFCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> PDFCache:
+    """Process-wide cache instance, so hit/miss counters accumulate across sessions."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = PDFCache()
+        return _default_cache
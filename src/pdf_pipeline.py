@@ -0,0 +1,243 @@
+# src/pdf_pipeline.py
+"""Bounded-concurrency download + parse stage used by `process_pdfs_node`.
+
+Downloads run on a thread pool (they are network bound), go through the shared
+pooled `HttpClient` and are spaced out per host by `HostRateLimiter` instead of
+a fixed sleep. Text extraction and chunking
+are CPU bound, so they run on a process pool through the engines in
+`extraction`; papers longer than `PDF_PAGES_PER_TASK` pages are parsed as
+several page ranges in parallel and chunked once all ranges are in. A failure
+on one paper never affects the others, and results come back in the original
+paper order.
+
+Both stages are backed by `PDFCache`: a cached text record skips download and
+parsing entirely, and a cached PDF skips the download.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from .extraction import CHUNK_PARAMS, chunk_pages, extract_document, extract_page_range, page_ranges
+from .http_client import get_client
+from .pdf_cache import PDFCache, get_default_cache, paper_key
+from .tracing import span
+
+DOWNLOAD_WORKERS = int(os.getenv("PDF_DOWNLOAD_WORKERS", "4"))
+PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+HOST_MIN_INTERVAL = float(os.getenv("PDF_HOST_MIN_INTERVAL", "1.0"))
+
+
+class HostRateLimiter:
+    """Spaces out request starts to the same host by at least `min_interval` seconds."""
+
+    def __init__(self, min_interval: float = HOST_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def pdf_url_for(paper: Dict[str, Any]) -> str:
+    url = paper['url']
+    return url.replace('/abs/', '/pdf/') + '.pdf' if 'arxiv.org' in url else url
+
+
+def download_pdf(paper: Dict[str, Any], cache: PDFCache, limiter: HostRateLimiter) -> str:
+    """Download one paper's PDF into the cache and return the local path."""
+    pdf_url = pdf_url_for(paper)
+    limiter.wait(urlparse(pdf_url).netloc)
+    response = get_client().get(pdf_url)
+    return cache.put_pdf(paper_key(paper['url']), response.content)
+
+
+def extract_chunks(pdf_path: str) -> Dict[str, Any]:
+    """Extract the pages of a local PDF and chunk them. Runs inside the process pool."""
+    return extract_document(pdf_path)
+
+
+class _InlineExecutor(Executor):
+    """Executor that runs work in the calling thread (used when parse_workers=0)."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def _processed(paper: Dict[str, Any], chunks: List[str], chunk_meta: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    return {
+        'title': paper.get('title', ''),
+        'authors': paper.get('authors', []),
+        'url': paper.get('url', ''),
+        'summary': paper.get('summary', ''),
+        'chunks': chunks,
+        'chunk_meta': chunk_meta or [{} for _ in chunks],
+    }
+
+
+def process_papers(
+    papers: Iterable[Dict[str, Any]],
+    *,
+    download_workers: Optional[int] = None,
+    parse_workers: Optional[int] = None,
+    cache: Optional[PDFCache] = None,
+    limiter: Optional[HostRateLimiter] = None,
+    on_result: Optional[Callable[[Dict[str, Any]], Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Download, extract and chunk `papers` concurrently.
+
+    Returns one processed-paper dict per successfully processed paper, in the
+    same order as `papers`. Papers that fail (or yield no text) are skipped.
+    `on_result`, if given, is called with each processed paper as soon as it
+    is ready (in completion order), so later stages can start on it early. If
+    it returns a value, that value replaces the paper in the returned list
+    (e.g. a compact record, so the chunk text can be freed). If it raises,
+    the paper is kept as processed and counted as a failure; other papers
+    are unaffected.
+
+    `papers` may be any iterable, e.g. a streaming search generator: each
+    paper is submitted as soon as it is yielded, and finished work is
+    collected while the iterable is still producing.
+    """
+    download_workers = DOWNLOAD_WORKERS if download_workers is None else download_workers
+    parse_workers = PARSE_WORKERS if parse_workers is None else parse_workers
+    limiter = limiter or HostRateLimiter()
+    cache = cache or get_default_cache()
+
+    with span("pdf.process") as trace:
+        results = _run_stages(papers, download_workers, parse_workers, cache, limiter, trace, on_result)
+        trace.set(papers=len(results))
+        pages, seconds = trace.attributes.get("pages_parsed", 0), trace.attributes.get("parse_seconds", 0.0)
+        if pages and seconds:
+            trace.set(pages_per_second=round(pages / seconds, 1))
+            print(f"  Parsed {pages} pages at {pages / seconds:.1f} pages/s per parse worker.")
+    stats = cache.stats
+    print(f"  PDF cache: {stats['text_hits']} text hits, {stats['pdf_hits']} PDF hits, "
+          f"{stats['pdf_misses']} downloads, {stats['evictions']} evictions (cumulative).")
+    return [r for r in results if r is not None]
+
+
+def _run_stages(
+    papers: Iterable[Dict[str, Any]],
+    download_workers: int,
+    parse_workers: int,
+    cache: PDFCache,
+    limiter: HostRateLimiter,
+    trace: Any,
+    on_result: Optional[Callable[[Dict[str, Any]], Any]],
+) -> List[Optional[Dict[str, Any]]]:
+    """Run the download and parse stages; returns per-paper results (None on failure)."""
+    seen: List[Dict[str, Any]] = []
+    results: List[Optional[Dict[str, Any]]] = []
+    pending: Dict[Future, Any] = {}
+    # Per-paper page ranges still being parsed: i -> {start: pages or None}.
+    ranges: Dict[int, Dict[int, Optional[List[str]]]] = {}
+
+    def finish(i: int, chunks: List[str], chunk_meta: Optional[List[Dict[str, Any]]] = None) -> None:
+        if not chunks:
+            trace.add("failures")
+            print(f"  Failed to process paper {seen[i].get('title', 'Untitled')}: no text to chunk.")
+            return
+        results[i] = _processed(seen[i], chunks, chunk_meta)
+        if on_result is None:
+            return
+        try:
+            replacement = on_result(results[i])
+        except Exception as e:
+            trace.add("failures")
+            print(f"  Failed to hand off paper {seen[i].get('title', 'Untitled')}: {e}")
+            return
+        if replacement is not None:
+            results[i] = replacement
+
+    def parse(i: int, pdf_path: str) -> None:
+        try:
+            spans = page_ranges(pdf_path) if os.path.isfile(pdf_path) else []
+        except Exception:
+            spans = []  # let the whole-document parse report the error
+        if not spans:
+            pending[parser.submit(extract_chunks, pdf_path)] = ("parse", i, None)
+            return
+        ranges[i] = {start: None for start, _ in spans}
+        for start, stop in spans:
+            pending[parser.submit(extract_page_range, pdf_path, start, stop)] = ("pages", i, start)
+
+    def collect(done) -> None:
+        for future in done:
+            stage, i, start = pending.pop(future)
+            paper = seen[i]
+            try:
+                value = future.result()
+                if stage == "download":
+                    trace.add("bytes_downloaded", os.path.getsize(value) if os.path.isfile(value) else 0)
+                    parse(i, value)
+                    continue
+                trace.add("parse_seconds", value.get("seconds", 0.0))
+                if stage == "pages":
+                    parts = ranges.get(i)
+                    if parts is None:
+                        continue  # another range of this paper already failed
+                    parts[start] = value["pages"]
+                    if any(p is None for p in parts.values()):
+                        continue
+                    del ranges[i]
+                    pages = [page for _, part in sorted(parts.items()) for page in part]
+                    pending[parser.submit(chunk_pages, pages)] = ("parse", i, None)
+                    continue
+                cache.put_text(paper_key(paper['url']), value["pages"], value["chunks"], CHUNK_PARAMS,
+                               value.get("chunk_meta"))
+                trace.add("pages_parsed", len(value["pages"]))
+                trace.add("chunks_produced", len(value["chunks"]))
+            except Exception as e:
+                if stage == "pages" and ranges.pop(i, None) is None:
+                    continue
+                trace.add("failures")
+                print(f"  Failed to process paper {paper.get('title', 'Untitled')}: {e}")
+                continue
+            finish(i, value["chunks"], value.get("chunk_meta"))
+
+    downloader = ThreadPoolExecutor(max_workers=max(1, download_workers), thread_name_prefix="pdf-download")
+    parser = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 0 else _InlineExecutor()
+    try:
+        for paper in papers:
+            i = len(seen)
+            seen.append(paper)
+            results.append(None)
+            key = paper_key(paper.get('url', ''))
+            cached = cache.get_text(key, CHUNK_PARAMS)
+            pdf_path = None if cached is not None else cache.get_pdf(key)
+            if cached is not None:
+                trace.add("text_cache_hits")
+                finish(i, cached["chunks"], cached.get("chunk_meta"))
+            elif pdf_path:
+                parse(i, pdf_path)
+            else:
+                # Downloads record HTTP retries and bytes on the current span.
+                pending[downloader.submit(contextvars.copy_context().run, download_pdf, paper, cache, limiter)] = ("download", i, None)
+            # Hand finished downloads to the parser while the input is still streaming.
+            collect([f for f in list(pending) if f.done()])
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    finally:
+        downloader.shutdown(wait=True)
+        parser.shutdown(wait=True)
+    return results
@@ -1,44 +1,198 @@
 # src/planner.py
+"""Reading-plan generation.
+
+`plan_reading` is the deterministic, zero-LLM planner: papers with more
+contributions first, otherwise in the given (search relevance) order. `plan_reading_with_llm` asks Gemini for a logical order
+and scales as a map-reduce:
+
+  * papers are clustered locally by the similarity of their title + abstract
+    embeddings (the same texts indexed as abstracts, so usually cache hits),
+    at most `PLAN_CLUSTER_SIZE` papers per cluster,
+  * each cluster is ordered by its own prompt, `PLAN_CONCURRENCY` at a time,
+  * one short prompt over the clusters' leading titles orders the clusters.
+
+Papers are numbered in the prompts and the model returns the numbers as a
+JSON array; titles in free-text replies are matched back fuzzily. Any cluster
+not answered within `PLAN_TIMEOUT` seconds keeps its deterministic order, and
+the merge prompt has its own `PLAN_MERGE_TIMEOUT` (clusters not ordered in
+time stay in clustering order), so a plan always comes back in bounded time.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import difflib
+import json
+import math
+import os
 import re
-from typing import List, Dict, Any
-import google.generativeai as genai
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional, Sequence
+
+from .config import generative_model
+from .search import normalize_title
+from .tracing import current_span, span
+
+PLANNER = os.getenv("PLANNER", "llm")  # "llm" or "fast" (deterministic, no LLM calls)
+PLAN_MODEL = "gemini-1.5-flash-latest"
+PLAN_CLUSTER_SIZE = int(os.getenv("PLAN_CLUSTER_SIZE", "20"))
+PLAN_CONCURRENCY = int(os.getenv("PLAN_CONCURRENCY", "4"))
+PLAN_TIMEOUT = float(os.getenv("PLAN_TIMEOUT", "60"))
+PLAN_MERGE_TIMEOUT = float(os.getenv("PLAN_MERGE_TIMEOUT", "20"))
+PLAN_SUMMARY_CHARS = int(os.getenv("PLAN_SUMMARY_CHARS", "600"))
+
+PLAN_INSTRUCTIONS = (
+    "You are an academic advisor. Based on the following research paper titles and summaries, "
+    "create a logical reading plan for a student new to the topic.\n\n"
+    "Order the papers starting with foundational or survey papers, then move to more specific "
+    "applications or advanced topics."
+)
+
 
 def sort_papers_by_insight(insights_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     def score(item: Dict[str, Any]):
         contribs = item.get("contributions", []) or []
         gaps     = item.get("gaps", []) or []
-        return (-len(contribs), len(gaps), item.get("title", ""))
+        return (-len(contribs), len(gaps))
 
+    # Stable: papers without insights (e.g. raw search results) keep their order.
     return sorted(insights_list, key=score)
 
-#NEW LLM-POWERED PLANNER
-def plan_reading_with_llm(papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    print("  Generating an intelligent reading plan with an LLM...")
-    prompt_papers = [f"Title: {p.get('title', 'Untitled')}\nSummary: {p.get('summary', '')}" for p in papers]
-    prompt_context = "\n\n---\n\n".join(prompt_papers)
-    prompt = f"""
-You are an academic advisor. Based on the following research paper titles and summaries, create a logical reading plan for a student new to the topic.
 
-Order the papers starting with foundational or survey papers, then move to more specific applications or advanced topics.
+def plan_reading(papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Deterministic reading plan, without LLM calls."""
+    return sort_papers_by_insight(papers)
 
-Return ONLY a numbered list of the paper titles in the new, logical order. Do not add any commentary or explanation.
 
-Here are the papers:
-{prompt_context}
-"""
+def match_order(reply: str, titles: Sequence[str]) -> List[int]:
+    """Positions (0-based) of `titles` in the order given by an LLM reply.
+
+    The reply is a JSON array of 1-based paper numbers; titles (JSON strings,
+    or the lines of a numbered list) are matched by normalized title, fuzzily.
+    Unknown and repeated entries are dropped.
+    """
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash-latest")
-        response = model.generate_content(prompt)
-        ordered_titles = [line.strip() for line in re.findall(r'^\d+\.\s*(.*)', response.text, re.MULTILINE)]
-        if not ordered_titles:
-            print("    LLM planner did not return a valid list. Returning original order.")
-            return papers
-        paper_map = {p.get('title'): p for p in papers}
-        # Reorder the original list of papers based on the LLM's suggested title order
-        ordered_papers = [paper_map[title] for title in ordered_titles if title in paper_map]
-        missing_papers = [p for p in papers if p.get('title') not in ordered_titles]
-        return ordered_papers + missing_papers
+        entries = json.loads(reply)
+    except ValueError:
+        entries = [line.strip() for line in re.findall(r"^\s*\d+[.)]\s*(.*)", reply, re.MULTILINE)]
+    if not isinstance(entries, list):
+        return []
+    normalized = [normalize_title(t) for t in titles]
+    order: List[int] = []
+    for entry in entries:
+        pos: Optional[int] = None
+        if isinstance(entry, int) or (isinstance(entry, str) and entry.strip().isdigit()):
+            n = int(entry)
+            pos = n - 1 if 1 <= n <= len(titles) else None
+        elif isinstance(entry, str):
+            key = normalize_title(re.sub(r"^(?:Paper|Group)\s+\d+\s*[:.-]?\s*", "", entry.strip()))
+            close = difflib.get_close_matches(key, normalized, n=1, cutoff=0.8)
+            pos = normalized.index(close[0]) if close else None
+        if pos is not None and pos not in order:
+            order.append(pos)
+    return order
+
 
+def _ask_order(prompt: str, titles: Sequence[str], name: str) -> List[int]:
+    config = {"response_mime_type": "application/json", "response_schema": {"type": "array", "items": {"type": "integer"}}}
+    with span(name, model=PLAN_MODEL, items=len(titles)) as s:
+        response = generative_model(PLAN_MODEL).generate_content(prompt, generation_config=config)
+        s.record_usage(getattr(response, "usage_metadata", None))
+    return match_order(response.text, titles)
+
+
+def _plan_cluster(papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    listing = "\n\n---\n\n".join(
+        f"Paper {n}\nTitle: {p.get('title', 'Untitled')}\nSummary: {(p.get('summary') or '')[:PLAN_SUMMARY_CHARS]}"
+        for n, p in enumerate(papers, 1)
+    )
+    prompt = (
+        f"{PLAN_INSTRUCTIONS}\n\nReturn ONLY a JSON array of the paper numbers in the new, logical order.\n\n"
+        f"Here are the papers:\n{listing}"
+    )
+    order = _ask_order(prompt, [p.get("title", "") for p in papers], "llm.plan")
+    if not order:
+        raise ValueError("LLM planner did not return a valid order")
+    return [papers[i] for i in order] + [p for i, p in enumerate(papers) if i not in order]
+
+
+def _merge_clusters(clusters: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+    listing = "\n".join(
+        f"Group {n}: " + "; ".join(p.get("title", "Untitled") for p in cluster[:3])
+        for n, cluster in enumerate(clusters, 1)
+    )
+    prompt = (
+        f"{PLAN_INSTRUCTIONS}\n\nThe papers have been grouped by topic; each group is listed by its first titles. "
+        "Return ONLY a JSON array of the group numbers in the order they should be read.\n\n"
+        f"Here are the groups:\n{listing}"
+    )
+    order = _ask_order(prompt, [f"Group {n}" for n in range(1, len(clusters) + 1)], "llm.plan_merge")
+    return [clusters[i] for i in order] + [c for i, c in enumerate(clusters) if i not in order]
+
+
+def cluster_papers(papers: List[Dict[str, Any]], max_size: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    """Group papers by title + abstract embedding similarity (spherical k-means), at most `max_size` per group."""
+    max_size = max_size or PLAN_CLUSTER_SIZE
+    if len(papers) <= max_size:
+        return [list(papers)]
+    import numpy as np
+
+    from .rag_qa import embedding_function
+
+    try:
+        vectors = np.asarray(embedding_function()([f"{p.get('title', '')}\n\n{p.get('summary', '')}" for p in papers]),
+                             dtype=np.float32)
     except Exception as e:
-        print(f"    Error during LLM planning: {e}. Returning original order.")
-        return papers
\ No newline at end of file
+        print(f"    Could not embed papers for clustering ({e}); grouping them in search order.")
+        return [list(papers[i:i + max_size]) for i in range(0, len(papers), max_size)]
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    k = math.ceil(len(papers) / max_size)
+    centroids = vectors[np.linspace(0, len(papers) - 1, k).astype(int)]
+    for _ in range(10):
+        labels = (vectors @ centroids.T).argmax(axis=1)
+        for c in range(k):
+            members = vectors[labels == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0) / max(np.linalg.norm(members.mean(axis=0)), 1e-12)
+    clusters = []
+    for c in range(k):
+        members = [papers[i] for i in np.flatnonzero(labels == c)]
+        clusters += [members[i:i + max_size] for i in range(0, len(members), max_size)]
+    return clusters
+
+
+def plan_reading_with_llm(papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    papers = list(papers)
+    if PLANNER == "fast" or len(papers) < 2:
+        return plan_reading(papers)
+    print("  Generating an intelligent reading plan with an LLM...")
+    deadline = time.monotonic() + PLAN_TIMEOUT
+    clusters = cluster_papers(papers)
+    fallbacks = 0
+    pool = ThreadPoolExecutor(max_workers=max(1, min(PLAN_CONCURRENCY, len(clusters))))
+    try:
+        futures = [pool.submit(contextvars.copy_context().run, _plan_cluster, c) for c in clusters]
+        wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        planned = []
+        for cluster, future in zip(clusters, futures):
+            try:
+                planned.append(future.result(timeout=0))
+            except Exception as e:
+                fallbacks += 1
+                print(f"    LLM planning of {len(cluster)} papers failed ({e or 'timed out'}); using the default order for them.")
+                planned.append(plan_reading(cluster))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if len(planned) > 1:
+        # Timed-out cluster prompts may still hold every pool worker, so the
+        # merge gets a worker of its own.
+        merger = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plan-merge")
+        try:
+            planned = merger.submit(contextvars.copy_context().run, _merge_clusters, planned).result(timeout=PLAN_MERGE_TIMEOUT)
+        except Exception as e:
+            print(f"    Could not order the paper groups ({e or 'timed out'}); keeping them as clustered.")
+        finally:
+            merger.shutdown(wait=False)
+    current_span().set(plan_clusters=len(clusters), plan_fallbacks=fallbacks)
+    return [p for cluster in planned for p in cluster]
@@ -1,73 +1,479 @@
 # src/rag_qa.py
-"""RAG utilities that use ChromaDB + Gemini 1.5 embeddings/chat."""
+"""RAG utilities that use ChromaDB (or the local vector store) + Gemini 1.5 embeddings/chat."""
 
 from __future__ import annotations
 
+import contextvars
+import hashlib
 import os
-from pathlib import Path
-from typing import List, Dict, Any
-
-from dotenv import load_dotenv
-from chromadb import PersistentClient, EmbeddingFunction
-import google.generativeai as genai
-
-
-load_dotenv(Path(__file__).resolve().parents[1] / ".env", override=True)
-API_KEY = os.environ["GOOGLE_API_KEY"]
-CHROMA_DIR = os.getenv("CHROMA_DB_DIR", "./chroma_db")
-genai.configure(api_key=API_KEY)
-
-class GeminiEmbeddingFunction(EmbeddingFunction):
-    MODEL = "models/embedding-001"
-    def __call__(self, input: List[str]) -> List[List[float]]:
-        vectors: List[List[float]] = []
-        for text in input:
-            resp = genai.embed_content(
-                model=self.MODEL,
-                content=text,
-                task_type="retrieval_document",
-            )
-            vectors.append(resp["embedding"])
-        return vectors
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterator, Optional
+
+from .answer_cache import AnswerCache
+from .config import generative_model, vector_client
+from .context import CONTEXT_TOKEN_BUDGET, pack_context
+from .hybrid import BM25Index, CrossEncoderReranker, mmr, reciprocal_rank_fusion
+from .tracing import activate, span, start_span
+
 
-_embedder = GeminiEmbeddingFunction()
-client = PersistentClient(path=CHROMA_DIR)
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") != "0"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "4"))
+RERANKER = os.getenv("RERANKER", "none")  # "none", "mmr" or "cross-encoder"
+# Retrieve this many times k candidates and let the token budget decide what fits.
+CONTEXT_CANDIDATE_FACTOR = int(os.getenv("CONTEXT_CANDIDATE_FACTOR", "2"))
+QA_BATCH_CONCURRENCY = int(os.getenv("QA_BATCH_CONCURRENCY", "4"))
+# SQLite file holding the BM25 index of every corpus collection (in memory when empty).
+SPARSE_INDEX_PATH = os.getenv("SPARSE_INDEX_PATH", "./sparse_index.sqlite3")
+
+# The embedding function and Chroma client are created on first use (see
+# `embedding_function` / `chroma`); tests and benchmarks may set these directly.
+_embedder = None
+client = None
+_answer_cache = AnswerCache()
+# BM25 index per corpus collection, maintained by build_rag and lazily filled
+# from Chroma for sessions built elsewhere. It holds tokens only; hit texts
+# come from the vector store.
+_bm25_indexes: Dict[str, BM25Index] = {}
+_cross_encoder: Optional[CrossEncoderReranker] = None
 MODEL_NAME = "gemini-1.5-flash-latest"
 
 
-def build_rag(documents: List[str], metadatas: List[Dict[str, Any]], *, collection_name: str = "papers"):
-    """Create (or reset) a Chroma collection populated with text chunks."""
-    try:
-        client.delete_collection(collection_name)
-    except Exception:
-        pass
+# Index tiers: abstracts are indexed straight after fetch so a session can
+# answer within seconds; full-text chunks are backfilled as PDFs are processed.
+ABSTRACT_TIER = "abstract"
+FULL_TEXT_TIER = "full_text"
 
-    col = client.create_collection(collection_name, embedding_function=_embedder)
 
-    ids = [str(i) for i in range(len(documents))]
-    col.add(ids=ids, documents=documents, metadatas=metadatas)
-    return col
+def __getattr__(name: str):
+    # `rag_qa.genai` is the configured google.generativeai module, imported on first use.
+    if name == "genai":
+        from .config import genai
 
+        return genai()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def answer_query(collection, query: str, *, k: int = 5) -> str:
-    """Retrieve top‑k docs, then ask Gemini to answer using that context."""
-    res = collection.query(query_texts=[query], n_results=k)
 
-    snippets = []
-    if res["documents"]:
-        for doc, meta in zip(res["documents"][0], res["metadatas"][0]):
-            snippets.append(f"Source: {meta['title']}\nAuthors: {meta.get('authors', 'N/A')}\nContent: {doc}")
-    
-    if not snippets:
-        return "I couldn't find any relevant information in the provided papers."
+def embedding_function():
+    """The shared batched, cached embedding function."""
+    global _embedder
+    if _embedder is None:
+        from .embeddings import make_embedding_function
+
+        _embedder = make_embedding_function()
+    return _embedder
+
+
+def chroma():
+    """The vector store client: `client` if one was set, else the shared one (see `VECTOR_BACKEND`)."""
+    return client if client is not None else vector_client()
+
+
+def chunk_id(paper_id: str, ordinal: int, text: str, tier: str = FULL_TEXT_TIER) -> str:
+    """Stable chunk ID: paper ID + chunk ordinal (or `abstract`) + content hash."""
+    position = "abstract" if tier == ABSTRACT_TIER else ordinal
+    return f"{paper_id}:{position}:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+
+
+def chunk_tier(chunk: str) -> str:
+    parts = chunk.rsplit(":", 2)
+    return ABSTRACT_TIER if len(parts) == 3 and parts[1] == "abstract" else FULL_TEXT_TIER
+
+
+class PaperSession:
+    """A session's view of the shared corpus collection, filtered to its papers."""
+
+    def __init__(self, collection, paper_ids: List[str]):
+        self.collection = collection
+        self.paper_ids = list(dict.fromkeys(paper_ids))
+
+    def replace_paper(self, paper_id: str, canonical: str) -> None:
+        """Point the session at `canonical` in place of `paper_id` (a duplicate of it)."""
+        self.paper_ids = list(dict.fromkeys(canonical if p == paper_id else p for p in self.paper_ids))
+
+    @property
+    def where(self) -> Dict[str, Any]:
+        return {"paper_id": {"$in": self.paper_ids}}
+
+    def query(self, query_texts: Optional[List[str]] = None, n_results: int = 5, **kwargs):
+        return self.collection.query(query_texts=query_texts, n_results=n_results, where=self.where, **kwargs)
+
+    def count(self) -> int:
+        return len(self.collection.get(where=self.where, include=[])["ids"])
+
+    def sparse_index(self) -> BM25Index:
+        """The corpus BM25 index, loading any of this session's papers it lacks."""
+        index = sparse_index(self.collection.name)
+        missing = [p for p in self.paper_ids if not index.has_paper(p)]
+        if missing:
+            got = self.collection.get(where={"paper_id": {"$in": missing}}, include=["documents", "metadatas"])
+            index.add(got["ids"], got["documents"], got["metadatas"])
+        return index
+
+    def fingerprint(self) -> str:
+        """Hash of the session's chunk IDs; changes whenever its chunks change.
+
+        Read from the vector store on every call, so chunks written by another
+        worker or process (e.g. a full-text backfill) change it too.
+        """
+        ids = sorted(self.collection.get(where=self.where, include=[])["ids"])
+        return hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()[:16]
+
+
+def sparse_index(collection_name: str) -> BM25Index:
+    """The BM25 index for a corpus collection, kept in `SPARSE_INDEX_PATH`."""
+    if collection_name not in _bm25_indexes:
+        _bm25_indexes[collection_name] = BM25Index(SPARSE_INDEX_PATH or ":memory:", collection_name)
+    return _bm25_indexes[collection_name]
+
+
+def open_session(paper_ids: List[str], collection_name: str = "papers") -> PaperSession:
+    """A session view over `paper_ids` in the corpus collection, whatever is indexed for them so far."""
+    col = chroma().get_or_create_collection(collection_name, embedding_function=embedding_function())
+    return PaperSession(col, paper_ids)
+
+
+def has_full_text(paper_id: str, collection_name: str = "papers") -> bool:
+    """Whether the corpus holds full-text chunks for `paper_id` (abstract-tier chunks do not count)."""
+    col = chroma().get_or_create_collection(collection_name, embedding_function=embedding_function())
+    got = col.get(where={"$and": [{"paper_id": paper_id}, {"tier": FULL_TEXT_TIER}]}, include=[])
+    return bool(got["ids"])
+
+
+def build_rag(
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+    *,
+    ids: Optional[List[str]] = None,
+    collection_name: str = "papers",
+    tier: str = FULL_TEXT_TIER,
+) -> PaperSession:
+    """Upsert text chunks into the long-lived corpus collection and return a session view.
+
+    Each metadata dict must carry a `paper_id`. Only chunks whose IDs are not
+    already indexed get embedded; chunks of the same `tier` left over from an
+    older extraction of the same papers are removed. Metadata is tagged with
+    the tier so answers can report what they drew on.
+    """
+    metadatas = [{**meta, "tier": tier} for meta in metadatas]
+    if ids is None:
+        ordinals: Dict[str, int] = {}
+        ids = []
+        for doc, meta in zip(documents, metadatas):
+            pid = meta["paper_id"]
+            ids.append(chunk_id(pid, ordinals.get(pid, 0), doc, tier))
+            ordinals[pid] = ordinals.get(pid, 0) + 1
+
+    with span("rag.build", chunks=len(ids), tier=tier) as trace:
+        col = chroma().get_or_create_collection(collection_name, embedding_function=embedding_function())
+        session = PaperSession(col, [m["paper_id"] for m in metadatas])
+
+        indexed = set(col.get(where=session.where, include=[])["ids"])
+        wanted = set(ids)
+        stale = [c for c in indexed - wanted if chunk_tier(c) == tier]
+        if stale:
+            col.delete(ids=stale)
+
+        new = [i for i, chunk in enumerate(ids) if chunk not in indexed]
+        batch_size = chroma().get_max_batch_size()
+        for start in range(0, len(new), batch_size):
+            part = new[start:start + batch_size]
+            col.add(
+                ids=[ids[i] for i in part],
+                documents=[documents[i] for i in part],
+                metadatas=[metadatas[i] for i in part],
+            )
+        index = sparse_index(collection_name)
+        index.remove(stale)
+        index.add(ids, documents, metadatas)
+        trace.set(chunks_new=len(new), chunks_stale=len(stale))
+        if stale or new:
+            changed = {c.rsplit(":", 2)[0] for c in stale} | {ids[i].rsplit(":", 2)[0] for i in new}
+            _answer_cache.invalidate_papers(changed)
+    print(f"  Indexed {len(new)} new {tier.replace('_', '-')} chunks ({len(ids) - len(new)} already in the corpus, {len(stale)} stale removed).")
+    return session
+
+
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information in the provided papers."
+
+
+def _hits(res: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+    """Per-query hit lists from a (multi-query) `collection.query` result."""
+    out = []
+    for n, ids in enumerate(res["ids"] or []):
+        distances = (res.get("distances") or [None] * (n + 1))[n] or [None] * len(ids)
+        out.append([
+            {"id": doc_id, "document": doc, "metadata": meta, "distance": dist}
+            for doc_id, doc, meta, dist in zip(ids, res["documents"][n], res["metadatas"][n], distances)
+        ])
+    return out
+
 
-    context_block = "\n\n".join(snippets)
+def _dense(collection, query: str, k: int, query_embedding: Optional[List[float]]) -> List[Dict[str, Any]]:
+    if query_embedding is not None:
+        res = collection.query(query_embeddings=[query_embedding], n_results=k)
+    else:
+        res = collection.query(query_texts=[query], n_results=k)
+    hits = _hits(res)
+    return hits[0] if hits else []
 
-    prompt = (
+
+def _dense_candidates(collection, k: int) -> int:
+    """How many dense hits `retrieve(collection, ..., k=k)` asks for."""
+    return k * HYBRID_CANDIDATES if HYBRID_RETRIEVAL and isinstance(collection, PaperSession) else k
+
+
+def _rerank(session: PaperSession, query: str, query_embedding: List[float], hits: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    global _cross_encoder
+    if RERANKER == "mmr" and len(hits) > k:
+        got = session.collection.get(ids=[h["id"] for h in hits], include=["embeddings"])
+        vectors = dict(zip(got["ids"], got["embeddings"]))
+        order = mmr(query_embedding, [(h["id"], vectors[h["id"]]) for h in hits if h["id"] in vectors], k)
+        by_id = {h["id"]: h for h in hits}
+        return [by_id[doc_id] for doc_id in order]
+    if RERANKER == "cross-encoder" and len(hits) > k:
+        try:
+            if _cross_encoder is None:
+                _cross_encoder = CrossEncoderReranker()
+        except ImportError:
+            print("  sentence-transformers is not installed; skipping cross-encoder reranking.")
+        else:
+            order = _cross_encoder.rerank(query, [(h["id"], h["document"]) for h in hits], k)
+            by_id = {h["id"]: h for h in hits}
+            return [by_id[doc_id] for doc_id in order]
+    return hits[:k]
+
+
+def retrieve(
+    collection,
+    query: str,
+    *,
+    k: int = 5,
+    query_embedding: Optional[List[float]] = None,
+    dense: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """Return the top‑k chunks for `query` as {"id", "document", "metadata", "distance"} dicts.
+
+    For session views this is a hybrid search: dense and BM25 candidates
+    (k * HYBRID_CANDIDATES from each) are merged with reciprocal-rank fusion
+    and optionally reranked before the top k are returned. `dense` may carry
+    dense hits already fetched (by a multi-query lookup) for this query.
+    """
+    n_candidates = _dense_candidates(collection, k)
+    if not (HYBRID_RETRIEVAL and isinstance(collection, PaperSession)):
+        return dense[:k] if dense is not None else _dense(collection, query, k, query_embedding)
+
+    if query_embedding is None:
+        query_embedding = embedding_function()([query])[0]
+    if dense is None:
+        dense = _dense(collection, query, n_candidates, query_embedding)
+    index = collection.sparse_index()
+    sparse = index.search(query, n_candidates, paper_ids=collection.paper_ids)
+
+    by_id = {h["id"]: h for h in dense}
+    missing = [doc_id for doc_id, _ in sparse if doc_id not in by_id]
+    if missing:
+        got = collection.collection.get(ids=missing, include=["documents", "metadatas"])
+        for doc_id, text, meta in zip(got["ids"], got["documents"], got["metadatas"]):
+            by_id[doc_id] = {"id": doc_id, "document": text, "metadata": meta, "distance": None}
+    # Sparse hits the vector store no longer has (e.g. a reset corpus) are skipped.
+    sparse = [(doc_id, score) for doc_id, score in sparse if doc_id in by_id]
+    fused = reciprocal_rank_fusion([[h["id"] for h in dense], [doc_id for doc_id, _ in sparse]])
+    return _rerank(collection, query, query_embedding, [by_id[doc_id] for doc_id, _ in fused], k)
+
+
+def build_prompt(query: str, context_block: str) -> str:
+    return (
         "You are an academic assistant. Using ONLY the context below, "
         "answer the question. If the answer isn't in context, say 'I don't know.'\n\n"
         f"--- CONTEXT ---\n{context_block}\n\n--- QUESTION ---\n{query}\n\nAnswer:"
     )
 
-    answer = genai.GenerativeModel(MODEL_NAME).generate_content(prompt).text.strip()
-    return answer
\ No newline at end of file
+
+def _sources(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One entry per distinct paper among `hits`, in rank order."""
+    seen: Dict[str, Dict[str, Any]] = {}
+    for h in hits:
+        meta = h["metadata"]
+        key = meta.get("paper_id") or meta.get("url") or meta.get("title")
+        seen.setdefault(key, {"title": meta.get("title", ""), "authors": meta.get("authors", ""), "url": meta.get("url", "")})
+    return list(seen.values())
+
+
+def _cache_key(collection, query: str, k: int, vector: Optional[List[float]] = None):
+    """Return (fingerprint, question vector) for answer caching, or (None, `vector`)."""
+    fingerprint = getattr(collection, "fingerprint", None)
+    if fingerprint is None:
+        return None, vector
+    return f"{fingerprint()}:k={k}", vector if vector is not None else embedding_function()([query])[0]
+
+
+def answer_cache_stats() -> Dict[str, Any]:
+    return _answer_cache.snapshot()
+
+
+def embedding_stats() -> Dict[str, Any]:
+    """Embedding request/retry counters and embedding-cache hits (cumulative)."""
+    embedder = embedding_function()
+    cache = embedder.cache
+    return {
+        "requests": embedder.requests,
+        "retries": embedder.retries,
+        "cache_hits": cache.hits if cache else 0,
+        "cache_misses": cache.misses if cache else 0,
+    }
+
+
+def answer_query_stream(collection, query: str, *, k: int = 5, token_budget: int = CONTEXT_TOKEN_BUDGET) -> Iterator[Dict[str, Any]]:
+    """Retrieve and pack context, then stream Gemini's answer.
+
+    Yields a `sources` event as soon as retrieval and packing are done (with
+    the context's token usage), then one `token` event per text fragment
+    Gemini streams back, then a final `done` event carrying the full answer
+    and usage. Cached answers are replayed as a single token.
+    """
+    yield from _traced_answer(collection, query, k, token_budget)
+
+
+def _traced_answer(collection, query: str, k: int, token_budget: int, vector=None, dense=None) -> Iterator[Dict[str, Any]]:
+    trace = start_span("qa.answer", k=k)
+    try:
+        yield from _answer_events(trace, collection, query, k, token_budget, vector, dense)
+    except Exception as e:
+        trace.end(e)
+        raise
+    finally:
+        trace.end()
+
+
+def _answer_events(trace, collection, query: str, k: int, token_budget: int, vector=None, dense=None) -> Iterator[Dict[str, Any]]:
+    with activate(trace):
+        fingerprint, vector = _cache_key(collection, query, k, vector)
+    if fingerprint:
+        cached = _answer_cache.lookup(fingerprint, query, vector)
+        if cached:
+            trace.set(cached=True)
+            yield {"type": "sources", "sources": cached["sources"], "usage": cached["usage"]}
+            yield {"type": "token", "text": cached["answer"]}
+            yield {"type": "done", "answer": cached["answer"], "usage": cached["usage"], "cached": True}
+            return
+
+    with activate(trace), span("qa.retrieve") as retrieval:
+        hits = retrieve(collection, query, k=k * CONTEXT_CANDIDATE_FACTOR, query_embedding=vector, dense=dense)
+        packed = pack_context(hits, token_budget)
+        retrieval.set(hits=len(hits), context_tokens=packed["tokens"], context_chunks=packed["chunks"])
+    usage: Dict[str, Any] = {
+        "context_tokens": packed["tokens"],
+        "context_chunks": packed["chunks"],
+        "context_papers": packed["papers"],
+        "dropped_chunks": packed["dropped"],
+        "tiers": packed["tiers"],
+    }
+    yield {"type": "sources", "sources": _sources(hits), "usage": usage}
+    if not hits:
+        yield {"type": "token", "text": NO_CONTEXT_ANSWER}
+        yield {"type": "done", "answer": NO_CONTEXT_ANSWER, "usage": usage}
+        return
+
+    prompt = build_prompt(query, packed["text"])
+    parts: List[str] = []
+    usage_metadata = None
+    llm = start_span("llm.answer", trace, model=MODEL_NAME)
+    try:
+        for chunk in generative_model(MODEL_NAME).generate_content(prompt, stream=True):
+            usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+            llm.record_usage(usage_metadata)
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. a trailing safety/finish chunk).
+                continue
+            if text:
+                parts.append(text)
+                yield {"type": "token", "text": text}
+    except Exception as e:
+        llm.end(e)
+        raise
+    finally:
+        llm.end()
+    if usage_metadata is not None:
+        usage["prompt_tokens"] = getattr(usage_metadata, "prompt_token_count", None)
+        usage["output_tokens"] = getattr(usage_metadata, "candidates_token_count", None)
+    answer = "".join(parts).strip()
+    if fingerprint:
+        _answer_cache.store(fingerprint, query, answer, vector=vector, sources=_sources(hits), usage=usage,
+                            paper_ids=[h["metadata"].get("paper_id", "") for h in hits])
+    yield {"type": "done", "answer": answer, "usage": usage}
+
+
+def _collect(events: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"answer": "", "sources": [], "usage": {}, "cached": False}
+    for event in events:
+        if event["type"] == "sources":
+            result["sources"] = event["sources"]
+        elif event["type"] == "done":
+            result.update(answer=event["answer"], usage=event["usage"], cached=event.get("cached", False))
+    return result
+
+
+def answer_query_result(collection, query: str, *, k: int = 5, token_budget: int = CONTEXT_TOKEN_BUDGET) -> Dict[str, Any]:
+    """Non-streaming answer with its sources and token usage: {"answer", "sources", "usage", "cached"}."""
+    return _collect(answer_query_stream(collection, query, k=k, token_budget=token_budget))
+
+
+def answer_queries(
+    collection,
+    queries: List[str],
+    *,
+    k: int = 5,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    concurrency: int = QA_BATCH_CONCURRENCY,
+) -> Iterator[Dict[str, Any]]:
+    """Answer many questions against one collection, yielding results as they finish.
+
+    All questions are embedded in one batched call and their dense candidates
+    fetched with one multi-query `collection.query`; answers are then generated
+    `concurrency` at a time. Each result is an `answer_query_result` dict plus
+    "index" (position in `queries`), "question" and "latency_ms" (time spent
+    answering that question, excluding the shared embedding and lookup).
+    A question that fails (e.g. a Gemini error or a blocked reply) yields
+    {"index", "question", "error", "latency_ms"} instead, and the others carry on.
+    """
+    if not queries:
+        return
+    batch = start_span("qa.batch", questions=len(queries), concurrency=concurrency)
+    pool = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(queries))))
+
+    def answer(i: int, vector: List[float], dense: List[Dict[str, Any]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            result = _collect(_traced_answer(collection, queries[i], k, token_budget, vector, dense))
+        except Exception as e:
+            batch.add("errors")
+            print(f"  Failed to answer question {i + 1}: {e}")
+            result = {"error": str(e) or type(e).__name__}
+        result.update(index=i, question=queries[i], latency_ms=round((time.perf_counter() - started) * 1000, 1))
+        return result
+
+    try:
+        with activate(batch):
+            started = time.perf_counter()
+            vectors = embedding_function()(list(queries))
+            n = _dense_candidates(collection, k * CONTEXT_CANDIDATE_FACTOR)
+            dense = _hits(collection.query(query_embeddings=vectors, n_results=n))
+            batch.set(lookup_ms=round((time.perf_counter() - started) * 1000, 1))
+            futures = [pool.submit(contextvars.copy_context().run, answer, i, vectors[i], dense[i])
+                       for i in range(len(queries))]
+        for future in as_completed(futures):
+            yield future.result()
+    except Exception as e:
+        batch.end(e)
+        raise
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        batch.end()
+
+
+def answer_query(collection, query: str, *, k: int = 5) -> str:
+    """Retrieve top‑k docs, then ask Gemini to answer using that context."""
+    return answer_query_result(collection, query, k=k)["answer"]
@@ -1,18 +1,19 @@
 # src/retrieval.py
 import os
-import requests
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any
 from dotenv import load_dotenv
 from langchain.tools import BaseTool
-from langchain_community.document_loaders import PyPDFLoader
+
+from .extraction import get_engine
+from .http_client import get_client
 
 load_dotenv()
 
 # **MODIFIED CLASS DEFINITION**
 class PDFLoaderTool(BaseTool):
     name: str = "pdf_loader"
-    description: str = "Load and split text from an uploaded PDF file."
+    description: str = "Load the text of each page of an uploaded PDF file."
     
     # Declare file_path as a class attribute, which is the correct Pydantic way.
     file_path: str
@@ -21,56 +22,103 @@ class PDFLoaderTool(BaseTool):
     # Pydantic now handles initialization automatically.
 
     def _run(self, query: str) -> List[str]:
-        # self.file_path will now exist correctly.
-        loader = PyPDFLoader(self.file_path)
-        docs = loader.load_and_split()
-        return [page.page_content for page in docs]
+        # One string per page; chunking is left to `extraction.chunk_pages`.
+        return get_engine().extract(self.file_path)
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+ARXIV = "{http://arxiv.org/schemas/atom}"
+
+
+def _arxiv_entry(entry: ET.Element) -> Dict[str, Any]:
+    url = entry.findtext(f'{ATOM}id', '').strip()
+    doi = entry.findtext(f'{ARXIV}doi')
+    return {
+        'title': entry.findtext(f'{ATOM}title', '').strip(),
+        'authors': [a.findtext(f'{ATOM}name', '') for a in entry.findall(f'{ATOM}author')],
+        'summary': entry.findtext(f'{ATOM}summary', '').strip(),
+        'url': url,
+        'arxiv_id': url.rsplit('/abs/', 1)[-1],
+        'doi': doi.strip() if doi else None,
+    }
+
+
+class _ArrivedBytes:
+    """File-like view of a streamed response whose `read` returns what has arrived so far.
+
+    `iterparse` reads fixed-size blocks; a plain `read(n)` would wait for all
+    n bytes, holding back entries that are already complete.
+    """
+
+    def __init__(self, raw):
+        self._read = getattr(raw, "read1", raw.read)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._read(size if size and size > 0 else None)
+
 
 class ArxivTool(BaseTool):
     name: str = "arxiv_search"
     description: str = "Fetch papers from ArXiv for a given query"
 
-    def _run(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+    def _run(self, query: str, max_results: int = 5, start: int = 0) -> List[Dict[str, Any]]:
+        return list(self.iter_results(query, max_results, start))
+
+    def iter_results(self, query: str, max_results: int = 5, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """Yield papers as their Atom entries arrive, parsing the response incrementally.
+
+        Each entry is cleared once converted, so memory stays flat however
+        large `max_results` is.
+        """
         base = os.getenv("ARXIV_API_URL", "https://export.arxiv.org/api/query")
-        params = {'search_query': f'all:{query}', 'start': 0, 'max_results': max_results}
-        resp = requests.get(base, params=params)
-        resp.raise_for_status()
-        root = ET.fromstring(resp.text)
-        ns = {'atom': 'http://www.w3.org/2005/Atom'}
-        papers = []
-        for entry in root.findall('atom:entry', ns):
-            papers.append({
-                'title': entry.find('atom:title', ns).text.strip(),
-                'authors': [a.find('atom:name', ns).text for a in entry.findall('atom:author', ns)],
-                'summary': entry.find('atom:summary', ns).text.strip(),
-                'url': entry.find('atom:id', ns).text
-            })
-        return papers
+        params = {'search_query': f'all:{query}', 'start': start, 'max_results': max_results}
+        resp = get_client().get(base, params=params, stream=True)
+        resp.raw.decode_content = True
+        try:
+            root = None
+            for event, elem in ET.iterparse(_ArrivedBytes(resp.raw), events=("start", "end")):
+                if root is None:
+                    root = elem
+                elif event == "end" and elem.tag == f'{ATOM}entry':
+                    yield _arxiv_entry(elem)
+                    root.clear()
+        finally:
+            resp.close()
 
 class SemanticScholarTool(BaseTool):
     name: str = "semantic_scholar_search"
     description: str = "Fetch papers from Semantic Scholar for a given query"
 
-    def _run(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+    def _run(self, query: str, max_results: int = 5, offset: int = 0) -> List[Dict[str, Any]]:
         api_key = os.getenv("SEMANTIC_SCHOLAR_API_KEY")
         headers = {'x-api-key': api_key} if api_key else {}
-        url = "https://api.semanticscholar.org/graph/v1/paper/search"
-        params = {'query': query, 'limit': max_results, 'fields': 'title,authors,abstract,url'}
-        resp = requests.get(url, params=params, headers=headers)
-        resp.raise_for_status()
+        url = os.getenv("SEMANTIC_SCHOLAR_API_URL", "https://api.semanticscholar.org/graph/v1/paper/search")
+        params = {'query': query, 'offset': offset, 'limit': max_results, 'fields': 'title,authors,abstract,url,externalIds'}
+        resp = get_client().get(url, params=params, headers=headers, revalidate=True)
         data = resp.json().get('data', [])
-        return [
-            {'title': p['title'],
-             'authors': [a['name'] for a in p['authors']],
-             'summary': p.get('abstract', ''),
-             'url': p['url']}
-            for p in data
-        ]
+        papers = []
+        for p in data:
+            ids = p.get('externalIds') or {}
+            arxiv_id = ids.get('ArXiv')
+            papers.append({
+                'title': p['title'],
+                'authors': [a['name'] for a in p['authors']],
+                'summary': p.get('abstract') or '',
+                # Prefer the arXiv page when there is one: its PDF can be downloaded directly.
+                'url': f"https://arxiv.org/abs/{arxiv_id}" if arxiv_id else p['url'],
+                'arxiv_id': arxiv_id,
+                'doi': ids.get('DOI'),
+            })
+        return papers
+
+
+def fetch_arxiv(query: str, max_results: int = 5, start: int = 0) -> List[Dict[str, Any]]:
+    return ArxivTool()._run(query, max_results, start)
 
 
-def fetch_arxiv(query: str, max_results: int = 5) -> List[Dict[str, Any]]:
-    return ArxivTool()._run(query, max_results)
+def iter_arxiv(query: str, max_results: int = 5, start: int = 0) -> Iterator[Dict[str, Any]]:
+    """Streaming `fetch_arxiv`; can be fed straight into `process_papers`."""
+    return ArxivTool().iter_results(query, max_results, start)
 
 
-def fetch_semantic_scholar(query: str, max_results: int = 5) -> List[Dict[str, Any]]:
-    return SemanticScholarTool()._run(query, max_results)
\ No newline at end of file
+def fetch_semantic_scholar(query: str, max_results: int = 5, offset: int = 0) -> List[Dict[str, Any]]:
+    return SemanticScholarTool()._run(query, max_results, offset)
\ No newline at end of file
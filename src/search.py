@@ -0,0 +1,228 @@
+# src/search.py
+"""Federated paper search across arXiv and Semantic Scholar.
+
+`search_papers` splits `max_results` into pages per source and fetches every
+page of every source concurrently, so pulling 100+ candidates costs about one
+round trip rather than one per page. Page responses are cached in memory for
+`SEARCH_CACHE_TTL` seconds keyed on (source, query, page), and the merged list
+is deduplicated across sources by DOI, arXiv ID (ignoring the version) and
+normalised title. Results from different sources are interleaved by rank, so
+truncating to `max_results` keeps the best hits of each source.
+
+`iter_search_papers` yields the same results one at a time. A single-page
+arXiv search is streamed straight from the feed (see `retrieval.iter_arxiv`),
+so callers can start on the first papers before the response has finished.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .tracing import span, start_span
+
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "8"))
+
+# Largest page each API serves per request, and how deep it lets you page.
+PAGE_SIZES = {"arxiv": 100, "semantic": 100}
+MAX_DEPTH = {"arxiv": 10000, "semantic": 1000}
+# Values accepted for the workflow's `source` flag.
+SOURCES = {"arxiv": ("arxiv",), "semantic": ("semantic",), "all": ("arxiv", "semantic")}
+
+_version = re.compile(r"v\d+$")
+_non_word = re.compile(r"[\W_]+")
+
+
+def fetch_arxiv(query: str, size: int, offset: int) -> List[Dict[str, Any]]:
+    from .retrieval import fetch_arxiv  # imports langchain; deferred until the first search
+
+    return fetch_arxiv(query, size, offset)
+
+
+def iter_arxiv(query: str, size: int, offset: int) -> Iterator[Dict[str, Any]]:
+    from .retrieval import iter_arxiv
+
+    return iter_arxiv(query, size, offset)
+
+
+def fetch_semantic_scholar(query: str, size: int, offset: int) -> List[Dict[str, Any]]:
+    from .retrieval import fetch_semantic_scholar
+
+    return fetch_semantic_scholar(query, size, offset)
+
+
+FETCHERS: Dict[str, Callable[[str, int, int], List[Dict[str, Any]]]] = {
+    "arxiv": fetch_arxiv,
+    "semantic": fetch_semantic_scholar,
+}
+# Sources whose pages can be consumed as they arrive.
+STREAMERS: Dict[str, Callable[[str, int, int], Iterator[Dict[str, Any]]]] = {
+    "arxiv": iter_arxiv,
+}
+
+
+def normalize_title(title: str) -> str:
+    return _non_word.sub(" ", (title or "").lower()).strip()
+
+
+def dedup_keys(paper: Dict[str, Any]) -> List[str]:
+    """Identity keys for cross-source deduplication: DOI, arXiv ID without version, title."""
+    keys = []
+    if paper.get("doi"):
+        keys.append("doi:" + paper["doi"].lower())
+    if paper.get("arxiv_id"):
+        keys.append("arxiv:" + _version.sub("", paper["arxiv_id"]))
+    title = normalize_title(paper.get("title", ""))
+    if title:
+        keys.append("title:" + title)
+    return keys
+
+
+class SearchCache:
+    """In-memory TTL + LRU cache of search pages keyed on (source, query, page)."""
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_entries: int = SEARCH_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, int, int], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str, int, int]) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple[str, str, int, int], papers: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), papers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_cache = SearchCache()
+
+
+def _page_key(source: str, query: str, page: int, size: int) -> Tuple[str, str, int, int]:
+    return source, " ".join(query.lower().split()), page, size
+
+
+def _page(source: str, query: str, page: int, size: int, cache: SearchCache) -> List[Dict[str, Any]]:
+    key = _page_key(source, query, page, size)
+    papers = cache.get(key)
+    if papers is None:
+        papers = FETCHERS[source](query, size, page * size)
+        cache.put(key, papers)
+    # Callers may annotate paper dicts; keep the cached copies pristine.
+    return [dict(p, source=source) for p in papers]
+
+
+def merge_results(ranked: Sequence[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Interleave per-source rankings and drop cross-source duplicates.
+
+    The first occurrence of a paper wins; later duplicates only fill in
+    fields it is missing (e.g. a DOI or an abstract).
+    """
+    merged: List[Dict[str, Any]] = []
+    seen: Dict[str, Dict[str, Any]] = {}
+    for rank in range(max((len(r) for r in ranked), default=0)):
+        for results in ranked:
+            if rank >= len(results):
+                continue
+            paper = results[rank]
+            keys = dedup_keys(paper)
+            existing = next((seen[k] for k in keys if k in seen), None)
+            if existing is None:
+                existing = dict(paper)
+                merged.append(existing)
+            else:
+                for field, value in paper.items():
+                    if value and not existing.get(field):
+                        existing[field] = value
+            for k in dedup_keys(existing):
+                seen.setdefault(k, existing)
+    return merged
+
+
+def search_papers(
+    query: str,
+    max_results: int = 5,
+    *,
+    sources: Sequence[str] = ("arxiv", "semantic"),
+    cache: Optional[SearchCache] = None,
+) -> List[Dict[str, Any]]:
+    """Search `sources` concurrently, paging each up to `max_results`, and return merged, deduplicated papers."""
+    cache = cache or _cache
+    jobs = []
+    for source in sources:
+        size = min(PAGE_SIZES[source], max_results)
+        limit = min(max_results, MAX_DEPTH[source])
+        jobs += [(source, page, size) for page in range((limit + size - 1) // size)]
+
+    with span("search", sources=",".join(sources), pages=len(jobs)) as trace, \
+            ThreadPoolExecutor(max_workers=max(1, min(SEARCH_WORKERS, len(jobs)))) as pool:
+        futures = {job: pool.submit(_page, job[0], query, job[1], job[2], cache) for job in jobs}
+        per_source: Dict[str, List[Dict[str, Any]]] = {s: [] for s in sources}
+        for (source, page, _), future in futures.items():
+            try:
+                per_source[source].extend(future.result())
+            except Exception as e:
+                print(f"  {source} search page {page} failed: {e}")
+        papers = merge_results([per_source[s][:max_results] for s in sources])[:max_results]
+        trace.set(results=len(papers), candidates=sum(len(r) for r in per_source.values()))
+    return papers
+
+
+def iter_search_papers(
+    query: str,
+    max_results: int = 5,
+    *,
+    sources: Sequence[str] = ("arxiv", "semantic"),
+    cache: Optional[SearchCache] = None,
+) -> Iterator[Dict[str, Any]]:
+    """`search_papers` as a generator; a single page of a streaming source is yielded as it arrives."""
+    cache = cache or _cache
+    source = sources[0] if len(sources) == 1 else None
+    if source not in STREAMERS or max_results > PAGE_SIZES[source]:
+        yield from search_papers(query, max_results, sources=sources, cache=cache)
+        return
+    key = _page_key(source, query, 0, max_results)
+    cached = cache.get(key)
+    if cached is not None:
+        yield from merge_results([[dict(p, source=source) for p in cached]])
+        return
+
+    # Not made current: the caller's own spans run between the yields.
+    trace = start_span("search", sources=source, pages=1, streamed=True)
+    papers: List[Dict[str, Any]] = []
+    seen: set = set()
+    try:
+        for paper in STREAMERS[source](query, max_results, 0):
+            papers.append(paper)
+            keys = dedup_keys(paper)
+            if any(k in seen for k in keys):
+                continue
+            seen.update(keys)
+            trace.add("results")
+            yield dict(paper, source=source)
+        cache.put(key, papers)
+    except Exception as e:
+        print(f"  {source} search page 0 failed: {e}")
+    finally:
+        trace.set(candidates=len(papers))
+        trace.end()
@@ -0,0 +1,128 @@
+# src/session_store.py
+"""Persistent Q&A session store for the API server.
+
+A session is just the list of paper IDs it covers, the name of the corpus
+collection they are indexed in and its reading plan, so that is all that is
+stored (in SQLite, shared by every uvicorn worker on the host). The live
+`PaperSession` is rebuilt with `open_session` the first time a worker sees a
+session and kept in a small in-process LRU of at most `SESSION_MAX_LIVE`
+entries.
+
+Sessions expire `SESSION_TTL` seconds after their last use, and the store
+keeps at most `SESSION_MAX_STORED` of them, dropping the least recently used.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .rag_qa import PaperSession, open_session
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "./sessions.sqlite3")
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(24 * 3600)))
+SESSION_MAX_STORED = int(os.getenv("SESSION_MAX_STORED", "10000"))
+SESSION_MAX_LIVE = int(os.getenv("SESSION_MAX_LIVE", "64"))
+
+
+class SessionStore:
+    """SQLite-backed session metadata with TTL/LRU eviction and lazily rehydrated live sessions."""
+
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        *,
+        ttl: float = SESSION_TTL,
+        max_stored: int = SESSION_MAX_STORED,
+        max_live: int = SESSION_MAX_LIVE,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_stored = max_stored
+        self.max_live = max_live
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "rehydrations": 0, "expired": 0, "evictions": 0}
+        self._live: "OrderedDict[str, PaperSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY, collection TEXT, paper_ids TEXT, reading_plan TEXT,"
+            " created_at REAL, last_access REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+        self._conn.commit()
+
+    def put(self, session_id: str, session: PaperSession, reading_plan: List[Dict[str, Any]]) -> None:
+        """Store (or update) a session's paper IDs and reading plan."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(session_id) DO UPDATE SET"
+                " collection=excluded.collection, paper_ids=excluded.paper_ids,"
+                " reading_plan=excluded.reading_plan, last_access=excluded.last_access",
+                (session_id, session.collection.name, json.dumps(session.paper_ids),
+                 json.dumps(reading_plan, default=str), now, now),
+            )
+            self._conn.commit()
+            self._remember(session_id, session)
+        self.evict()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """{"rag_collection": PaperSession, "reading_plan": [...]}, or None if unknown or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT collection, paper_ids, reading_plan, last_access FROM sessions WHERE session_id=?",
+                (session_id,),
+            ).fetchone()
+            if row is None or now - row[3] > self.ttl:
+                self.stats["misses"] += 1
+                if row is not None:
+                    self._delete([session_id])
+                    self.stats["expired"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._conn.execute("UPDATE sessions SET last_access=? WHERE session_id=?", (now, session_id))
+            self._conn.commit()
+            session = self._live.get(session_id)
+            paper_ids = json.loads(row[1])
+            if session is None or session.paper_ids != paper_ids:
+                session = open_session(paper_ids, collection_name=row[0])
+                self.stats["rehydrations"] += 1
+            self._remember(session_id, session)
+        return {"rag_collection": session, "reading_plan": json.loads(row[2])}
+
+    def evict(self) -> int:
+        """Drop expired sessions, then the least recently used beyond `max_stored`."""
+        with self._lock:
+            expired = [r[0] for r in self._conn.execute(
+                "SELECT session_id FROM sessions WHERE last_access < ?", (time.time() - self.ttl,))]
+            overflow = [r[0] for r in self._conn.execute(
+                "SELECT session_id FROM sessions WHERE last_access >= ? ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                (time.time() - self.ttl, self.max_stored))]
+            self._delete(expired + overflow)
+            self.stats["expired"] += len(expired)
+            self.stats["evictions"] += len(overflow)
+        return len(expired) + len(overflow)
+
+    def _remember(self, session_id: str, session: PaperSession) -> None:
+        self._live[session_id] = session
+        self._live.move_to_end(session_id)
+        while len(self._live) > self.max_live:
+            self._live.popitem(last=False)
+
+    def _delete(self, session_ids: List[str]) -> None:
+        for session_id in session_ids:
+            self._conn.execute("DELETE FROM sessions WHERE session_id=?", (session_id,))
+            self._live.pop(session_id, None)
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
@@ -0,0 +1,305 @@
+# src/tracing.py
+"""Lightweight in-process tracing for the research workflow.
+
+Spans are opened with `span(name, **attributes)` (or the `traced` decorator)
+and nest through a context variable, so a graph node's span becomes the parent
+of the Gemini and embedding calls made inside it. Numeric attributes listed in
+`COUNTED_ATTRIBUTES` (bytes downloaded, pages parsed, tokens in/out, retries,
+...) are also summed into per-span-name counters.
+
+Finished spans are kept in a bounded ring buffer and can be exported as
+OpenTelemetry (OTLP/JSON) resource spans; durations and counters are exported
+in the Prometheus text format. When `TRACE_EXPORT_PATH` is set, each finished
+trace is also appended to that file as one OTLP/JSON line. Recording a span
+costs two clock reads and one short lock, so tracing is on by default;
+`TRACING=0` turns every span into a no-op.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+TRACING = os.getenv("TRACING", "1") != "0"
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "4096"))
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+SERVICE_NAME = "ai-research-assistant"
+
+COUNTED_ATTRIBUTES = (
+    "bytes_downloaded", "pages_parsed", "chunks_produced", "texts_embedded",
+    "tokens_in", "tokens_out", "retries",
+)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "start_ns", "_start_perf",
+                 "duration_ns", "attributes", "error")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.duration_ns: Optional[int] = None
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float = 1) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def record_usage(self, usage_metadata: Any) -> None:
+        """Copy Gemini `usage_metadata` token counts onto the span."""
+        if usage_metadata is None:
+            return
+        prompt = getattr(usage_metadata, "prompt_token_count", None)
+        output = getattr(usage_metadata, "candidates_token_count", None)
+        if prompt is not None:
+            self.attributes["tokens_in"] = prompt
+        if output is not None:
+            self.attributes["tokens_out"] = output
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.duration_ns is not None:
+            return
+        self.duration_ns = time.perf_counter_ns() - self._start_perf
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.tracer._finish(self)
+
+    @property
+    def duration(self) -> float:
+        return (self.duration_ns or 0) / 1e9
+
+
+class _NoopSpan:
+    """Stand-in returned when tracing is disabled."""
+
+    name = ""
+    attributes: Dict[str, Any] = {}
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def add(self, key: str, amount: float = 1) -> None:
+        pass
+
+    def record_usage(self, usage_metadata: Any) -> None:
+        pass
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    def __init__(self, enabled: bool = TRACING, buffer_size: int = TRACE_BUFFER_SIZE, export_path: str = TRACE_EXPORT_PATH):
+        self.enabled = enabled
+        self.export_path = export_path
+        self._spans: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, List[int]] = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1))
+        self._duration_sum: Dict[str, float] = defaultdict(float)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes: Any):
+        """Start a span without making it current; the caller must `end()` it.
+
+        Meant for generators, which cannot hold a context variable across
+        yields. The parent defaults to the current span.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = parent if isinstance(parent, Span) else _current.get()
+        return Span(self, name, parent, attributes)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        s = Span(self, name, _current.get(), attributes)
+        token = _current.set(s)
+        try:
+            yield s
+        except BaseException as e:
+            s.end(e)
+            raise
+        finally:
+            _current.reset(token)
+            s.end()
+
+    def _finish(self, s: Span) -> None:
+        seconds = s.duration
+        with self._lock:
+            self._spans.append(s)
+            buckets = self._buckets[s.name]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+                    break
+            else:
+                buckets[-1] += 1
+            self._duration_sum[s.name] += seconds
+            if s.error:
+                self._errors[s.name] += 1
+            for key in COUNTED_ATTRIBUTES:
+                value = s.attributes.get(key)
+                if isinstance(value, (int, float)):
+                    self._counters[key][s.name] += value
+        if s.parent_id is None and self.export_path:
+            self._export_trace(s.trace_id)
+
+    def _export_trace(self, trace_id: str) -> None:
+        payload = json.dumps(self.export_otel(self.finished_spans(trace_id)))
+        try:
+            with self._lock, open(self.export_path, "a", encoding="utf-8") as f:
+                f.write(payload + "\n")
+        except OSError as e:
+            print(f"  Could not write trace to {self.export_path}: {e}")
+
+    def finished_spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self._spans)
+        return [s for s in spans if trace_id is None or s.trace_id == trace_id]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._buckets.clear()
+            self._duration_sum.clear()
+            self._errors.clear()
+            self._counters.clear()
+
+    def export_otel(self, spans: Optional[List[Span]] = None) -> Dict[str, Any]:
+        """Finished spans as an OTLP/JSON `ExportTraceServiceRequest` body."""
+        spans = self.finished_spans() if spans is None else spans
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otel_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": "src.tracing"},
+                "spans": [_otel_span(s) for s in spans],
+            }],
+        }]}
+
+    def prometheus_text(self, gauges: Optional[Dict[str, float]] = None, prefix: str = "ara") -> str:
+        """Span durations (histogram), errors and counted attributes, plus extra `gauges`."""
+        lines: List[str] = []
+        with self._lock:
+            names = sorted(self._buckets)
+            metric = f"{prefix}_span_duration_seconds"
+            lines += [f"# HELP {metric} Duration of traced spans.", f"# TYPE {metric} histogram"]
+            for name in names:
+                label = f'span="{_escape(name)}"'
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS, self._buckets[name]):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+                cumulative += self._buckets[name][-1]
+                lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {cumulative}')
+                lines.append(f"{metric}_sum{{{label}}} {self._duration_sum[name]:.6f}")
+                lines.append(f"{metric}_count{{{label}}} {cumulative}")
+
+            metric = f"{prefix}_span_errors_total"
+            lines += [f"# HELP {metric} Spans that ended with an exception.", f"# TYPE {metric} counter"]
+            for name in names:
+                lines.append(f'{metric}{{span="{_escape(name)}"}} {self._errors.get(name, 0)}')
+
+            for key in COUNTED_ATTRIBUTES:
+                metric = f"{prefix}_{key}_total"
+                lines += [f"# HELP {metric} Sum of the {key} span attribute.", f"# TYPE {metric} counter"]
+                for name, value in sorted(self._counters.get(key, {}).items()):
+                    lines.append(f'{metric}{{span="{_escape(name)}"}} {value:g}')
+
+        for key, value in sorted((gauges or {}).items()):
+            metric = f"{prefix}_{key}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {float(value):g}"]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _otel_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otel_span(s: Span) -> Dict[str, Any]:
+    span = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.start_ns + (s.duration_ns or 0)),
+        "attributes": [_otel_attribute(k, v) for k, v in s.attributes.items()],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+    if s.parent_id:
+        span["parentSpanId"] = s.parent_id
+    return span
+
+
+tracer = Tracer()
+
+
+def span(name: str, **attributes: Any):
+    """Context manager for a span that is current (the parent of nested spans) while open."""
+    return tracer.span(name, **attributes)
+
+
+def start_span(name: str, parent: Optional[Span] = None, **attributes: Any):
+    return tracer.start_span(name, parent, **attributes)
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+@contextmanager
+def activate(s: Any) -> Iterator[Any]:
+    """Make a span from `start_span` current for the duration of the block."""
+    if not isinstance(s, Span):
+        yield s
+        return
+    token = _current.set(s)
+    try:
+        yield s
+    finally:
+        _current.reset(token)
+
+
+def traced(name: str) -> Callable:
+    """Decorator that runs the function inside `span(name)`."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
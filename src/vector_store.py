@@ -0,0 +1,523 @@
+# src/vector_store.py
+"""Local, memory-mapped vector store: an alternative backend to Chroma.
+
+`VECTOR_BACKEND=local` makes `rag_qa` use `LocalVectorClient` in place of
+the Chroma `PersistentClient`. Its collections implement the part of the
+Chroma collection API that `rag_qa` uses (`add`, `get`, `query`, `delete`,
+`count`), so `build_rag`, `PaperSession` and `answer_query` work unchanged.
+
+On-disk layout, one directory per collection under `VECTOR_DB_DIR`:
+
+  seg-000001.npy        quantized vectors of one `add` call (memory-mapped)
+  seg-000001.scale.npy  per-row scales when `VECTOR_DTYPE=int8`
+  meta.sqlite3          sidecar: chunk ID -> (segment, row), paper ID,
+                        document and metadata JSON
+  index.faiss           optional ANN index (`VECTOR_ANN_INDEX`)
+
+Vectors are stored as float16 (default), int8 with a per-row scale, or
+float32. Deleting or replacing chunks only drops their sidecar rows; the
+vectors stay in their segment until `compact()` rewrites the live rows into
+one segment and removes the old files (run automatically once a collection
+has more than `VECTOR_MAX_SEGMENTS` segments).
+
+Several processes (e.g. uvicorn workers) may share a collection directory.
+Segment numbers are reserved from a counter in the sidecar inside a
+`BEGIN IMMEDIATE` transaction and never reused, so a segment file is written
+once and never overwritten. A segment's row is committed only after its file
+is written, and `compact()` runs in one write transaction and bumps a
+generation number, which tells the other processes to drop their cached
+memory maps and ANN index.
+
+Filtered queries (sessions always filter by paper ID) score just the
+matching rows. Unfiltered queries use the faiss HNSW or IVF-PQ index when
+one has been built (`build_ann`, or by `compact` for collections with at
+least `VECTOR_ANN_MIN_VECTORS` vectors) and fall back to a blockwise scan
+of the memory-mapped segments otherwise. Distances are squared L2, as in
+Chroma's default space.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # "chroma" or "local"
+VECTOR_DB_DIR = os.getenv("VECTOR_DB_DIR", "./vector_db")
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float16")  # "float32", "float16" or "int8"
+VECTOR_ANN_INDEX = os.getenv("VECTOR_ANN_INDEX", "hnsw")  # "none", "hnsw" or "ivfpq"
+VECTOR_ANN_MIN_VECTORS = int(os.getenv("VECTOR_ANN_MIN_VECTORS", "50000"))
+VECTOR_MAX_SEGMENTS = int(os.getenv("VECTOR_MAX_SEGMENTS", "64"))
+SCAN_BLOCK_ROWS = 65536
+
+_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Encode float vectors as `dtype`; int8 also returns one float32 scale per row."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype != "int8":
+        return vectors.astype(_DTYPES[dtype]), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    vectors = np.asarray(codes, dtype=np.float32)
+    return vectors * scales[:, None] if scales is not None else vectors
+
+
+def _squared_l2(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    return (vectors * vectors).sum(axis=1) - 2.0 * vectors @ query + float(query @ query)
+
+
+def _save_atomic(path: str, array: np.ndarray) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".npy")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _where_sql(where: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """Translate a Chroma-style `where` ({field: value}, {field: {"$in": [...]}} or {"$and": [...]}) to SQL."""
+    if not where:
+        return "", []
+    clauses, params = [], []
+    for field, cond in where.items():
+        if field == "$and":
+            for part in cond:
+                sql, part_params = _where_sql(part)
+                clauses.append(sql[len(" WHERE "):] if sql else "1")
+                params += part_params
+            continue
+        column = "paper_id" if field == "paper_id" else f"json_extract(metadata, '$.{field}')"
+        if isinstance(cond, dict) and "$in" in cond:
+            values = list(cond["$in"])
+            if not values:
+                clauses.append("0")
+                continue
+            clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+            params += values
+        elif isinstance(cond, dict) and "$eq" in cond:
+            clauses.append(f"{column} = ?")
+            params.append(cond["$eq"])
+        elif isinstance(cond, dict):
+            raise ValueError(f"Unsupported where operator in {cond!r}")
+        else:
+            clauses.append(f"{column} = ?")
+            params.append(cond)
+    return " WHERE " + " AND ".join(clauses), params
+
+
+class LocalCollection:
+    """A Chroma-compatible collection backed by memory-mapped segments and a SQLite sidecar."""
+
+    def __init__(self, root: str, name: str, embedding_function=None, *, dtype: str = VECTOR_DTYPE,
+                 ann_index: str = VECTOR_ANN_INDEX, max_segments: int = VECTOR_MAX_SEGMENTS):
+        self.name = name
+        self.path = os.path.join(root, name)
+        self.embedding_function = embedding_function
+        self.ann_index = ann_index
+        self.max_segments = max_segments
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._segments: Dict[int, Tuple[np.ndarray, Optional[np.ndarray]]] = {}
+        self._ann: Any = None
+        self._ann_loaded = False
+        self._ann_segs: set = set()
+        self._generation: Optional[str] = None
+        self._conn = sqlite3.connect(os.path.join(self.path, "meta.sqlite3"), check_same_thread=False, timeout=30)
+        self._conn.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, seg INTEGER, row INTEGER,"
+            " paper_id TEXT, document TEXT, metadata TEXT);"
+            "CREATE INDEX IF NOT EXISTS chunks_paper ON chunks (paper_id);"
+            "CREATE INDEX IF NOT EXISTS chunks_location ON chunks (seg, row);"
+            "CREATE TABLE IF NOT EXISTS segments (seg INTEGER PRIMARY KEY, rows INTEGER, dim INTEGER, dtype TEXT);"
+            "CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT);"
+        )
+        with self._transaction():
+            self._conn.execute("INSERT OR IGNORE INTO info VALUES ('dtype', ?)", (dtype,))
+            self._conn.execute("INSERT OR IGNORE INTO info VALUES ('generation', '0')")
+            self._conn.execute("INSERT OR IGNORE INTO info SELECT 'next_seg', COALESCE(MAX(seg), 0) FROM segments")
+        self.dtype = self._conn.execute("SELECT value FROM info WHERE key='dtype'").fetchone()[0]
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction holding SQLite's write lock from the start, so it is serialized across processes."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    def _sync(self) -> None:
+        """Drop cached segments and the ANN index if another process compacted the collection."""
+        generation = self._conn.execute("SELECT value FROM info WHERE key='generation'").fetchone()[0]
+        if generation != self._generation:
+            self._generation = generation
+            self._segments.clear()
+            self._ann, self._ann_loaded, self._ann_segs = None, False, set()
+
+    # --- segments ---
+
+    def _segment_path(self, seg: int, suffix: str = ".npy") -> str:
+        return os.path.join(self.path, f"seg-{seg:06d}{suffix}")
+
+    def _segment(self, seg: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if seg not in self._segments:
+            codes = np.load(self._segment_path(seg), mmap_mode="r")
+            scales = np.load(self._segment_path(seg, ".scale.npy")) if self.dtype == "int8" else None
+            self._segments[seg] = (codes, scales)
+        return self._segments[seg]
+
+    def _vectors(self, locations: Sequence[Tuple[int, int]]) -> np.ndarray:
+        """Dequantized vectors for (segment, row) pairs, in the given order."""
+        if not locations:
+            return np.zeros((0, 0), dtype=np.float32)
+        by_seg: Dict[int, List[int]] = {}
+        for pos, (seg, row) in enumerate(locations):
+            by_seg.setdefault(seg, []).append(pos)
+        out: Optional[np.ndarray] = None
+        for seg, positions in by_seg.items():
+            codes, scales = self._segment(seg)
+            rows = np.array([locations[p][1] for p in positions])
+            block = dequantize(codes[rows], scales[rows] if scales is not None else None)
+            if out is None:
+                out = np.empty((len(locations), block.shape[1]), dtype=np.float32)
+            out[positions] = block
+        return out
+
+    def _reserve_segment(self) -> int:
+        """Take the next segment number. Must run inside `_transaction`."""
+        self._conn.execute("UPDATE info SET value = CAST(value AS INTEGER) + 1 WHERE key='next_seg'")
+        return int(self._conn.execute("SELECT value FROM info WHERE key='next_seg'").fetchone()[0])
+
+    def _write_segment(self, seg: int, vectors: np.ndarray) -> Tuple[int, int, int, str]:
+        """Write a reserved segment's files; returns its `segments` row for the caller to insert."""
+        codes, scales = quantize(vectors, self.dtype)
+        _save_atomic(self._segment_path(seg), codes)
+        if scales is not None:
+            _save_atomic(self._segment_path(seg, ".scale.npy"), scales)
+        return seg, len(codes), codes.shape[1], self.dtype
+
+    # --- Chroma collection API ---
+
+    def count(self) -> int:
+        with self._lock:
+            self._sync()
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def add(self, ids: List[str], documents: Optional[List[str]] = None, metadatas: Optional[List[Dict[str, Any]]] = None,
+            embeddings: Optional[Sequence[Sequence[float]]] = None) -> None:
+        if not ids:
+            return
+        documents = documents or [""] * len(ids)
+        metadatas = metadatas or [{} for _ in ids]
+        if embeddings is None:
+            embeddings = self.embedding_function(documents)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            with self._transaction():
+                seg = self._reserve_segment()
+            # The file is complete before its segment row (and chunk rows) become visible.
+            segment = self._write_segment(seg, vectors)
+            with self._transaction():
+                self._conn.execute("INSERT INTO segments VALUES (?, ?, ?, ?)", segment)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?)",
+                    [(i, seg, row, (m or {}).get("paper_id"), doc, json.dumps(m or {}))
+                     for row, (i, doc, m) in enumerate(zip(ids, documents, metadatas))],
+                )
+            if self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0] > self.max_segments:
+                self.compact()
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock, self._transaction():
+            if ids is not None:
+                self._conn.executemany("DELETE FROM chunks WHERE id=?", [(i,) for i in ids])
+            if where:
+                clause, params = _where_sql(where)
+                self._conn.execute(f"DELETE FROM chunks{clause}", params)
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Iterable[str] = ("documents", "metadatas")) -> Dict[str, Any]:
+        include = set(include)
+        with self._lock:
+            self._sync()
+            clause, params = _where_sql(where)
+            if ids is not None:
+                in_ids = f"id IN ({','.join('?' * len(ids))})" if ids else "0"
+                clause += (" AND " if clause else " WHERE ") + in_ids
+                params += list(ids)
+            rows = self._conn.execute(f"SELECT id, seg, row, document, metadata FROM chunks{clause}", params).fetchall()
+            if ids:
+                order = {i: n for n, i in enumerate(ids)}
+                rows.sort(key=lambda r: order[r[0]])
+            vectors = self._vectors([(r[1], r[2]) for r in rows]) if "embeddings" in include else None
+        return {
+            "ids": [r[0] for r in rows],
+            "documents": [r[3] for r in rows] if "documents" in include else None,
+            "metadatas": [json.loads(r[4]) for r in rows] if "metadatas" in include else None,
+            "embeddings": [v.tolist() for v in vectors] if vectors is not None else None,
+        }
+
+    def query(self, query_texts: Optional[List[str]] = None, query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+              n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Iterable[str] = ("documents", "metadatas", "distances")) -> Dict[str, Any]:
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(query_texts)
+        results: Dict[str, List[Any]] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query in np.asarray(query_embeddings, dtype=np.float32):
+            with self._lock:
+                self._sync()
+                try:
+                    hits = self._search(query, n_results, where)
+                except FileNotFoundError:
+                    # Another process compacted the segments away mid-query; reload and retry.
+                    self._sync()
+                    hits = self._search(query, n_results, where)
+                found = self._conn.execute(
+                    f"SELECT id, document, metadata FROM chunks WHERE id IN ({','.join('?' * len(hits))})",
+                    [h[0] for h in hits],
+                ).fetchall() if hits else []
+            by_id = {r[0]: r for r in found}
+            hits = [h for h in hits if h[0] in by_id]
+            results["ids"].append([h[0] for h in hits])
+            results["documents"].append([by_id[h[0]][1] for h in hits])
+            results["metadatas"].append([json.loads(by_id[h[0]][2]) for h in hits])
+            results["distances"].append([h[1] for h in hits])
+        return results
+
+    def _search(self, query: np.ndarray, k: int, where: Optional[Dict[str, Any]]) -> List[Tuple[str, float]]:
+        if where:
+            clause, params = _where_sql(where)
+            rows = self._conn.execute(f"SELECT id, seg, row FROM chunks{clause}", params).fetchall()
+            if not rows:
+                return []
+            dist = _squared_l2(query, self._vectors([(r[1], r[2]) for r in rows]))
+            top = np.argsort(dist)[:k] if len(dist) <= k else np.argpartition(dist, k)[:k]
+            top = top[np.argsort(dist[top])]
+            return [(rows[i][0], float(dist[i])) for i in top]
+        ann = self._load_ann()
+        if ann is not None:
+            return self._search_ann(ann, query, k)
+        return self._scan(query, k)
+
+    def _scan(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Blockwise brute force over every live row of every segment."""
+        best: List[Tuple[float, int, int]] = []
+        for seg, in self._conn.execute("SELECT seg FROM segments").fetchall():
+            codes, scales = self._segment(seg)
+            for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+                block = dequantize(codes[start:start + SCAN_BLOCK_ROWS],
+                                   scales[start:start + SCAN_BLOCK_ROWS] if scales is not None else None)
+                dist = _squared_l2(query, block)
+                # Over-fetch: some rows may be stale.
+                n = min(len(dist), k * 4)
+                top = np.argpartition(dist, n - 1)[:n] if n < len(dist) else np.arange(len(dist))
+                best += [(float(dist[i]), seg, start + int(i)) for i in top]
+        best.sort()
+        return self._resolve(best, k)
+
+    def _resolve(self, candidates: List[Tuple[float, int, int]], k: int) -> List[Tuple[str, float]]:
+        """Map (distance, segment, row) candidates to live chunk IDs, best first."""
+        out: List[Tuple[str, float]] = []
+        for start in range(0, len(candidates), 500):
+            part = candidates[start:start + 500]
+            pairs = " OR ".join("(seg=? AND row=?)" for _ in part)
+            rows = self._conn.execute(f"SELECT seg, row, id FROM chunks WHERE {pairs}",
+                                      [v for _, seg, row in part for v in (seg, row)]).fetchall()
+            live = {(seg, row): i for seg, row, i in rows}
+            for dist, seg, row in part:
+                if (seg, row) in live:
+                    out.append((live[(seg, row)], dist))
+                    if len(out) == k:
+                        return out
+        return out
+
+    # --- ANN index ---
+
+    def _ann_path(self) -> str:
+        return os.path.join(self.path, "index.faiss")
+
+    def _load_ann(self):
+        """The saved ANN index, topped up in memory with segments (from any process) written after it was built."""
+        if not self._ann_loaded:
+            self._ann_loaded = True
+            row = self._conn.execute("SELECT value FROM info WHERE key='ann_segs'").fetchone()
+            if row is not None and os.path.exists(self._ann_path()):
+                import faiss
+
+                self._ann = faiss.read_index(self._ann_path())
+                self._ann_segs = set(json.loads(row[0]))
+        if self._ann is not None:
+            for seg, in self._conn.execute("SELECT seg FROM segments").fetchall():
+                if seg not in self._ann_segs:
+                    self._ann_add(self._conn.execute("SELECT seg, row FROM chunks WHERE seg=?", (seg,)).fetchall())
+                    self._ann_segs.add(seg)
+        return self._ann
+
+    def _ann_add(self, rows: Sequence[Tuple[int, int]]) -> None:
+        if rows:
+            labels = np.array([(seg << 32) | row for seg, row in rows], dtype=np.int64)
+            self._ann.add_with_ids(self._vectors(rows), labels)
+
+    def _search_ann(self, ann, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        dist, labels = ann.search(query[None, :], k * 2)
+        candidates = [(float(d), int(l) >> 32, int(l) & 0xFFFFFFFF) for d, l in zip(dist[0], labels[0]) if l >= 0]
+        return self._resolve(candidates, k)
+
+    def build_ann(self, kind: Optional[str] = None) -> bool:
+        """Build and save a faiss HNSW or IVF-PQ index over the live vectors. Returns False without faiss."""
+        kind = kind or self.ann_index
+        try:
+            import faiss
+        except ImportError:
+            return False
+        with self._lock:
+            self._sync()
+            segs = [r[0] for r in self._conn.execute("SELECT seg FROM segments")]
+            rows = self._conn.execute("SELECT seg, row FROM chunks ORDER BY seg, row").fetchall()
+            if not rows:
+                return False
+            vectors = self._vectors(rows)
+            labels = np.array([(seg << 32) | row for seg, row in rows], dtype=np.int64)
+            dim = vectors.shape[1]
+            if kind == "ivfpq":
+                nlist = max(1, min(4096, int(np.sqrt(len(rows)))))
+                m = next(m for m in (16, 8, 4, 2, 1) if dim % m == 0)
+                base = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, m, 8 if len(rows) >= 256 * 39 else 4)
+                base.train(vectors)
+                base.nprobe = min(16, nlist)
+            else:
+                base = faiss.IndexHNSWFlat(dim, 32)
+                base.hnsw.efSearch = 64
+            index = faiss.IndexIDMap2(base)
+            index.add_with_ids(vectors, labels)
+            faiss.write_index(index, self._ann_path() + ".tmp")
+            os.replace(self._ann_path() + ".tmp", self._ann_path())
+            self._conn.execute("INSERT OR REPLACE INTO info VALUES ('ann_segs', ?)", (json.dumps(segs),))
+            self._conn.commit()
+            self._ann, self._ann_loaded, self._ann_segs = index, True, set(segs)
+        return True
+
+    # --- maintenance ---
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(rows), 0), COUNT(*) FROM segments").fetchone()
+            live = self.count()
+        size = sum(e.stat().st_size for e in os.scandir(self.path) if e.is_file())
+        return {"live": live, "stale": total[0] - live, "segments": total[1], "bytes": size, "dtype": self.dtype}
+
+    def compact(self) -> Dict[str, Any]:
+        """Rewrite the live vectors into a single segment and delete the old segments.
+
+        Runs in one write transaction, so other processes' writes wait for it,
+        and bumps the generation so they reload their segments afterwards.
+        Also rebuilds the ANN index when the collection is large enough.
+        """
+        with self._lock:
+            self._sync()
+            before = self.stats()
+            with self._transaction():
+                old = [r[0] for r in self._conn.execute("SELECT seg FROM segments")]
+                rows = self._conn.execute("SELECT id, seg, row FROM chunks ORDER BY seg, row").fetchall()
+                if rows:
+                    segment = self._write_segment(self._reserve_segment(), self._vectors([(r[1], r[2]) for r in rows]))
+                    self._conn.execute("INSERT INTO segments VALUES (?, ?, ?, ?)", segment)
+                    self._conn.executemany("UPDATE chunks SET seg=?, row=? WHERE id=?",
+                                           [(segment[0], n, r[0]) for n, r in enumerate(rows)])
+                self._conn.executemany("DELETE FROM segments WHERE seg=?", [(s,) for s in old])
+                self._conn.execute("DELETE FROM info WHERE key='ann_segs'")
+                self._conn.execute("UPDATE info SET value = CAST(value AS INTEGER) + 1 WHERE key='generation'")
+            self._sync()
+            # Old files are only removed once no committed row points at them.
+            for s in old:
+                for suffix in (".npy", ".scale.npy"):
+                    try:
+                        os.unlink(self._segment_path(s, suffix))
+                    except FileNotFoundError:
+                        pass
+            if os.path.exists(self._ann_path()):
+                os.unlink(self._ann_path())
+            if self.ann_index != "none" and len(rows) >= VECTOR_ANN_MIN_VECTORS:
+                self.build_ann()
+            after = self.stats()
+        print(f"  Compacted {self.name}: {before['segments']} segments -> {after['segments']}, "
+              f"reclaimed {before['stale']} stale vectors ({(before['bytes'] - after['bytes']) / 2 ** 20:.1f} MB).")
+        return after
+
+
+class LocalVectorClient:
+    """Drop-in for the parts of `chromadb.PersistentClient` used by `rag_qa`."""
+
+    def __init__(self, path: str = VECTOR_DB_DIR):
+        self.path = path
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def get_or_create_collection(self, name: str, embedding_function=None, **_: Any) -> LocalCollection:
+        with self._lock:
+            col = self._collections.get(name)
+            if col is None:
+                col = self._collections[name] = LocalCollection(self.path, name, embedding_function)
+            elif embedding_function is not None:
+                col.embedding_function = embedding_function
+            return col
+
+    def delete_collection(self, name: str) -> None:
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def list_collections(self) -> List[str]:
+        return sorted(e.name for e in os.scandir(self.path) if e.is_dir())
+
+    def get_max_batch_size(self) -> int:
+        return 100_000
+
+
+def orphaned_chroma_segments(path: str) -> List[str]:
+    """Segment directories under a Chroma store that its catalog no longer references."""
+    catalog = os.path.join(path, "chroma.sqlite3")
+    known = set()
+    if os.path.exists(catalog):
+        conn = sqlite3.connect(f"file:{catalog}?mode=ro", uri=True)
+        try:
+            known = {r[0] for r in conn.execute("SELECT id FROM segments")}
+        finally:
+            conn.close()
+    return sorted(
+        e.path for e in os.scandir(path)
+        if e.is_dir() and e.name not in known and os.path.exists(os.path.join(e.path, "header.bin"))
+    )
+
+
+def prune_chroma_orphans(path: str, dry_run: bool = True) -> List[str]:
+    """Delete (or with `dry_run`, just list) orphaned Chroma segment directories."""
+    orphans = orphaned_chroma_segments(path)
+    if not dry_run:
+        for orphan in orphans:
+            shutil.rmtree(orphan, ignore_errors=True)
+    return orphans
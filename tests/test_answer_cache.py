@@ -0,0 +1,34 @@
+import time
+
+from src.answer_cache import AnswerCache
+
+
+def test_exact_and_semantic_hits_are_scoped_by_fingerprint():
+    cache = AnswerCache(threshold=0.9)
+    cache.store("fp1", "What datasets are used?", "ImageNet.", vector=[1.0, 0.0], paper_ids=["p1"])
+
+    assert cache.lookup("fp1", "  what datasets are USED ")["answer"] == "ImageNet."
+    assert cache.lookup("fp1", "Which datasets do they use?", vector=[0.99, 0.1])["answer"] == "ImageNet."
+    assert cache.lookup("fp1", "Summarize the methods", vector=[0.0, 1.0]) is None
+    assert cache.lookup("fp2", "What datasets are used?", vector=[1.0, 0.0]) is None
+
+    stats = cache.snapshot()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_ttl_lru_and_invalidation():
+    cache = AnswerCache(max_entries=2, ttl=0.05)
+    cache.store("fp", "q1", "a1", paper_ids=["p1"])
+    cache.store("fp", "q2", "a2", paper_ids=["p2"])
+    cache.lookup("fp", "q1")
+    cache.store("fp", "q3", "a3", paper_ids=["p1"])
+    assert cache.lookup("fp", "q2") is None
+
+    assert cache.invalidate_papers(["p1"]) == 2
+    assert cache.lookup("fp", "q1") is None
+
+    cache.store("fp", "q4", "a4")
+    time.sleep(0.06)
+    assert cache.lookup("fp", "q4") is None
+    assert cache.snapshot()["expirations"] == 1
@@ -0,0 +1,58 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import retrieval
+
+ENTRY = ('<entry><id>http://arxiv.org/abs/2101.{n:05d}v1</id><title> Paper {n} </title>'
+         '<summary> Abstract {n} </summary><author><name>Author {n}</name></author>'
+         '<arxiv:doi>10.1/{n}</arxiv:doi></entry>')
+
+
+class _SlowFeed(BaseHTTPRequestHandler):
+    entries = 3
+    delay = 0.3
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/atom+xml")
+        self.end_headers()
+        self.wfile.write(b'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom" '
+                         b'xmlns:arxiv="http://arxiv.org/schemas/atom"><title>q</title>')
+        for n in range(self.entries):
+            self.wfile.write(ENTRY.format(n=n).encode())
+            self.wfile.flush()
+            time.sleep(self.delay)
+        self.wfile.write(b"</feed>")
+
+
+@pytest.fixture
+def feed_url(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _SlowFeed)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setenv("ARXIV_API_URL", f"http://127.0.0.1:{httpd.server_address[1]}/api/query")
+    yield
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_iter_arxiv_yields_entries_before_the_feed_finishes(feed_url):
+    start = time.monotonic()
+    stream = retrieval.iter_arxiv("q", max_results=3)
+    first = next(stream)
+    assert time.monotonic() - start < _SlowFeed.delay * 2
+    assert first == {
+        "title": "Paper 0", "authors": ["Author 0"], "summary": "Abstract 0",
+        "url": "http://arxiv.org/abs/2101.00000v1", "arxiv_id": "2101.00000v1", "doi": "10.1/0",
+    }
+    assert [p["title"] for p in stream] == ["Paper 1", "Paper 2"]
+
+
+def test_fetch_arxiv_still_returns_a_list(feed_url, monkeypatch):
+    monkeypatch.setattr(_SlowFeed, "delay", 0)
+    assert [p["arxiv_id"] for p in retrieval.fetch_arxiv("q", 3)] == ["2101.00000v1", "2101.00001v1", "2101.00002v1"]
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import sys
+import src.agent, src.summarizer, src.extractor, api_server
+heavy = ("langgraph", "chromadb", "google.generativeai", "langchain", "langchain_community")
+print(",".join(m for m in heavy if m in sys.modules))
+from src import config
+try:
+    config.genai()
+except RuntimeError as e:
+    print(e)
+"""
+
+
+def test_importing_entry_points_is_lazy_and_needs_no_api_key(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k != "GOOGLE_API_KEY"}
+    env.update(PYTHONPATH=ROOT, SESSION_DB_PATH=str(tmp_path / "sessions.sqlite3"), CHROMA_DB_DIR=str(tmp_path / "chroma"))
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", _PROBE], cwd=str(tmp_path), env=env,
+                         capture_output=True, text=True, check=True)
+    loaded, error = out.stdout.splitlines()[-2:]
+    assert loaded == ""
+    assert "GOOGLE_API_KEY is not set" in error
+    assert not (tmp_path / "chroma").exists()
@@ -0,0 +1,43 @@
+from src.context import estimate_tokens, overlap_length, pack_context
+
+
+def _hit(pid, ordinal, text, title=None):
+    return {"id": f"{pid}:{ordinal}:h", "document": text, "metadata": {"paper_id": pid, "title": title or pid, "authors": "A"}}
+
+
+def test_overlap_length():
+    assert overlap_length("abc def ghi", "ghi jkl") == 3
+    assert overlap_length("abc", "xyz") == 0
+
+
+def test_pack_merges_adjacent_chunks_under_one_header():
+    hits = [
+        _hit("p1", 3, "The model uses attention. It is trained on C4."),
+        _hit("p2", 0, "Another paper entirely."),
+        _hit("p1", 2, "We introduce a model. The model uses attention."),
+        _hit("p1", 2, "We introduce a model. The model uses attention."),
+    ]
+    packed = pack_context(hits, budget_tokens=1000)
+
+    assert packed["text"].count("Source: p1") == 1
+    assert "We introduce a model. The model uses attention. It is trained on C4." in packed["text"]
+    assert packed["text"].index("Source: p1") < packed["text"].index("Source: p2")
+    assert (packed["chunks"], packed["papers"], packed["dropped"]) == (3, 2, 1)
+    assert packed["tokens"] == estimate_tokens(packed["text"])
+
+
+def test_pack_respects_budget_greedily_by_relevance():
+    hits = [_hit("p1", 0, "x" * 400), _hit("p2", 0, "y" * 4000), _hit("p3", 0, "z" * 200)]
+    packed = pack_context(hits, budget_tokens=200)
+    assert "x" * 400 in packed["text"] and "z" * 200 in packed["text"]
+    assert "y" * 100 not in packed["text"]
+    assert packed["tokens"] <= 200
+
+
+def test_pack_drops_near_identical_passages_from_other_papers():
+    words = " ".join(f"w{n}" for n in range(120))
+    hits = [_hit("v1", 4, words), _hit("v3", 4, words + " (revised)"), _hit("p2", 0, "Another paper entirely.")]
+    packed = pack_context(hits, budget_tokens=1000)
+
+    assert "Source: v3" not in packed["text"] and "Source: p2" in packed["text"]
+    assert (packed["chunks"], packed["dropped"]) == (2, 1)
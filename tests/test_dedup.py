@@ -0,0 +1,63 @@
+import random
+
+from src.dedup import Deduplicator, FingerprintIndex
+
+
+def _text(seed, n=3000):
+    rng = random.Random(seed)
+    return " ".join(f"w{rng.randrange(2000)}" for _ in range(n))
+
+
+def _paper(text, title="Paper"):
+    chunks = [text[i:i + 1000] for i in range(0, len(text), 1000)]
+    return {"title": title, "chunks": chunks, "chunk_meta": [{"page": n + 1} for n in range(len(chunks))]}
+
+
+def test_revised_copy_is_collapsed_across_runs(tmp_path):
+    path = str(tmp_path / "fp.sqlite3")
+    original = _text(1)
+    words = original.split()
+    revised = " ".join(words[:2000] + ["revised"] * 50 + words[2050:])
+
+    Deduplicator(FingerprintIndex(path)).dedup_paper(_paper(original), "2401.00001v1")
+
+    # A later run: the copy is caught from the persistent index before embedding...
+    copy = Deduplicator(FingerprintIndex(path), is_indexed=lambda pid: True).dedup_paper(_paper(revised), "url-s2")
+    assert copy["duplicate_of"] == "2401.00001v1" and copy["chunks"] == [] and copy["chunk_meta"] == []
+
+    # ...unless the original is no longer in the corpus; distinct papers are kept.
+    dedup = Deduplicator(FingerprintIndex(path), is_indexed=lambda pid: False)
+    assert "duplicate_of" not in dedup.dedup_paper(_paper(revised), "url-s2b")
+    assert "duplicate_of" not in dedup.dedup_paper(_paper(_text(2)), "2401.00002v1")
+    assert dedup.stats["duplicate_papers"] == 0
+
+
+def test_near_duplicate_chunks_are_dropped_within_a_paper_only(tmp_path):
+    dedup = Deduplicator(FingerprintIndex(str(tmp_path / "fp.sqlite3")))
+    shared = _text(3, 150)
+    first = {"title": "A", "chunks": [_text(4, 150), shared], "chunk_meta": [{"page": 1}, {"page": 2}]}
+    second = {"title": "B", "chunks": [shared + " w1", _text(5, 150), shared], "chunk_meta": [{"page": n} for n in (1, 2, 3)]}
+
+    dedup.dedup_paper(first, "a")
+    dedup.dedup_paper(second, "b")
+
+    # A passage shared with another paper stays (what is indexed for B must not
+    # depend on A); B's own repeat of it is dropped, by original position.
+    assert len(first["chunks"]) == 2 and "dropped_chunks" not in first
+    assert second["chunks"] == [shared + " w1", _text(5, 150)] and second["dropped_chunks"] == [2]
+    assert second["chunk_meta"] == [{"page": 1}, {"page": 2}]
+    assert dedup.stats == {"papers": 2, "duplicate_papers": 0, "chunks": 5, "duplicate_chunks": 1}
+
+
+def test_chunk_distance_above_three_still_finds_every_near_duplicate(tmp_path, monkeypatch):
+    from src import dedup as dedup_module
+
+    # Five flipped bits, one in each 16-bit block (and one more): no 16-bit
+    # block matches exactly, so four fixed blocks would miss this pair.
+    base = 0x0123456789ABCDEF
+    near = base ^ (1 << 3) ^ (1 << 19) ^ (1 << 35) ^ (1 << 51) ^ (1 << 60)
+    monkeypatch.setattr(dedup_module, "simhash", {"a": base, "b": near}.get)
+
+    dedup = Deduplicator(FingerprintIndex(str(tmp_path / "fp.sqlite3")), chunk_distance=5)
+    assert dedup.repeated_chunks(["a", "b"]) == [1]
+    assert Deduplicator(FingerprintIndex(str(tmp_path / "fp2.sqlite3")), chunk_distance=4).repeated_chunks(["a", "b"]) == []
@@ -0,0 +1,44 @@
+from src.embeddings import BatchedEmbeddingFunction, EmbeddingCache, Embedder, HashEmbedder
+
+
+class FlakyEmbedder(Embedder):
+    model = "fake"
+    task_type = "retrieval_document"
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def embed_batch(self, texts):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("429 Resource exhausted")
+        self.batches.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def test_batches_dedupes_and_caches(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite3"))
+    backend = FlakyEmbedder()
+    ef = BatchedEmbeddingFunction(backend, cache=cache, batch_size=2, max_concurrency=2)
+
+    vectors = ef(["a", "bb", "a", "ccc", "dddd"])
+    assert [v[0] for v in vectors] == [1.0, 2.0, 1.0, 3.0, 4.0]
+    assert sorted(len(b) for b in backend.batches) == [2, 2]
+
+    again = BatchedEmbeddingFunction(backend, cache=EmbeddingCache(str(tmp_path / "emb.sqlite3")))
+    again(["bb", "eeeee"])
+    assert backend.batches[-1] == ["eeeee"]
+
+
+def test_retries_with_backoff():
+    backend = FlakyEmbedder(failures=2)
+    ef = BatchedEmbeddingFunction(backend, backoff=0.001)
+    assert ef(["x"])[0][0] == 1.0
+    assert ef.retries == 2
+
+
+def test_hash_embedder_is_deterministic():
+    a, b = HashEmbedder(dim=32), HashEmbedder(dim=32)
+    assert a.embed_batch(["graph neural networks"]) == b.embed_batch(["graph neural networks"])
+    assert a.embed_one("graph") != a.embed_one("quantum")
@@ -0,0 +1,91 @@
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from src import extraction
+from src.extraction import chunk_pages
+from src.pdf_cache import PDFCache
+from src.pdf_pipeline import process_papers
+
+
+def _write_pdf(path, pages):
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for lines in pages:
+        page = writer.add_blank_page(612, 792)
+        ops = "".join(f"BT /F1 11 Tf 72 {740 - 16 * n} Td ({line}) Tj ET\n" for n, line in enumerate(lines))
+        stream = DecodedStreamObject()
+        stream.set_data(ops.encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+    writer.write(str(path))
+
+
+def test_chunk_pages_drops_boilerplate_and_references_and_tags_sections():
+    pages = [
+        "Proc. of Something 2024\nA Great Paper\nAbstract\nWe study graphs.\n1",
+        "Proc. of Something 2024\narXiv:2101.00001v2 [cs.LG] 1 Jan 2021\n1 Introduction\nGraphs matter.\n2",
+        "Proc. of Something 2024\n2 Methods\nWe count edges.\nReferences\n[1] Someone. 2020.\n3",
+    ]
+    out = chunk_pages(pages, {"chunk_size": 200, "chunk_overlap": 0})
+
+    assert out["chunks"] == ["A Great Paper", "We study graphs.", "Graphs matter.", "We count edges."]
+    assert out["chunk_meta"] == [
+        {"page": 1, "section": "body"},
+        {"page": 1, "section": "abstract"},
+        {"page": 2, "section": "introduction"},
+        {"page": 3, "section": "methods"},
+    ]
+    assert not any("Proc. of" in p or "arXiv:" in p for p in out["pages"])
+
+
+def test_text_before_the_only_heading_is_kept():
+    pages = [
+        "Deep Nets for Graphs\nJane Doe\nWe study graphs with deep nets.\nGraphs are everywhere.",
+        "We count their edges and find many.\nReferences\n[1] Someone. 2020.",
+    ]
+    out = chunk_pages(pages, {"chunk_size": 60, "chunk_overlap": 0})
+
+    assert out["chunks"] and not any("Someone" in c for c in out["chunks"])
+    assert {m["section"] for m in out["chunk_meta"]} == {"body"}
+    assert [m["page"] for m in out["chunk_meta"]][-1] == 2 and "find many." in out["chunks"][-1]
+
+
+def test_inline_abstract_starts_an_abstract_section():
+    out = chunk_pages(["A Paper\nAbstract\u2014We study graphs.\n1 Introduction\nGraphs matter."],
+                      {"chunk_size": 200, "chunk_overlap": 0})
+
+    assert out["chunks"] == ["A Paper", "We study graphs.", "Graphs matter."]
+    assert [m["section"] for m in out["chunk_meta"]] == ["body", "abstract", "introduction"]
+
+
+def test_sectioning_that_drops_most_of_the_text_falls_back_to_body():
+    pages = ["A Paper\nReferences\n" + "\n".join(f"Body sentence number {n}." for n in range(40))]
+    out = chunk_pages(pages, {"chunk_size": 200, "chunk_overlap": 0})
+
+    assert {m["section"] for m in out["chunk_meta"]} == {"body"}
+    assert any("Body sentence number 39." in c for c in out["chunks"])
+
+
+def test_long_pdfs_are_parsed_in_page_ranges_and_cached_with_metadata(monkeypatch, tmp_path):
+    pages = [["Abstract", "Short summary."]] + [[f"Page {n} body text."] for n in range(1, 5)] + [["References", "[1] x"]]
+    cache = PDFCache(str(tmp_path))
+    paper = {"title": "T", "authors": [], "url": "http://arxiv.org/abs/2101.00001v1", "summary": ""}
+    _write_pdf(tmp_path / "2101.00001v1.pdf", pages)
+
+    calls = []
+    real = extraction.extract_page_range
+    monkeypatch.setattr(extraction, "PAGES_PER_TASK", 2)
+    monkeypatch.setattr("src.pdf_pipeline.extract_page_range", lambda *a: calls.append(a[1:]) or real(*a))
+
+    [out] = process_papers([paper], parse_workers=0, cache=cache)
+    assert calls == [(0, 2), (2, 4), (4, 6)]
+    assert all(m["section"] == "abstract" for m in out["chunk_meta"])
+    assert [m["page"] for m in out["chunk_meta"]] == list(range(1, len(out["chunks"]) + 1))
+    assert not any("[1] x" in c for c in out["chunks"])
+
+    cached = cache.get_text("2101.00001v1", extraction.CHUNK_PARAMS)
+    assert cached["chunks"] == out["chunks"] and cached["chunk_meta"] == out["chunk_meta"]
@@ -1,26 +1,43 @@
 import json
 import os
-import pytest
-from src.extractor import extract_insights
-
-class DummyResp:
-    choices = [type("c", (), {"message": type("m", (), {
-        "content": json.dumps({
-            "contributions": ["C1"],
-            "gaps": ["G1"],
-            "comparisons": ["Comp1"]
-        })
-    })})]
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+from src import llm_batch
+from src.extractor import extract_insights, extract_insights_batch
+
+
+class FakeModel:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+
+    def generate_content(self, prompt, generation_config=None):
+        if self.fail_on and self.fail_on in prompt:
+            raise RuntimeError("quota exceeded")
+        papers = prompt.count("\nPaper ")
+        reply = [{"index": n, "contributions": [f"C{n}"], "gaps": ["G1"], "comparisons": ["Comp1"]}
+                 for n in range(1, papers + 1)]
+        return type("R", (), {"text": json.dumps(reply), "usage_metadata": None})()
+
 
 def test_extract_insights(monkeypatch):
-    # Mock GenAI call
-    import google.generativeai as genai
-    monkeypatch.setenv("GOOGLE_API_KEY", "test")
-    monkeypatch.setattr(genai.ChatCompletion, "create", lambda **kw: DummyResp())
+    monkeypatch.setattr(llm_batch, "LLM_RESULT_CACHE_PATH", "")
+    monkeypatch.setattr(llm_batch, "generative_model", lambda name: FakeModel())
 
     summary = {"introduction": "I", "methods": "M", "conclusion": "C"}
     insights = extract_insights(summary)
 
-    assert set(insights.keys()) == {"contributions", "gaps", "comparisons"}
-    assert isinstance(insights["contributions"], list)
+    assert {"contributions", "gaps", "comparisons"} <= set(insights.keys())
     assert insights["contributions"] == ["C1"]
+
+
+def test_a_failed_request_only_empties_its_own_papers(monkeypatch):
+    monkeypatch.setattr(llm_batch, "LLM_RESULT_CACHE_PATH", "")
+    monkeypatch.setattr(llm_batch, "generative_model", lambda name: FakeModel(fail_on="second"))
+
+    # The long middle summary is packed into a prompt of its own.
+    summaries = [{"title": t, "introduction": t * (n or 1)} for t, n in (("first", 0), ("second", 3000), ("third", 0))]
+    out = extract_insights_batch(summaries)
+
+    assert [s["contributions"] for s in out] == [["C1"], [], ["C1"]]
+    assert "quota exceeded" in out[1]["error"] and "error" not in out[0]
@@ -0,0 +1,80 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.http_client import HttpClient, retry_after_seconds
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    hits = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        n = _Handler.hits[self.path] = _Handler.hits.get(self.path, 0) + 1
+        if self.path == "/flaky" and n < 3:
+            self._send(503, b"busy", {"Retry-After": "0"})
+        elif self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304)
+            else:
+                self._send(200, b"feed", {"ETag": '"v1"'})
+        elif self.path == "/missing":
+            self._send(404, b"no")
+        else:
+            self._send(200, b"ok")
+
+
+@pytest.fixture
+def server():
+    _Handler.hits = {}
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_retries_honour_retry_after_and_connections_are_reused(server):
+    client = HttpClient(backoff=0.01)
+    assert client.get(f"{server}/flaky").text == "ok"
+    client.get(f"{server}/plain")
+
+    stats = client.stats()
+    assert stats["retries"] == 2 and stats["retry_after_waits"] == 2
+    assert stats["requests"] == 4
+    assert stats["connections_opened"] == 1 and stats["connections_reused"] == 3
+
+
+def test_revalidation_serves_304_from_previous_response(server):
+    client = HttpClient()
+    first = client.get(f"{server}/etag", revalidate=True)
+    second = client.get(f"{server}/etag", revalidate=True)
+    assert second.text == first.text == "feed"
+    assert _Handler.hits["/etag"] == 2
+    assert client.stats()["not_modified"] == 1
+
+
+def test_client_errors_are_not_retried(server):
+    client = HttpClient(backoff=0.01)
+    with pytest.raises(requests.HTTPError):
+        client.get(f"{server}/missing")
+    assert client.stats()["retries"] == 0
+
+
+def test_retry_after_parsing():
+    assert retry_after_seconds("7") == 7.0
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert retry_after_seconds(None) is None
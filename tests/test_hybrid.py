@@ -0,0 +1,39 @@
+from src.hybrid import BM25Index, mmr, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_compound_terms_and_parts():
+    assert tokenize("The ResNet-50 model on ImageNet") == ["resnet-50", "resnet", "50", "model", "imagenet"]
+
+
+def test_bm25_matches_exact_terms_within_allowed_papers():
+    index = BM25Index()
+    index.add(
+        ["a:0", "a:1", "b:0"],
+        ["we train resnet-50 on imagenet", "convolutional networks for vision", "resnet-50 baseline results"],
+        [{"paper_id": "a"}, {"paper_id": "a"}, {"paper_id": "b"}],
+    )
+    assert [d for d, _ in index.search("resnet-50", 5)][:2] in (["a:0", "b:0"], ["b:0", "a:0"])
+    assert [d for d, _ in index.search("resnet-50", 5, paper_ids=["a"])] == ["a:0"]
+
+    index.remove(["a:0"])
+    assert [d for d, _ in index.search("imagenet", 5)] == []
+    assert index.has_paper("a") and len(index) == 2
+
+
+def test_rrf_rewards_agreement_and_mmr_diversifies():
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "w"]])
+    assert fused[0][0] == "y"
+
+    candidates = [("dup1", [1.0, 0.0]), ("dup2", [0.99, 0.01]), ("other", [0.6, 0.8])]
+    assert mmr([1.0, 0.0], candidates, k=2, lambda_=0.3) == ["dup1", "other"]
+
+
+def test_bm25_index_keeps_only_tokens_and_survives_reopening(tmp_path):
+    path = str(tmp_path / "sparse.sqlite3")
+    BM25Index(path, "papers").add(["a:0", "b:0"], ["sparse retrieval", "dense retrieval"],
+                                  [{"paper_id": "a", "title": "A"}, {"paper_id": "b", "title": "B"}])
+
+    reopened = BM25Index(path, "papers")
+    assert [d for d, _ in reopened.search("sparse", 5)] == ["a:0"]
+    assert reopened.has_paper("b") and len(BM25Index(path, "other")) == 0
+    assert not hasattr(reopened, "get")
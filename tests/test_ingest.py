@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("CHROMA_DB_DIR", tempfile.mkdtemp())
+os.environ.setdefault("SPARSE_INDEX_PATH", "")
+
+from chromadb import EphemeralClient
+
+from src import ingest, rag_qa
+from src.embeddings import BatchedEmbeddingFunction, HashEmbedder
+from src.extraction import CHUNK_PARAMS
+from src.pdf_cache import PDFCache
+
+
+def _paper(pid, n):
+    return {"title": pid.upper(), "authors": ["A"], "url": f"http://x/{pid}",
+            "chunks": [f"{pid} chunk {i}" for i in range(n)], "chunk_meta": [{"page": i + 1} for i in range(n)]}
+
+
+def test_streaming_indexer_batches_whole_papers_and_marks_records(monkeypatch):
+    calls = []
+    monkeypatch.setattr(rag_qa, "client", EphemeralClient())
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=16)))
+    monkeypatch.setattr(ingest, "build_rag", lambda **kw: calls.append(kw) or rag_qa.build_rag(**kw))
+
+    indexer = ingest.StreamingIndexer(batch_chunks=5, max_pending=1, collection_name="test_ingest")
+    records = []
+    for pid, n in (("a", 3), ("b", 3), ("c", 2)):
+        paper = _paper(pid, n)
+        records.append(ingest.paper_record(paper, pid))
+        indexer.submit(records[-1], {"paper_id": pid, "title": paper["title"]}, paper["chunks"], paper["chunk_meta"])
+    stats = indexer.close()
+
+    assert stats["papers"] == 3 and stats["chunks"] == 8 and stats["failures"] == 0
+    assert all(r["indexed"] and "chunks" not in r for r in records)
+    # Papers are never split across build_rag calls (that would drop their other chunks as stale).
+    papers_per_call = [{m["paper_id"] for m in c["metadatas"]} for c in calls]
+    assert sorted(p for ids in papers_per_call for p in ids) == ["a", "b", "c"]
+    session = rag_qa.open_session(["a", "b", "c"], collection_name="test_ingest")
+    got = session.collection.get(where=session.where, include=["metadatas"])
+    assert len(got["ids"]) == 8 and {m["page"] for m in got["metadatas"]} == {1, 2, 3}
+
+
+def test_cached_chunks_skips_deduplicated_positions(tmp_path):
+    cache = PDFCache(str(tmp_path))
+    paper = _paper("a", 3)
+    cache.put_text("a", ["page"], paper["chunks"], CHUNK_PARAMS, paper["chunk_meta"])
+    record = ingest.paper_record(dict(paper, dropped_chunks=[1]), "a")
+
+    chunks, chunk_meta = ingest.cached_chunks(record, cache)
+    assert chunks == ["a chunk 0", "a chunk 2"] and [m["page"] for m in chunk_meta] == [1, 3]
+
+
+def test_chunk_ids_keep_original_positions_after_drops(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingest, "build_rag", lambda **kw: calls.append(kw))
+    paper = _paper("a", 2)
+    record = ingest.paper_record(dict(paper, dropped_chunks=[0, 2]), "a")
+
+    indexer = ingest.StreamingIndexer(collection_name="test_ingest_ids")
+    indexer.submit(record, {"paper_id": "a"}, paper["chunks"], paper["chunk_meta"])
+    indexer.close()
+
+    assert calls[0]["ids"] == [rag_qa.chunk_id("a", 1, "a chunk 0"), rag_qa.chunk_id("a", 3, "a chunk 1")]
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from src.jobs import FAILED, SUCCEEDED, JobManager, JobStore
+
+
+def _wait_done(job, timeout=2.0):
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_inflight_jobs_are_deduplicated_and_report_progress():
+    manager = JobManager(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def work(emit):
+        calls.append(1)
+        emit("fetch", {"papers": 3})
+        release.wait(1)
+        return {"session_id": "s1"}
+
+    first = manager.submit(("topic", "arxiv"), {"query": "topic"}, work)
+    second = manager.submit(("topic", "arxiv"), {"query": "topic"}, work)
+    assert first is second
+    release.set()
+    _wait_done(first)
+
+    assert first.status == SUCCEEDED and first.result == {"session_id": "s1"}
+    assert len(calls) == 1
+    assert [e["data"]["node"] for e in first.to_dict()["progress"]] == ["fetch"]
+
+    third = manager.submit(("topic", "arxiv"), {"query": "topic"}, work)
+    assert third is not first
+
+
+def test_failed_job_records_error():
+    manager = JobManager(max_workers=1)
+
+    def boom(emit):
+        raise RuntimeError("no papers")
+
+    job = _wait_done(manager.submit("k", {}, boom))
+    assert job.status == FAILED and job.error == "no papers"
+    assert job.events_since(0)[-1]["data"]["status"] == FAILED
+
+
+def test_jobs_are_visible_to_other_workers_through_the_store(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    worker_a = JobManager(max_workers=1, store=JobStore(path))
+    worker_b = JobManager(max_workers=1, store=JobStore(path))
+
+    def work(emit):
+        emit("session_ready", {"session_id": "s1"})
+        return {"session_id": "s1", "reading_plan": [{"title": "T"}]}
+
+    job = _wait_done(worker_a.submit("k", {"query": "topic"}, work))
+    seen = worker_b.get(job.id)
+
+    assert seen is not job and seen.to_dict() == job.to_dict()
+    assert seen.status == SUCCEEDED and seen.result["session_id"] == "s1"
+    assert [e["event"] for e in seen.events_since(0)] == ["status", "status", "progress", "status"]
+    assert worker_b.get("unknown") is None
+
+
+def test_job_reaches_a_terminal_state_when_the_final_write_fails(tmp_path):
+    class FlakyStore(JobStore):
+        def save(self, job, event=None):
+            if event is not None and event["data"].get("status") == SUCCEEDED:
+                raise RuntimeError("database is locked")
+            super().save(job, event)
+
+    manager = JobManager(max_workers=1, store=FlakyStore(str(tmp_path / "jobs.sqlite3")))
+    job = _wait_done(manager.submit("k", {}, lambda emit: {"ok": True}))
+
+    assert job.status == SUCCEEDED and job.finished_at is not None
+    assert job.events_since(0)[-1]["data"]["status"] == SUCCEEDED
+    assert manager.submit("k", {}, lambda emit: {}) is not job
@@ -0,0 +1,87 @@
+import json
+import os
+import re
+import threading
+
+import google.generativeai as genai
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+from src.llm_batch import ResultCache, pack, run_batched
+
+SCHEMA = {"type": "object", "properties": {"gist": {"type": "string"}}, "required": ["gist"]}
+
+
+class FakeModel:
+    def __init__(self, drop=None):
+        self.prompts = []
+        self.configs = []
+        self.drop = drop
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, generation_config=None):
+        with self._lock:
+            self.prompts.append(prompt)
+            self.configs.append(generation_config)
+        titles = re.findall(r"^Paper (\d+):\ntitle=(.*)$", prompt, re.MULTILINE)
+        reply = [{"index": int(n), "gist": f"about {t}"} for n, t in titles if not (self.drop == t and len(titles) > 1)]
+        return type("R", (), {"text": json.dumps(reply), "usage_metadata": None})()
+
+
+def _run(papers, cache=None, **kw):
+    return run_batched(
+        papers, task="summarize", prompt_version="v1", instructions="Summarise.",
+        render=lambda p: f"title={p['title']}", item_schema=SCHEMA, model_name="fake",
+        max_output_tokens=100, cache=cache, **kw,
+    )
+
+
+def test_pack_respects_item_and_char_limits():
+    assert pack(["aaaa", "bb", "cc", "d", "e"], batch_size=3, max_chars=6) == [[0, 1], [2, 3, 4]]
+    assert pack(["x" * 50, "y"], batch_size=5, max_chars=10) == [[0], [1]]
+
+
+def test_papers_are_packed_per_prompt_and_cached(monkeypatch, tmp_path):
+    model = FakeModel()
+    monkeypatch.setattr(genai, "GenerativeModel", lambda name: model)
+    cache = ResultCache(str(tmp_path / "results.sqlite3"))
+    papers = [{"title": f"P{n}", "url": f"http://arxiv.org/abs/2101.0000{n}v1"} for n in range(5)]
+
+    out = _run(papers, cache, batch_size=2)
+    assert [r["gist"] for r in out] == [f"about P{n}" for n in range(5)]
+    assert len(model.prompts) == 3
+    assert model.configs[0]["response_mime_type"] == "application/json"
+    assert model.configs[0]["response_schema"]["type"] == "array"
+    assert model.configs[0]["max_output_tokens"] == 200
+
+    papers[4] = dict(papers[4], title="P4 revised")
+    again = _run(papers, cache, batch_size=2)
+    assert len(model.prompts) == 4 and again[4]["gist"] == "about P4 revised"
+    assert cache.hits == 4
+
+
+def test_papers_missing_from_a_packed_reply_are_retried_alone(monkeypatch):
+    model = FakeModel(drop="B")
+    monkeypatch.setattr(genai, "GenerativeModel", lambda name: model)
+    out = _run([{"title": t} for t in "ABC"])
+    assert [r["gist"] for r in out] == ["about A", "about B", "about C"]
+    assert len(model.prompts) == 2
+
+
+def test_a_paper_that_never_gets_a_result_falls_back_alone(monkeypatch, tmp_path):
+    prompts = []
+
+    def reply(prompt, generation_config=None):
+        prompts.append(prompt)
+        found = [] if "title=B" in prompt else [{"index": 1, "gist": "about A"}]
+        return type("R", (), {"text": json.dumps(found), "usage_metadata": None})()
+
+    monkeypatch.setattr(genai, "GenerativeModel", lambda name: type("M", (), {"generate_content": staticmethod(reply)})())
+    cache = ResultCache(str(tmp_path / "results.sqlite3"))
+
+    out = _run([{"title": "A"}, {"title": "B"}], cache, batch_size=1)
+    assert out[0] == {"gist": "about A"}
+    assert out[1]["gist"] == "" and "no summarize result" in out[1]["error"]
+    # Fallbacks are not cached: only B is asked again.
+    _run([{"title": "A"}, {"title": "B"}], cache, batch_size=1)
+    assert len(prompts) == 3 and "title=B" in prompts[-1]
@@ -0,0 +1,37 @@
+import os
+import time
+
+from src.pdf_cache import PDFCache, paper_key
+
+PARAMS = {"chunk_size": 10, "chunk_overlap": 2}
+
+
+def test_paper_key_uses_arxiv_id_or_url_hash():
+    assert paper_key("http://arxiv.org/abs/2507.08331v1") == "2507.08331v1"
+    assert paper_key("https://arxiv.org/pdf/hep-th/0003151v1.pdf") == "hep-th_0003151v1"
+    key = paper_key("https://www.semanticscholar.org/paper/abc")
+    assert key.startswith("url-") and key == paper_key("https://www.semanticscholar.org/paper/abc")
+
+
+def test_text_round_trip_and_counters(tmp_path):
+    cache = PDFCache(str(tmp_path))
+    pages = ["first page text", "second page"]
+    chunks = ["first page", "page text\nsecond", "not a substring"]
+    assert cache.get_text("k", PARAMS) is None
+    cache.put_text("k", pages, chunks, PARAMS)
+    assert cache.get_text("k", PARAMS) == {"pages": pages, "chunks": chunks}
+    assert cache.get_text("k", {"chunk_size": 99, "chunk_overlap": 2}) is None
+    assert cache.stats["text_hits"] == 1 and cache.stats["text_misses"] == 2
+    assert not [f for f in os.listdir(tmp_path) if f.startswith(".tmp-")]
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = PDFCache(str(tmp_path), max_bytes=250)
+    for key in ("a", "b"):
+        cache.put_pdf(key, b"x" * 100)
+        time.sleep(0.01)
+    os.utime(tmp_path / "a.pdf", (time.time() + 5, time.time() + 5))
+    cache.put_pdf("c", b"x" * 100)
+    assert cache.get_pdf("b") is None
+    assert cache.get_pdf("a") and cache.get_pdf("c")
+    assert cache.stats["evictions"] == 1
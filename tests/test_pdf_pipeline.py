@@ -0,0 +1,109 @@
+import threading
+import time
+
+from src import pdf_pipeline, tracing
+from src.pdf_cache import PDFCache, paper_key
+from src.pdf_pipeline import HostRateLimiter, process_papers
+
+
+def test_process_papers_keeps_order_and_isolates_failures(monkeypatch, tmp_path):
+    papers = [{"title": t, "authors": ["A"], "url": f"http://example.org/abs/{t}", "summary": "S"} for t in "ABCD"]
+    delays = {"A": 0.05, "B": 0.0, "C": 0.02, "D": 0.0}
+
+    def fake_download(paper, cache, limiter):
+        time.sleep(delays[paper["title"]])
+        if paper["title"] == "C":
+            raise RuntimeError("404")
+        return paper["title"]
+
+    monkeypatch.setattr(pdf_pipeline, "download_pdf", fake_download)
+    monkeypatch.setattr(pdf_pipeline, "extract_chunks",
+                        lambda path: {"pages": [path], "chunks": [] if path == "D" else [f"{path}-chunk"]})
+
+    finished = []
+    out = process_papers(papers, download_workers=4, parse_workers=0, cache=PDFCache(str(tmp_path)),
+                         on_result=lambda p: finished.append(p["title"]))
+
+    assert [p["title"] for p in out] == ["A", "B"]
+    assert out[0]["chunks"] == ["A-chunk"]
+    # on_result fires in completion order: B (no delay) before A.
+    assert finished == ["B", "A"]
+
+
+def test_host_rate_limiter_spaces_requests_per_host():
+    limiter = HostRateLimiter(min_interval=0.05)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.wait("arxiv.org")
+    limiter.wait("other.org")
+    assert time.monotonic() - start >= 0.1
+
+
+def test_process_papers_skips_download_and_parse_on_text_hit(monkeypatch, tmp_path):
+    cache = PDFCache(str(tmp_path))
+    paper = {"title": "A", "url": "http://arxiv.org/abs/1234.5678v2"}
+    cache.put_text("1234.5678v2", ["page one"], ["page one"], pdf_pipeline.CHUNK_PARAMS)
+
+    def boom(*args):
+        raise AssertionError("should not be called")
+
+    monkeypatch.setattr(pdf_pipeline, "download_pdf", boom)
+    monkeypatch.setattr(pdf_pipeline, "extract_chunks", boom)
+
+    out = process_papers([paper], parse_workers=0, cache=cache)
+    assert out[0]["chunks"] == ["page one"]
+    assert cache.stats["text_hits"] == 1
+
+
+def test_process_papers_accepts_a_streaming_iterable(monkeypatch, tmp_path):
+    started = {t: threading.Event() for t in "AB"}
+
+    def feed():
+        for t in "AB":
+            yield {"title": t, "url": f"http://example.org/abs/{t}"}
+            # Work on this paper starts before the feed produces the next one.
+            assert started[t].wait(1)
+
+    def fake_download(paper, cache, limiter):
+        started[paper["title"]].set()
+        return paper["title"]
+
+    monkeypatch.setattr(pdf_pipeline, "download_pdf", fake_download)
+    monkeypatch.setattr(pdf_pipeline, "extract_chunks", lambda path: {"pages": [path], "chunks": [path]})
+
+    out = process_papers(feed(), download_workers=1, parse_workers=0, cache=PDFCache(str(tmp_path)))
+    assert [p["chunks"] for p in out] == [["A"], ["B"]]
+
+
+def test_a_failing_on_result_only_affects_its_own_paper(monkeypatch, tmp_path):
+    cache = PDFCache(str(tmp_path))
+    papers = [{"title": t, "url": f"http://example.org/abs/{t}"} for t in "ABC"]
+    cache.put_text(paper_key("http://example.org/abs/A"), ["page"], ["A"], pdf_pipeline.CHUNK_PARAMS)
+    monkeypatch.setattr(pdf_pipeline, "download_pdf", lambda paper, cache, limiter: paper["title"])
+    monkeypatch.setattr(pdf_pipeline, "extract_chunks", lambda path: {"pages": [path], "chunks": [path]})
+
+    def on_result(paper):
+        if paper["title"] in "AB":  # A is a text-cache hit, B comes through the parser
+            raise RuntimeError("index unavailable")
+        return {"title": paper["title"], "indexed": True}
+
+    out = process_papers(papers, parse_workers=0, cache=cache, on_result=on_result)
+    assert [p["title"] for p in out] == ["A", "B", "C"]
+    assert [p.get("indexed", False) for p in out] == [False, False, True]
+    assert out[0]["chunks"] == ["A"]
+
+
+def test_download_threads_record_on_the_pdf_process_span(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "tracer", tracing.Tracer(enabled=True))
+
+    def fake_download(paper, cache, limiter):
+        tracing.current_span().add("retries")  # what HttpClient does on a retry
+        return paper["title"]
+
+    monkeypatch.setattr(pdf_pipeline, "download_pdf", fake_download)
+    monkeypatch.setattr(pdf_pipeline, "extract_chunks", lambda path: {"pages": [path], "chunks": [path]})
+    process_papers([{"title": t, "url": f"http://example.org/abs/{t}"} for t in "AB"],
+                   download_workers=2, parse_workers=0, cache=PDFCache(str(tmp_path)))
+
+    trace = next(s for s in tracing.tracer.finished_spans() if s.name == "pdf.process")
+    assert trace.attributes["retries"] == 2
@@ -1,5 +1,15 @@
+import json
+import os
+import re
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+from src import planner, rag_qa
+from src.embeddings import BatchedEmbeddingFunction, HashEmbedder
 from src.planner import plan_reading
 
+
 def test_plan_reading():
     papers = [
         {"title":"A","contributions":["c1","c2"],"gaps":["g1"],"comparisons":[]},
@@ -9,3 +19,99 @@ def test_plan_reading():
     ordered = plan_reading(papers)
     # C has 3 contributions, A has 2, B has 1
     assert [p["title"] for p in ordered] == ["C", "A", "B"]
+
+
+def test_plan_reading_keeps_search_order_without_insights():
+    papers = [{"title": t, "summary": ""} for t in ("Zeta", "Alpha", "Mu")]
+    assert plan_reading(papers) == papers
+
+
+class _Reply:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+def test_match_order_uses_numbers_and_fuzzy_titles():
+    titles = ["Attention Is All You Need", "BERT: Pre-training", "A Survey of Transformers"]
+    assert planner.match_order("[3, 1, 1, 9]", titles) == [2, 0]
+    assert planner.match_order("1. A survey of transformers\n2. Attention is all you need.", titles) == [2, 0]
+
+
+def test_large_corpora_are_planned_per_cluster_then_merged(monkeypatch):
+    prompts = []
+
+    class Model:
+        def __init__(self, name):
+            pass
+
+        def generate_content(self, prompt, generation_config=None):
+            prompts.append(prompt)
+            numbers = [int(n) for n in re.findall(r"^(?:Paper|Group) (\d+)", prompt, re.MULTILINE)]
+            if "Stuck" in prompt:
+                time.sleep(1)
+            return _Reply(json.dumps(numbers[::-1]))
+
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=16)))
+    monkeypatch.setattr(rag_qa.genai, "GenerativeModel", Model)
+    monkeypatch.setattr(planner, "PLAN_CLUSTER_SIZE", 4)
+    papers = [{"title": f"Paper {topic} {i}", "summary": f"{topic} " * 20} for topic in ("graphs", "vision") for i in range(4)]
+
+    plan = planner.plan_reading_with_llm(papers)
+    assert sorted(p["title"] for p in plan) == sorted(p["title"] for p in papers)
+    assert len(prompts) == 3  # two clusters, one merge
+    assert all(len(re.findall(r"^Paper \d+$", p, re.MULTILINE)) <= 4 for p in prompts)
+
+    # A cluster that misses the deadline keeps its deterministic order.
+    monkeypatch.setattr(planner, "PLAN_TIMEOUT", 0.3)
+    stuck = [dict(p, title="Stuck " + p["title"]) for p in papers[:4]]
+    assert planner.plan_reading_with_llm(stuck) == planner.plan_reading(stuck)
+
+
+def test_merge_has_its_own_time_budget(monkeypatch, capsys):
+    class SlowModel:
+        def __init__(self, name):
+            pass
+
+        def generate_content(self, prompt, generation_config=None):
+            time.sleep(0.25)
+            numbers = [int(n) for n in re.findall(r"^(?:Paper|Group) (\d+)", prompt, re.MULTILINE)]
+            return _Reply(json.dumps(numbers[::-1]))
+
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=16)))
+    monkeypatch.setattr(rag_qa.genai, "GenerativeModel", SlowModel)
+    monkeypatch.setattr(planner, "PLAN_CLUSTER_SIZE", 4)
+    # The cluster prompts use up nearly all of PLAN_TIMEOUT.
+    monkeypatch.setattr(planner, "PLAN_TIMEOUT", 0.3)
+    papers = [{"title": f"Paper {topic} {i}", "summary": f"{topic} " * 20} for topic in ("graphs", "vision") for i in range(4)]
+
+    clusters = planner.cluster_papers(papers)
+    plan = planner.plan_reading_with_llm(papers)
+    out = capsys.readouterr().out
+    assert "Could not order" not in out and "failed" not in out
+    assert plan == [p for c in clusters[::-1] for p in c[::-1]]
+
+
+def test_merge_runs_while_timed_out_cluster_prompts_hold_the_pool(monkeypatch, capsys):
+    class StuckClusterModel:
+        def __init__(self, name):
+            pass
+
+        def generate_content(self, prompt, generation_config=None):
+            groups = [int(n) for n in re.findall(r"^Group (\d+)", prompt, re.MULTILINE)]
+            if not groups:
+                time.sleep(1.0)  # cluster prompts outlive PLAN_TIMEOUT and keep their workers
+            return _Reply(json.dumps(groups[::-1]))
+
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=16)))
+    monkeypatch.setattr(rag_qa.genai, "GenerativeModel", StuckClusterModel)
+    monkeypatch.setattr(planner, "PLAN_CLUSTER_SIZE", 4)
+    monkeypatch.setattr(planner, "PLAN_TIMEOUT", 0.1)
+    monkeypatch.setattr(planner, "PLAN_MERGE_TIMEOUT", 0.5)
+    papers = [{"title": f"Paper {topic} {i}", "summary": f"{topic} " * 20} for topic in ("graphs", "vision") for i in range(4)]
+
+    clusters = planner.cluster_papers(papers)
+    plan = planner.plan_reading_with_llm(papers)
+    out = capsys.readouterr().out
+    assert "Could not order" not in out
+    assert plan == [p for c in clusters[::-1] for p in planner.plan_reading(c)]
@@ -0,0 +1,194 @@
+import os
+import tempfile
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("CHROMA_DB_DIR", tempfile.mkdtemp())
+os.environ.setdefault("SPARSE_INDEX_PATH", "")
+
+from chromadb import EphemeralClient
+
+from src import rag_qa
+from src.dedup import Deduplicator, FingerprintIndex
+from src.embeddings import BatchedEmbeddingFunction, HashEmbedder
+from src.vector_store import LocalVectorClient
+
+
+def _meta(pid):
+    return {"paper_id": pid, "title": pid.upper(), "authors": "A", "url": f"http://x/{pid}"}
+
+
+def test_build_rag_is_incremental_and_session_scoped(monkeypatch):
+    ef = BatchedEmbeddingFunction(HashEmbedder(dim=32))
+    monkeypatch.setattr(rag_qa, "client", EphemeralClient())
+    monkeypatch.setattr(rag_qa, "_embedder", ef)
+
+    first = rag_qa.build_rag(["alpha one", "alpha two", "beta one"], [_meta("a"), _meta("a"), _meta("b")],
+                             collection_name="test_incremental")
+    assert first.count() == 3
+    requests_after_first = ef.requests
+
+    second = rag_qa.build_rag(["beta one", "gamma one"], [_meta("b"), _meta("g")], collection_name="test_incremental")
+    assert ef.requests == requests_after_first + 1
+    assert second.count() == 2
+    assert first.collection.count() == 4
+
+    hits = second.query(query_texts=["alpha"], n_results=5)
+    assert {m["paper_id"] for m in hits["metadatas"][0]} <= {"b", "g"}
+
+
+def test_build_rag_replaces_stale_chunks(monkeypatch):
+    monkeypatch.setattr(rag_qa, "client", EphemeralClient())
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=32)))
+
+    rag_qa.build_rag(["old text"], [_meta("a")], collection_name="test_stale")
+    session = rag_qa.build_rag(["new text"], [_meta("a")], collection_name="test_stale")
+    assert session.collection.get(include=["documents"])["documents"] == ["new text"]
+
+
+def test_full_text_backfill_keeps_abstracts(monkeypatch):
+    monkeypatch.setattr(rag_qa, "client", EphemeralClient())
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=32)))
+
+    rag_qa.build_rag(["A: an abstract"], [_meta("a")], collection_name="test_tiers", tier=rag_qa.ABSTRACT_TIER)
+    session = rag_qa.open_session(["a"], collection_name="test_tiers")
+    assert session.count() == 1
+
+    rag_qa.build_rag(["full text one", "full text two"], [_meta("a"), _meta("a")], collection_name="test_tiers")
+    got = session.collection.get(where=session.where, include=["metadatas"])
+    assert sorted(m["tier"] for m in got["metadatas"]) == ["abstract", "full_text", "full_text"]
+    assert sum(rag_qa.chunk_tier(c) == rag_qa.ABSTRACT_TIER for c in got["ids"]) == 1
+
+
+def test_dedup_keeps_a_copy_of_a_paper_with_only_its_abstract_indexed(monkeypatch, tmp_path):
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=32)))
+    text = " ".join(f"w{i % 997} x{i % 13}" for i in range(3000))
+    for client in (EphemeralClient(), LocalVectorClient(str(tmp_path))):
+        monkeypatch.setattr(rag_qa, "client", client)
+        rag_qa.build_rag(["O: an abstract"], [_meta("orig")], collection_name="papers", tier=rag_qa.ABSTRACT_TIER)
+        index = FingerprintIndex(str(tmp_path / f"fp-{type(client).__name__}.sqlite3"))
+        dedup = Deduplicator(index, is_indexed=rag_qa.has_full_text)
+        dedup.dedup_paper({"title": "O", "chunks": [text]}, "orig")
+
+        # The original's PDF failed, so a later copy must keep its full text...
+        later = Deduplicator(index, is_indexed=rag_qa.has_full_text)
+        assert "duplicate_of" not in later.dedup_paper({"title": "C", "chunks": [text]}, "copy")
+
+        # ...but once the original's full text is in, copies collapse into it.
+        rag_qa.build_rag(["O full text"], [_meta("orig")], collection_name="papers")
+        again = Deduplicator(index, is_indexed=rag_qa.has_full_text)
+        assert again.dedup_paper({"title": "C", "chunks": [text]}, "copy2")["duplicate_of"] == "orig"
+
+
+def test_hybrid_retrieval_reads_sparse_hits_from_the_vector_store(monkeypatch):
+    monkeypatch.setattr(rag_qa, "client", EphemeralClient())
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=32)))
+    session = rag_qa.build_rag(["we train resnet-50 on imagenet", "convolutional networks"],
+                               [_meta("a"), _meta("b")], collection_name="test_sparse_hits")
+    index = rag_qa.sparse_index("test_sparse_hits")
+    index.add(["gone:0:full_text"], ["resnet-50 in a reset corpus"], [_meta("a")])
+
+    hits = rag_qa.retrieve(session, "resnet-50", k=3, dense=[])
+    assert [h["document"] for h in hits] == ["we train resnet-50 on imagenet"]
+    assert hits[0]["metadata"]["title"] == "A"
+
+
+class _FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+    def generate_content(self, prompt, stream=False):
+        assert "alpha one" in prompt
+        parts = ["Alpha ", "is ", "first."]
+        return iter(_FakeChunk(p) for p in parts) if stream else _FakeChunk("".join(parts))
+
+
+def test_answer_query_stream_yields_sources_then_tokens(monkeypatch):
+    monkeypatch.setattr(rag_qa, "client", EphemeralClient())
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=32)))
+    monkeypatch.setattr(rag_qa.genai, "GenerativeModel", _FakeModel)
+    session = rag_qa.build_rag(["alpha one", "alpha two"], [_meta("a"), _meta("a")], collection_name="test_stream")
+
+    events = list(rag_qa.answer_query_stream(session, "alpha", k=2))
+
+    assert events[0]["type"] == "sources"
+    assert events[0]["sources"] == [{"title": "A", "authors": "A", "url": "http://x/a"}]
+    assert events[0]["usage"]["context_chunks"] == 2
+    assert events[0]["usage"]["tiers"] == {"full_text": 2}
+    assert "".join(e["text"] for e in events if e["type"] == "token") == "Alpha is first."
+    assert events[-1]["type"] == "done" and events[-1]["answer"] == "Alpha is first."
+    assert rag_qa.answer_query(session, "alpha", k=2) == "Alpha is first."
+
+
+def test_answer_query_serves_repeats_from_cache_until_chunks_change(monkeypatch):
+    calls = []
+
+    class CountingModel(_FakeModel):
+        def generate_content(self, prompt, stream=False):
+            calls.append(prompt)
+            return super().generate_content(prompt, stream)
+
+    monkeypatch.setattr(rag_qa, "client", EphemeralClient())
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=32)))
+    monkeypatch.setattr(rag_qa, "_answer_cache", rag_qa.AnswerCache())
+    monkeypatch.setattr(rag_qa.genai, "GenerativeModel", CountingModel)
+    session = rag_qa.build_rag(["alpha one"], [_meta("a")], collection_name="test_cache")
+
+    rag_qa.answer_query(session, "What is alpha?")
+    rag_qa.answer_query(session, "what is alpha")
+    assert len(calls) == 1
+
+    rag_qa.build_rag(["alpha one", "alpha two"], [_meta("a"), _meta("a")], collection_name="test_cache")
+    rag_qa.answer_query(session, "What is alpha?")
+    assert len(calls) == 2
+
+    # A backfill written by another worker bypasses this process's build_rag.
+    session.collection.add(ids=[rag_qa.chunk_id("a", 2, "alpha three")], documents=["alpha three"],
+                           metadatas=[{**_meta("a"), "tier": rag_qa.FULL_TEXT_TIER}])
+    rag_qa.answer_query(session, "What is alpha?")
+    assert len(calls) == 3
+
+
+def test_answer_queries_embeds_once_and_answers_every_question(monkeypatch):
+    ef = BatchedEmbeddingFunction(HashEmbedder(dim=32))
+    monkeypatch.setattr(rag_qa, "client", EphemeralClient())
+    monkeypatch.setattr(rag_qa, "_embedder", ef)
+    monkeypatch.setattr(rag_qa, "_answer_cache", rag_qa.AnswerCache())
+    monkeypatch.setattr(rag_qa.genai, "GenerativeModel", _FakeModel)
+    session = rag_qa.build_rag(["alpha one", "alpha two"], [_meta("a"), _meta("a")], collection_name="test_batch")
+    requests_before = ef.requests
+
+    questions = ["alpha?", "what is alpha one", "alpha two"]
+    results = list(rag_qa.answer_queries(session, questions, k=2, concurrency=2))
+
+    assert ef.requests == requests_before + 1
+    assert sorted(r["index"] for r in results) == [0, 1, 2]
+    for r in results:
+        assert r["question"] == questions[r["index"]]
+        assert r["answer"] == "Alpha is first." and r["latency_ms"] >= 0
+
+
+def test_answer_queries_reports_a_failed_question_and_keeps_going(monkeypatch):
+    class FlakyModel(_FakeModel):
+        def generate_content(self, prompt, stream=False):
+            if "what is alpha one" in prompt:
+                raise ValueError("response blocked by safety filters")
+            return super().generate_content(prompt, stream)
+
+    monkeypatch.setattr(rag_qa, "client", EphemeralClient())
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=32)))
+    monkeypatch.setattr(rag_qa, "_answer_cache", rag_qa.AnswerCache())
+    monkeypatch.setattr(rag_qa.genai, "GenerativeModel", FlakyModel)
+    session = rag_qa.build_rag(["alpha one", "alpha two"], [_meta("a"), _meta("a")], collection_name="test_batch_error")
+
+    questions = ["alpha?", "what is alpha one", "alpha two"]
+    results = {r["index"]: r for r in rag_qa.answer_queries(session, questions, k=2, concurrency=1)}
+
+    assert sorted(results) == [0, 1, 2]
+    assert results[1] == {"index": 1, "question": questions[1], "error": "response blocked by safety filters",
+                          "latency_ms": results[1]["latency_ms"]}
+    assert results[0]["answer"] == results[2]["answer"] == "Alpha is first."
@@ -6,16 +6,25 @@ def test_arxiv_basic():
     assert all('title' in p for p in papers)
 
 # tests/test_summarizer.py
+import json
 import os
+
+from src import llm_batch
 from src.summarizer import summarize_papers
 
+
 def test_summarize_structure(monkeypatch):
-    # Monkeypatch GENAI to return a fixed JSON string
-    class DummyResp:
-        choices = [type("c", (), {"message": type("m", (), {"content": '{"introduction":"Intro","methods":"M","conclusion":"C"}'})})]
-    import google.generativeai as genai
-    monkeypatch.setattr(genai.ChatCompletion, "create", lambda **kw: DummyResp())
+    # A fake model in place of Gemini, returning the batched JSON array.
+    class FakeModel:
+        def generate_content(self, prompt, generation_config=None):
+            reply = [{"index": 1, "introduction": "Intro", "methods": "M", "conclusion": "C"}]
+            return type("R", (), {"text": json.dumps(reply), "usage_metadata": None})()
+
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    monkeypatch.setattr(llm_batch, "LLM_RESULT_CACHE_PATH", "")
+    monkeypatch.setattr(llm_batch, "generative_model", lambda name: FakeModel())
 
     paper = {'title': 'T','authors': ['A'], 'summary': 'S','url':'U'}
     out = summarize_papers(paper)
-    assert set(out.keys()) == {"introduction","methods","conclusion"}
+    assert set(out.keys()) == {"title", "url", "authors", "introduction", "methods", "conclusion"}
+    assert out["introduction"] == "Intro"
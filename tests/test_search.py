@@ -0,0 +1,99 @@
+import threading
+import time
+
+from src import search
+from src.search import SearchCache, iter_search_papers, merge_results, search_papers
+
+
+def _paper(title, **ids):
+    return {"title": title, "authors": ["A"], "summary": "", "url": f"http://x/{title}", **ids}
+
+
+def test_merge_dedups_by_doi_arxiv_id_and_title_and_interleaves():
+    arxiv = [_paper("Graph Nets", arxiv_id="2101.00001v2"), _paper("Diffusion", arxiv_id="2202.00002v1")]
+    semantic = [
+        _paper("Graph nets.", arxiv_id="2101.00001", doi="10.1/gn"),
+        _paper("Other title", doi="10.1/gn"),
+        _paper("Fresh Paper"),
+    ]
+    merged = merge_results([arxiv, semantic])
+
+    assert [p["title"] for p in merged] == ["Graph Nets", "Diffusion", "Fresh Paper"]
+    # The duplicate filled in the DOI the arXiv record was missing.
+    assert merged[0]["doi"] == "10.1/gn"
+
+
+def test_search_pages_sources_concurrently_and_caches_pages(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def fake(source):
+        def fetch(query, size, offset):
+            with lock:
+                calls.append((source, offset))
+            time.sleep(0.05)
+            return [_paper(f"{source}-{offset + i}") for i in range(size)]
+        return fetch
+
+    monkeypatch.setattr(search, "FETCHERS", {"arxiv": fake("arxiv"), "semantic": fake("semantic")})
+    monkeypatch.setattr(search, "PAGE_SIZES", {"arxiv": 10, "semantic": 10})
+    cache = SearchCache(ttl=60)
+
+    start = time.monotonic()
+    papers = search_papers("topic", 30, cache=cache)
+    elapsed = time.monotonic() - start
+
+    assert len(calls) == 6 and elapsed < 0.25
+    assert len(papers) == 30
+    assert [p["title"] for p in papers[:3]] == ["arxiv-0", "semantic-0", "arxiv-1"]
+    assert {p["source"] for p in papers} == {"arxiv", "semantic"}
+
+    search_papers("  Topic ", 30, cache=cache)
+    assert len(calls) == 6 and cache.hits == 6
+
+
+def test_a_single_arxiv_page_is_streamed_then_cached(monkeypatch):
+    calls = []
+    first_seen = threading.Event()
+
+    def stream(query, size, offset):
+        calls.append(offset)
+        yield _paper("first", arxiv_id="2101.00001v1")
+        # The caller has the first paper before the feed goes on.
+        assert first_seen.wait(1)
+        yield _paper("second")
+        yield _paper("first", arxiv_id="2101.00001v2")
+
+    monkeypatch.setattr(search, "STREAMERS", {"arxiv": stream})
+    cache = SearchCache(ttl=60)
+
+    titles = []
+    for paper in iter_search_papers("topic", 5, sources=("arxiv",), cache=cache):
+        titles.append(paper["title"])
+        first_seen.set()
+    assert titles == ["first", "second"]
+
+    again = list(iter_search_papers("Topic", 5, sources=("arxiv",), cache=cache))
+    assert [p["title"] for p in again] == ["first", "second"] and {p["source"] for p in again} == {"arxiv"}
+    assert calls == [0] and cache.hits == 1
+
+
+def test_fetch_node_indexes_abstracts_while_results_stream_in(monkeypatch):
+    from src import agent
+
+    indexed = []
+
+    def stream(query, max_results, sources):
+        for n in range(5):
+            if n == 4:
+                # Abstracts of earlier papers are already being indexed.
+                assert [len(batch) for batch in indexed] == [2, 2]
+            yield dict(_paper(f"P{n}"), summary=f"abstract {n}")
+
+    monkeypatch.setattr(agent, "iter_search_papers", stream)
+    monkeypatch.setattr(agent, "build_rag", lambda documents, metadatas, tier: indexed.append(documents))
+    monkeypatch.setattr(agent, "open_session", lambda paper_ids: paper_ids)
+    monkeypatch.setattr(agent, "ABSTRACT_INDEX_BATCH", 2)
+
+    state = agent.fetch_papers_node({"query": "topic", "source": "arxiv", "max_results": 5})
+    assert len(state["papers"]) == 5 and [len(batch) for batch in indexed] == [2, 2, 1]
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("CHROMA_DB_DIR", tempfile.mkdtemp())
+os.environ.setdefault("SPARSE_INDEX_PATH", "")
+
+from chromadb import EphemeralClient
+
+from src import rag_qa
+from src.embeddings import BatchedEmbeddingFunction, HashEmbedder
+from src.session_store import SessionStore
+
+
+def test_sessions_survive_a_restart_and_are_rehydrated_lazily(monkeypatch, tmp_path):
+    monkeypatch.setattr(rag_qa, "client", EphemeralClient())
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=32)))
+    session = rag_qa.build_rag(["alpha text"], [{"paper_id": "a", "title": "A"}], collection_name="test_sessions")
+    plan = [{"title": "A", "url": "http://x/a"}]
+
+    path = str(tmp_path / "sessions.sqlite3")
+    SessionStore(path).put("s1", session, plan)
+
+    restarted = SessionStore(path)
+    got = restarted.get("s1")
+    assert got["reading_plan"] == plan
+    assert got["rag_collection"].paper_ids == ["a"] and got["rag_collection"].count() == 1
+    assert restarted.get("s1")["rag_collection"] is got["rag_collection"]
+    assert restarted.stats["rehydrations"] == 1 and restarted.get("missing") is None
+
+
+class _Session:
+    def __init__(self, pid):
+        self.collection = type("C", (), {"name": "papers"})()
+        self.paper_ids = [pid]
+
+
+def test_ttl_and_lru_eviction(tmp_path):
+    store = SessionStore(str(tmp_path / "s.sqlite3"), ttl=60, max_stored=2, max_live=1)
+    for sid in ("a", "b"):
+        store.put(sid, _Session(sid), [])
+        time.sleep(0.01)
+    assert store.get("a") is not None  # "a" is now more recent than "b"
+    store.put("c", _Session("c"), [])
+    assert len(store) == 2 and store.stats["evictions"] == 1
+    assert store.get("b") is None
+    assert len(store._live) == 1
+
+    store.ttl = 0
+    time.sleep(0.01)
+    assert store.get("a") is None and store.stats["expired"] == 1
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from src.tracing import Tracer, activate
+
+
+class _Usage:
+    prompt_token_count = 120
+    candidates_token_count = 30
+
+
+def test_spans_nest_and_export_as_otlp(tmp_path):
+    export = tmp_path / "traces.jsonl"
+    tracer = Tracer(enabled=True, export_path=str(export))
+    with tracer.span("node.process", papers=2) as node:
+        with tracer.span("pdf.process") as inner:
+            inner.add("pages_parsed", 10)
+            inner.add("pages_parsed", 5)
+        llm = tracer.start_span("llm.answer")
+        llm.record_usage(_Usage())
+        llm.end()
+        node.set(chunks=7)
+
+    spans = {s.name: s for s in tracer.finished_spans()}
+    assert spans["pdf.process"].parent_id == spans["node.process"].span_id
+    assert spans["llm.answer"].parent_id == spans["node.process"].span_id
+    assert len({s.trace_id for s in spans.values()}) == 1
+    assert spans["pdf.process"].attributes["pages_parsed"] == 15
+
+    otlp = json.loads(export.read_text().splitlines()[0])
+    exported = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert {s["name"] for s in exported} == {"node.process", "pdf.process", "llm.answer"}
+    root = next(s for s in exported if s["name"] == "node.process")
+    assert "parentSpanId" not in root and root["status"] == {"code": 1}
+    assert {"key": "chunks", "value": {"intValue": "7"}} in root["attributes"]
+
+
+def test_prometheus_text_has_histograms_counters_and_errors():
+    tracer = Tracer(enabled=True)
+    with tracer.span("llm.plan") as s:
+        s.record_usage(_Usage())
+    with pytest.raises(ValueError):
+        with tracer.span("llm.plan"):
+            raise ValueError("boom")
+
+    text = tracer.prometheus_text({"answer_cache_hits": 3})
+    assert 'ara_span_duration_seconds_count{span="llm.plan"} 2' in text
+    assert 'ara_span_errors_total{span="llm.plan"} 1' in text
+    assert 'ara_tokens_in_total{span="llm.plan"} 120' in text
+    assert 'ara_tokens_out_total{span="llm.plan"} 30' in text
+    assert "ara_answer_cache_hits 3" in text
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    with tracer.span("node.fetch") as s:
+        s.set(papers=3)
+        with activate(tracer.start_span("llm.plan")) as inner:
+            inner.end()
+    assert tracer.finished_spans() == []
+
+
+def test_workflow_nodes_emit_one_span_per_run(monkeypatch):
+    from src import agent, tracing
+
+    tracer = Tracer(enabled=True)
+    monkeypatch.setattr(tracing, "tracer", tracer)
+    monkeypatch.setattr(agent, "DEDUP", False)
+
+    class _Indexer:
+        def submit(self, record, metadata, chunks, chunk_meta=None):
+            record["indexed"] = True
+
+        def close(self):
+            return {"papers": 0, "chunks": 0, "batches": 0, "failures": 0}
+
+    def _process(papers, on_result):
+        return [on_result({"url": p["url"], "title": p["title"], "chunks": ["text"]}) for p in papers]
+
+    monkeypatch.setattr(agent, "StreamingIndexer", _Indexer)
+    monkeypatch.setattr(agent, "process_papers", _process)
+    papers = [{"url": f"http://x/{n}", "title": f"P{n}"} for n in range(3)]
+
+    state = agent.process_pdfs_node({"papers": papers})
+    agent.build_rag_node(state)
+
+    names = [s.name for s in tracer.finished_spans()]
+    assert names.count("node.process") == 1 and names.count("node.build_rag") == 1
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import threading
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("CHROMA_DB_DIR", tempfile.mkdtemp())
+os.environ.setdefault("SPARSE_INDEX_PATH", "")
+
+import numpy as np
+
+from src import rag_qa
+from src.embeddings import BatchedEmbeddingFunction, HashEmbedder
+from src.vector_store import LocalCollection, LocalVectorClient, dequantize, quantize
+
+
+def test_rag_runs_on_the_local_backend(monkeypatch, tmp_path):
+    monkeypatch.setattr(rag_qa, "client", LocalVectorClient(str(tmp_path)))
+    monkeypatch.setattr(rag_qa, "_embedder", BatchedEmbeddingFunction(HashEmbedder(dim=32)))
+    meta = lambda pid: {"paper_id": pid, "title": pid.upper()}
+
+    rag_qa.build_rag(["alpha one", "old beta"], [meta("a"), meta("b")], collection_name="local")
+    session = rag_qa.build_rag(["beta one", "gamma one"], [meta("b"), meta("g")], collection_name="local")
+    assert session.count() == 2 and session.collection.count() == 3
+
+    hits = session.query(query_texts=["beta one"], n_results=5)
+    assert hits["documents"][0][0] == "beta one"
+    assert {m["paper_id"] for m in hits["metadatas"][0]} == {"b", "g"}
+
+    # A restarted client sees the same collection from disk.
+    reopened = LocalVectorClient(str(tmp_path)).get_or_create_collection("local", rag_qa.embedding_function())
+    assert sorted(reopened.get(include=["documents"])["documents"]) == ["alpha one", "beta one", "gamma one"]
+
+
+def test_int8_quantization_round_trips_closely():
+    vectors = np.random.default_rng(0).normal(size=(50, 64)).astype(np.float32)
+    codes, scales = quantize(vectors, "int8")
+    assert codes.dtype == np.int8
+    assert np.abs(dequantize(codes, scales) - vectors).max() < np.abs(vectors).max() / 100
+
+
+def test_compaction_reclaims_stale_segments_and_keeps_results(tmp_path):
+    vectors = np.random.default_rng(1).normal(size=(40, 16)).astype(np.float32)
+    col = LocalCollection(str(tmp_path), "c", dtype="float32", max_segments=100)
+    for start in range(0, 40, 10):
+        ids = [f"v{i}" for i in range(start, start + 10)]
+        col.add(ids, documents=ids, embeddings=vectors[start:start + 10])
+    col.delete(ids=[f"v{i}" for i in range(10)])
+    before = col.query(query_embeddings=vectors[[12]], n_results=3)
+
+    stats = col.compact()
+    assert stats == {**stats, "live": 30, "stale": 0, "segments": 1}
+    assert len([f for f in os.listdir(col.path) if f.startswith("seg-")]) == 1
+    assert before["ids"][0][0] == "v12"
+    assert col.query(query_embeddings=vectors[[12]], n_results=3)["ids"] == before["ids"]
+
+    if col.build_ann("hnsw"):
+        col.add(["new"], documents=["new"], embeddings=vectors[[3]])
+        assert col.query(query_embeddings=vectors[[3]], n_results=1)["ids"] == [["new"]]
+
+
+def test_processes_sharing_a_collection_never_clobber_segments(tmp_path):
+    vectors = np.random.default_rng(2).normal(size=(30, 16)).astype(np.float32)
+    # Two instances with their own SQLite connections stand in for two worker processes.
+    a = LocalCollection(str(tmp_path), "c", dtype="float32", max_segments=100)
+    b = LocalCollection(str(tmp_path), "c", dtype="float32", max_segments=100)
+    a.add(["a0", "a1"], documents=["a0", "a1"], embeddings=vectors[[0, 1]])
+    b.add(["b0", "b1"], documents=["b0", "b1"], embeddings=vectors[[2, 3]])
+    assert a.query(query_embeddings=vectors[[0]], n_results=1)["ids"] == [["a0"]]
+    assert a.query(query_embeddings=vectors[[3]], n_results=1)["ids"] == [["b1"]]
+
+    # `a` has memory-mapped the old segments; `b` compacts them away and keeps writing.
+    b.delete(ids=["a1"])
+    b.compact()
+    b.add(["b2"], documents=["b2"], embeddings=vectors[[4]])
+    a.add(["a2"], documents=["a2"], embeddings=vectors[[5]])
+    for n, expected in ((0, "a0"), (2, "b0"), (4, "b2"), (5, "a2")):
+        assert a.query(query_embeddings=vectors[[n]], n_results=1)["ids"] == [[expected]]
+        assert b.query(query_embeddings=vectors[[n]], n_results=1)["ids"] == [[expected]]
+    got = a.get(include=["embeddings"])
+    assert np.allclose([got["embeddings"][got["ids"].index("b2")]], vectors[[4]])
+    assert sorted(a.get()["ids"]) == ["a0", "a2", "b0", "b1", "b2"]
+
+
+def test_count_never_sees_a_write_half_done(tmp_path):
+    vectors = np.random.default_rng(3).normal(size=(2000, 8)).astype(np.float32)
+    ids = [f"v{i}" for i in range(2000)]
+    col = LocalCollection(str(tmp_path), "c", dtype="float32", max_segments=1000)
+    col.add(ids, documents=ids, embeddings=vectors)
+    seen, stop = set(), threading.Event()
+
+    def count_until_stopped():
+        while not stop.is_set():
+            seen.add(col.count())
+
+    reader = threading.Thread(target=count_until_stopped, daemon=True)
+    reader.start()
+    for _ in range(10):
+        col.delete(ids=ids[1000:])
+        col.add(ids[1000:], documents=ids[1000:], embeddings=vectors[1000:])
+    stop.set()
+    reader.join(5)
+    assert seen <= {1000, 2000}
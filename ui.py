@@ -3,8 +3,9 @@ import streamlit as st
 import time
 
 # Import your agent's functions directly
-from src.agent import app as research_agent_app
-from src.rag_qa import answer_query
+from src.agent import ResearchRun
+from src.config import warm_up
+from src.rag_qa import answer_query_stream
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -15,6 +16,15 @@ st.set_page_config(
 
 st.title("🔬 AI Research Assistant")
 
+
+@st.cache_resource(show_spinner=False)
+def warm_start():
+    """Compile the graph and create the shared clients once per server process, not on every rerun."""
+    return warm_up()
+
+
+warm_start()
+
 # --- Session State Initialization ---
 # This is to store variables across user interactions
 if "rag_collection" not in st.session_state:
@@ -23,6 +33,8 @@ if "reading_plan" not in st.session_state:
     st.session_state.reading_plan = None
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "research_run" not in st.session_state:
+    st.session_state.research_run = None
 
 # --- Main UI Logic ---
 
@@ -30,21 +42,27 @@ if "messages" not in st.session_state:
 st.header("1. Start a New Research Session")
 
 topic_input = st.text_input("Enter a research topic:", placeholder="e.g., machine learning")
-source_option = st.selectbox("Select a source:", ("arxiv", "semantic"))
+source_option = st.selectbox("Select a source:", ("arxiv", "semantic", "all"))
+max_results = st.number_input("Number of papers:", min_value=1, max_value=200, value=5)
 
 if st.button("Start Research"):
     if topic_input:
-        with st.spinner("Finding, downloading, and processing papers... This may take a few minutes."):
+        with st.spinner("Finding papers and indexing their abstracts..."):
             try:
                 # Define the initial state for the LangGraph agent
-                initial_state = {"query": topic_input, "source": source_option}
+                initial_state = {"query": topic_input, "source": source_option, "max_results": int(max_results)}
                 
-                # Directly invoke the agent's graph
-                final_state = research_agent_app.invoke(initial_state)
+                # Run the agent's graph in the background; the session is usable
+                # once abstracts are indexed, while full text is backfilled.
+                run = ResearchRun(initial_state)
+                run.ready.wait()
+                if run.error:
+                    raise run.error
 
                 # Store the results directly in the session state
-                st.session_state.rag_collection = final_state.get("rag_collection")
-                st.session_state.reading_plan = final_state.get("reading_plan")
+                st.session_state.research_run = run
+                st.session_state.rag_collection = run.state.get("rag_collection")
+                st.session_state.reading_plan = run.state.get("reading_plan")
                 st.session_state.messages = [] # Clear previous messages
                 
                 if not st.session_state.rag_collection or not st.session_state.reading_plan:
@@ -75,6 +93,9 @@ if st.session_state.reading_plan:
 
     st.divider()
     st.header("3. Ask Questions About the Papers")
+    run = st.session_state.research_run
+    if run is not None and not run.finished.is_set():
+        st.info("Full text is still being indexed in the background; early answers may draw on abstracts only.")
 
     # Display chat history
     for message in st.session_state.messages:
@@ -89,14 +110,23 @@ if st.session_state.reading_plan:
 
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
-            with st.spinner("Thinking..."):
-                try:
-                    # Directly call the answer_query function
-                    answer = answer_query(st.session_state.rag_collection, prompt)
-                    message_placeholder.markdown(answer)
-                    st.session_state.messages.append({"role": "assistant", "content": answer})
-
-                except Exception as e:
-                    error_message = f"An error occurred: {e}"
-                    message_placeholder.error(error_message)
-                    st.session_state.messages.append({"role": "assistant", "content": error_message})
\ No newline at end of file
+            message_placeholder.markdown("Thinking...")
+            try:
+                # Stream the answer into the placeholder as tokens arrive
+                answer = ""
+                for event in answer_query_stream(st.session_state.rag_collection, prompt):
+                    if event["type"] == "token":
+                        answer += event["text"]
+                        message_placeholder.markdown(answer + "▌")
+                    elif event["type"] == "done":
+                        answer = event["answer"]
+                        tiers = event["usage"].get("tiers", {})
+                        if tiers and "full_text" not in tiers:
+                            answer += "\n\n*Answered from abstracts only; full text is not indexed yet.*"
+                message_placeholder.markdown(answer)
+                st.session_state.messages.append({"role": "assistant", "content": answer})
+
+            except Exception as e:
+                error_message = f"An error occurred: {e}"
+                message_placeholder.error(error_message)
+                st.session_state.messages.append({"role": "assistant", "content": error_message})